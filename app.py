@@ -1,16 +1,33 @@
-from flask import Flask, render_template, request, jsonify, make_response
+from flask import Flask, render_template, request, jsonify, make_response, send_from_directory, url_for
+import hashlib
+import re
 import sqlite3
 import requests
 import json
 from datetime import datetime, timedelta
 import os
+import logging
 from dotenv import load_dotenv
-from weather_api import WeatherAPI
 from weather_simple import WeatherSimple
+from weather_refresher import CityWeatherRefresher, create_forecast_prefetcher
 from event_scraper import EventScraper
 from event_filter import EventFilter
+from event_model import event_row_factory
+from score_memo import default_score_memo
 from logger import setup_logger, log_user_action, log_error
 from config import config
+import json_serializer
+from json_serializer import FastJSONProvider
+from cache_backend import default_cache
+from filter_cache import FilterResultCache, get_generation, normalize_filters
+from geo_index import EventGeoIndex
+from dedupe import EventDeduper
+from event_stats import EventStats
+from event_changes import EventChanges
+from content_store import CONTENT_KINDS, DEFAULT_LIMIT, MAX_LIMIT, ContentStore
+from readiness import ReadinessMonitor
+from migrations import migrate_all
+import metrics
 
 load_dotenv()
 
@@ -18,53 +35,81 @@ load_dotenv()
 env = os.getenv('FLASK_ENV', 'development')
 app = Flask(__name__)
 app.config.from_object(config[env])
+app.json = FastJSONProvider(app)
+metrics.init_app(app)
 
-# ログ設定
-if env == 'production':
-    setup_logger(app)
+# ログ設定（キュー経由の非同期出力。重複して呼ばれてもハンドラーは増えない）
+setup_logger(app)
+logger = logging.getLogger(__name__)
+
+# 層ごとのキャッシュ（保存先は CACHE_URL で切り替え）
+feed_cache = default_cache.namespace('feed')
+filter_result_cache = FilterResultCache('events.db', ttl=app.config['FILTER_CACHE_TTL'])
+event_geo_index = EventGeoIndex('events.db')
+event_deduper = EventDeduper('events.db')
+event_stats = EventStats('events.db')
+event_changes = EventChanges('events.db', app.config['EVENT_CHANGES_MAX_AGE_DAYS'])
+content_store = ContentStore(app.config['CONTENT_DATABASE_URL'])
+
+# 対象都市の現在の天気（スレッドは最初のリクエスト時にワーカーごとに起動する）
+city_weather_refresher = CityWeatherRefresher(
+    app.config['TARGET_CITIES'],
+    app.config['CITY_WEATHER_QUERIES'],
+    interval=app.config['WEATHER_REFRESH_INTERVAL'],
+    use_bulk=app.config['WEATHERAPI_BULK']
+)
+
+# /readyz の判定（DB・スクレイピング・天気の鮮度をバックグラウンドで確認する）
+readiness_monitor = ReadinessMonitor(
+    'events.db',
+    interval=app.config['READINESS_CHECK_INTERVAL'],
+    max_scrape_age=app.config['READY_MAX_SCRAPE_AGE'],
+    max_weather_age=app.config['READY_MAX_WEATHER_AGE'],
+    weather_refresher=city_weather_refresher,
+    forecast_client=WeatherSimple(),
+    cities=app.config['TARGET_CITIES']
+)
+
+# 内容のハッシュ付きの静的ファイル（?v=）は変わらないので長期間キャッシュさせる
+ASSET_MAX_AGE = 365 * 24 * 3600
+_asset_versions = {}
+
+def asset_url(filename):
+    """静的ファイルのURLに内容のハッシュを ?v= で付ける（sw.js はこのURLをキャッシュから返す）"""
+    version = _asset_versions.get(filename)
+    if version is None:
+        with open(os.path.join(app.static_folder, filename), 'rb') as f:
+            version = _asset_versions[filename] = hashlib.sha1(f.read()).hexdigest()[:12]
+    return url_for('static', filename=filename, v=version)
+
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': asset_url}
+
+# ETag を作るときに除く応答時刻（/api/stats・/api/content などは毎回変わる）
+_TIMESTAMP_FIELD = re.compile(rb',?"timestamp":\s*"[^"]*"')
+
+def api_etag(body):
+    """APIのJSONの ETag（timestamp を除いた本文から作るので、データが同じなら毎回同じになる）"""
+    return hashlib.sha1(_TIMESTAMP_FIELD.sub(b'', body)).hexdigest()[:20]
 
-# 静的ファイルのキャッシュ無効化
 @app.after_request
 def add_header(response):
-    if 'Cache-Control' not in response.headers:
+    if request.path.startswith('/static/') and request.args.get('v'):
+        response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    elif request.path.startswith('/api/') and response.mimetype == 'application/json':
+        # APIのJSONは保存を許可し、使う前に ETag で再検証させる（変わっていなければ 304 で本文を送らない）
+        if request.method == 'GET' and response.status_code == 200:
+            if 'ETag' not in response.headers:
+                response.set_etag(api_etag(response.get_data()))
+            response.make_conditional(request)
+        if 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = 'no-cache'
+    elif 'Cache-Control' not in response.headers:
+        # ページ・その他は毎回取得させる
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     return response
 
-# データベース初期化
-def init_db():
-    conn = sqlite3.connect('events.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            date TEXT NOT NULL,
-            time TEXT,
-            location TEXT,
-            category TEXT,
-            is_indoor BOOLEAN DEFAULT 0,
-            is_free BOOLEAN DEFAULT 0,
-            has_parking BOOLEAN DEFAULT 0,
-            child_friendly BOOLEAN DEFAULT 0,
-            weather_dependent BOOLEAN DEFAULT 0,
-            rain_cancellation TEXT,
-            source_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather_cache (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL,
-            weather_data TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
 @app.route('/')
 def index():
     response = make_response(render_template('index.html'))
@@ -73,49 +118,161 @@ def index():
     response.headers['Expires'] = '0'
     return response
 
+@app.route('/sw.js')
+def service_worker():
+    """Service Worker（スコープをサイト全体にするためルートから配信する）"""
+    response = send_from_directory(app.root_path, 'sw.js', mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/favicon.ico')
 def favicon():
     return '', 204  # No Content
 
-@app.route('/api/events')
-def get_events():
-    try:
-        # 天気予報を取得（WeatherAPI.com使用）
-        weather_api = WeatherSimple()
-        weather_data = weather_api.get_weather_forecast()
-        
-        # イベントを取得
-        conn = sqlite3.connect('events.db')
-        cursor = conn.cursor()
+def build_events_feed():
+    """イベントフィード（天気で採点したイベント一覧）のJSONを生成"""
+    # 天気予報を取得（バックグラウンドで更新された共有キャッシュから）
+    weather_api = WeatherSimple()
+    weather_data = weather_api.get_weather_forecast()
+    hourly = weather_api.get_hourly_forecasts(app.config['TARGET_CITIES'])
+    
+    # 差分（?since=）の起点は読み出す前に取る（読み出し中の更新は次の差分で再送される）
+    since_cursor = event_changes.cursor()
+    
+    # イベントを取得
+    conn = sqlite3.connect('events.db')
+    conn.row_factory = event_row_factory
+    cursor = conn.cursor()
+    with metrics.time_db_query('events_upcoming'):
         cursor.execute('''
             SELECT * FROM events 
             WHERE date >= date('now') 
             ORDER BY date ASC, time ASC
         ''')
         events = cursor.fetchall()
-        conn.close()
-        
-        # イベントをフィルタリング
-        event_filter = EventFilter()
-        filtered_events = event_filter.filter_events_by_weather(events, weather_data)
-        
-        return jsonify({
+    conn.close()
+    
+    # 他のサイトにも掲載された同じ催しは代表の1件だけを採点する
+    duplicates = event_deduper.duplicate_ids()
+    if duplicates:
+        events = [event for event in events if event.id not in duplicates]
+    
+    # イベントをフィルタリング
+    event_filter = EventFilter()
+    filtered_events = event_filter.filter_events_by_weather(events, weather_data, hourly)
+    
+    with metrics.time_serialization('/api/events'):
+        return json_serializer.dumps({
             'events': filtered_events,
-            'weather': weather_data
+            'weather': weather_data,
+            'cursor': since_cursor,
+            'full': True
+        })
+
+def build_events_delta(changes):
+    """since 以降に変わったイベントだけのJSONを生成
+    
+    変わったイベントはフィードと同じ条件（開催日・重複・スコア）で採点し、
+    条件から外れたものは削除したイベントと合わせて removed に入れる。
+    変わっていないイベントのスコアは再送しないため、天気による並びの変化は全件の取得で反映する。
+    """
+    weather_api = WeatherSimple()
+    weather_data = weather_api.get_weather_forecast()
+    hourly = weather_api.get_hourly_forecasts(app.config['TARGET_CITIES'])
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    duplicates = event_deduper.duplicate_ids()
+    candidates = [
+        event for event in changes['changed']
+        if event.date and event.date >= today and event.id not in duplicates
+    ]
+    scored = EventFilter().filter_events_by_weather(candidates, weather_data, hourly)
+    kept = {event.id for event in scored}
+    removed = changes['removed'] + [event.id for event in changes['changed'] if event.id not in kept]
+    
+    with metrics.time_serialization('/api/events?since'):
+        return json_serializer.dumps({
+            'events': scored,
+            'removed': sorted(set(removed)),
+            'weather': weather_data,
+            'cursor': changes['cursor'],
+            'full': False
         })
+
+@app.route('/api/events')
+def get_events():
+    since = request.args.get('since', '').strip()
+    try:
+        if since:
+            try:
+                with metrics.time_db_query('events_changes'):
+                    changes = event_changes.since(since)
+            except ValueError:
+                return jsonify({'error': 'since は YYYY-MM-DD HH:MM:SS で指定してください'}), 400
+            if not changes['full']:
+                return app.response_class(build_events_delta(changes), mimetype='application/json')
+        # 全ワーカーで同じフィードを使い回す（生成は期限切れ時に1ワーカーだけが行う）
+        # キーに世代番号を含め、スクレイピングで変わったらTTLを待たずに作り直す
+        conn = sqlite3.connect('events.db')
+        try:
+            generation = get_generation(conn)
+        finally:
+            conn.close()
+        body = feed_cache.get_or_set(f'events:{generation}', build_events_feed, ttl=app.config['FEED_CACHE_TTL'])
+        return app.response_class(body, mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/events/nearby')
+def get_nearby_events():
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = float(request.args.get('radius', app.config['NEARBY_DEFAULT_RADIUS_KM']))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat, lon（と radius）を数値で指定してください'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius <= app.config['NEARBY_MAX_RADIUS_KM']):
+        return jsonify({'error': '座標または半径が範囲外です'}), 400
+
+    try:
+        with metrics.time_db_query('events_nearby'):
+            results = event_geo_index.nearby(lat, lon, radius)
+        duplicates = event_deduper.duplicate_ids()
+        events = [
+            dict(event.to_dict(), place_id=place.place_id, place_name=place.name,
+                 lat=place.lat, lon=place.lon, distance_km=round(distance, 2))
+            for event, place, distance in results
+            if event.id not in duplicates
+        ]
+        with metrics.time_serialization('/api/events/nearby'):
+            body = json_serializer.dumps({'events': events, 'radius_km': radius})
+        return app.response_class(body, mimetype='application/json')
+    except Exception as e:
+        logger.exception('周辺イベント検索エラー')
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/weather')
 def get_weather():
     try:
-        # WeatherAPI.comを使用
+        # バックグラウンドで更新された共有キャッシュから取得
         weather_api = WeatherSimple()
         weather_data = weather_api.get_weather_forecast()
         return jsonify(weather_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/weather/cities')
+def get_city_weather():
+    """対象都市の現在の天気（バックグラウンドで定期取得した結果を返す）"""
+    try:
+        response = jsonify(city_weather_refresher.snapshot(wait=5))
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+    except Exception as e:
+        logger.exception('複数都市の天気取得エラー')
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/scrape-events')
 def scrape_events():
     try:
@@ -124,22 +281,39 @@ def scrape_events():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/livez')
+def liveness_check():
+    """死活監視（プロセスが応答できるかだけを返し、I/O はしない）"""
+    return app.response_class(b'{"status":"alive"}', mimetype='application/json')
+
+@app.route('/readyz')
+def readiness_check():
+    """準備完了の確認（バックグラウンドで確認した結果を返すだけで、DBには接続しない）"""
+    body, ready = readiness_monitor.status()
+    return app.response_class(json_serializer.dumps(body), status=200 if ready else 503,
+                              mimetype='application/json')
+
 @app.route('/health')
 def health_check():
     """ヘルスチェックエンドポイント"""
     try:
-        # データベース接続チェック
-        conn = sqlite3.connect('events.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM events')
-        event_count = cursor.fetchone()[0]
-        conn.close()
+        # データベース接続チェック（件数は集計テーブルから読む）
+        with metrics.time_db_query('events_stats'):
+            event_count = event_stats.summary()['total_events']
         
         return jsonify({
             'status': 'healthy',
             'timestamp': datetime.now().isoformat(),
             'database': 'connected',
             'events_count': event_count,
+            'score_memo': default_score_memo.stats(),
+            'cache': {
+                'feed': feed_cache.stats(),
+                'filter': filter_result_cache.stats(),
+                'weather': city_weather_refresher.cache.stats()
+            },
+            'city_weather': city_weather_refresher.stats(),
+            'weather_forecast': WeatherSimple().freshness(app.config['TARGET_CITIES']),
             'version': '1.0.0'
         }), 200
     except Exception as e:
@@ -149,70 +323,59 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
-@app.route('/api/filter')
-def filter_events():
+@app.route('/api/stats')
+def get_stats():
+    """イベントの統計（トリガーで更新している集計テーブルから読む）"""
     try:
-        # パラメータ取得
-        category = request.args.get('category', '')
-        city = request.args.get('city', '')
-        indoor_only = request.args.get('indoor_only', '')
-        outdoor_only = request.args.get('outdoor_only', '')
-        free_only = request.args.get('free_only', '')
-        parking_required = request.args.get('parking_required', '')
-        child_friendly = request.args.get('child_friendly', '')
-
-        filters = {
-            'category': category,
-            'city': city,
-            'indoor_only': indoor_only,
-            'outdoor_only': outdoor_only,
-            'free_only': free_only,
-            'parking_required': parking_required,
-            'child_friendly': child_friendly
-        }
-
-        print(f"🔍 フィルター適用: {filters}")  # デバッグ情報
+        with metrics.time_db_query('events_stats'):
+            stats = event_stats.summary()
+        stats['timestamp'] = datetime.now().isoformat()
+        return jsonify(stats)
+    except Exception as e:
+        logger.exception('統計取得エラー')
+        return jsonify({'error': str(e)}), 500
 
-        conn = sqlite3.connect('events.db')
-        cursor = conn.cursor()
-
-        query = 'SELECT * FROM events WHERE 1=1'
-        params = []
-
-        if filters.get('indoor_only'):
-            query += ' AND is_indoor = 1'
-        if filters.get('outdoor_only'):
-            query += ' AND is_indoor = 0'
-        if filters.get('free_only'):
-            query += ' AND is_free = 1'
-        if filters.get('parking_required'):
-            query += ' AND has_parking = 1'
-        if filters.get('child_friendly'):
-            query += ' AND child_friendly = 1'
-        if filters.get('category'):
-            query += ' AND category = ?'
-            params.append(filters['category'])
-        if filters.get('city'):
-            query += ' AND (location LIKE ? OR location LIKE ?)'
-            params.append(f'%{filters["city"]}%')
-            params.append(f'%（{filters["city"]}）%')
-
-        print(f"🔍 SQLクエリ: {query}")  # デバッグ情報
-        print(f"🔍 パラメータ: {params}")  # デバッグ情報
-
-        cursor.execute(query, params)
-        events = cursor.fetchall()
-        conn.close()
+@app.route('/api/content')
+def get_content():
+    """地域特集コンテンツの新着（kind で種類、city で市を絞り込む）"""
+    kind = request.args.get('kind', '').strip()
+    if kind and kind not in CONTENT_KINDS:
+        return jsonify({'error': f"kind は {', '.join(CONTENT_KINDS)} のいずれかを指定してください"}), 400
+    city = request.args.get('city', '').strip() or None
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit は数値で指定してください'}), 400
 
-        print(f"🔍 結果件数: {len(events)}")  # デバッグ情報
+    try:
+        with metrics.time_db_query('content_latest'):
+            items = content_store.latest((kind,) if kind else CONTENT_KINDS, city, limit)
+        data = {name: [item.to_dict() for item in rows] for name, rows in items.items()}
+        data['timestamp'] = datetime.now().isoformat()
+        with metrics.time_serialization('/api/content'):
+            body = json_serializer.dumps(data)
+        response = app.response_class(body, mimetype='application/json')
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+    except Exception as e:
+        logger.exception('コンテンツ取得エラー')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/filter')
+def filter_events():
+    try:
+        # パラメータを正規化（同じ条件は同じキャッシュキーになる）
+        filters = normalize_filters(request.args)
+        body = filter_result_cache.get_response(filters)
 
-        response = jsonify({'events': events})
+        response = app.response_class(body, mimetype='application/json')
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
         response.headers.add('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         return response
     except Exception as e:
-        print(f"❌ フィルターエラー: {e}")  # デバッグ情報
+        logger.exception('フィルターエラー')
         error_response = jsonify({'error': str(e)})
         error_response.headers.add('Access-Control-Allow-Origin', '*')
         error_response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
@@ -220,5 +383,8 @@ def filter_events():
         return error_response, 500
 
 if __name__ == '__main__':
-    init_db()
+    # 開発サーバーでは起動時にスキーマを最新にする（本番は gunicorn の起動時）
+    migrate_all()
+    # 開発サーバーでは同じプロセスで天気予報を定期取得する（本番は gunicorn のマスターか単独プロセス）
+    create_forecast_prefetcher(app.config).start()
     app.run(debug=False, host='0.0.0.0', port=8080) 
\ No newline at end of file
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Netlify Function（netlify/functions/api.py）のコールド/ウォーム起動のベンチマーク
+
+  - コールド: 新しいプロセスで api を読み込み、最初の1回を呼び出すまで
+  - ウォーム: 同じプロセスで2回目以降に呼び出したとき
+
+天気は WeatherAPI.com に接続するため --weather を付けたときだけ計測する。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'netlify', 'functions')
+ENDPOINTS = ['events', 'stats', 'debug']
+COLD_RUNS = 5
+WARM_RUNS = 200
+
+# 子プロセスで実行する（読み込み～最初の呼び出しの時間をミリ秒で出力）
+COLD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {functions_dir!r})
+import api
+response = api.handler({{'httpMethod': 'GET', 'path': '/api/' + {endpoint!r}}}, None)
+assert response['statusCode'] == 200, response['body']
+print(json.dumps({{'ms': (time.perf_counter() - start) * 1000, 'bytes': len(response['body'])}}))
+'''
+
+
+def measure_cold(endpoint):
+    """コールド起動の所要時間（ミリ秒の中央値）とバイト数"""
+    timings = []
+    size = 0
+    for _ in range(COLD_RUNS):
+        script = COLD_SCRIPT.format(functions_dir=FUNCTIONS_DIR, endpoint=endpoint)
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        timings.append(result['ms'])
+        size = result['bytes']
+    return statistics.median(timings), size
+
+
+def measure_warm(api, endpoint, runs):
+    """ウォーム起動の所要時間（ミリ秒の中央値）"""
+    event = {'httpMethod': 'GET', 'path': '/api/' + endpoint}
+    api.handler(event, None)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = api.handler(event, None)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response['statusCode'] == 200, response['body']
+    return statistics.median(timings)
+
+
+def run_benchmark(include_weather=False):
+    sys.path.insert(0, FUNCTIONS_DIR)
+    import api
+
+    endpoints = ENDPOINTS + (['weather'] if include_weather else [])
+    print(f"{'エンドポイント':<12} {'コールド':>12} {'ウォーム':>12} {'バイト数':>12}")
+    for endpoint in endpoints:
+        cold, size = measure_cold(endpoint)
+        # 天気は外部APIの呼び出しを含むため回数を減らす
+        warm = measure_warm(api, endpoint, 5 if endpoint == 'weather' else WARM_RUNS)
+        print(f"{endpoint:<12} {cold:9.2f} ms {warm:9.3f} ms {size:>12,}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Netlify Function のコールド/ウォーム起動のベンチマーク')
+    parser.add_argument('--weather', action='store_true', help='天気（外部API）も計測する')
+    args = parser.parse_args()
+
+    print("⏱️ Netlify Function 起動ベンチマーク")
+    print(f"Python {sys.version.split()[0]} / コールドは{COLD_RUNS}回・ウォームは{WARM_RUNS}回の中央値")
+    run_benchmark(args.weather)
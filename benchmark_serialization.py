@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+JSONシリアライズのベンチマーク
+
+1k / 10k / 100k 件のイベントについて、以下の経路の所要時間を比較する
+  - 従来経路: タプル行 → 14キーの辞書 → 標準json
+  - 高速経路: sqlite3.Row / Event → json_serializer（バックエンドごと）
+  - SQLite経路: json_group_array によるDB内でのJSON生成
+"""
+
+import importlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from event_model import event_row_factory
+
+SIZES = [1_000, 10_000, 100_000]
+REPEAT = 3
+
+
+def create_database(count):
+    """ベンチマーク用のインメモリDBを作成"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            date TEXT,
+            time TEXT,
+            location TEXT,
+            category TEXT,
+            is_indoor BOOLEAN,
+            is_free BOOLEAN,
+            has_parking BOOLEAN,
+            child_friendly BOOLEAN,
+            weather_dependent BOOLEAN,
+            rain_cancellation TEXT,
+            source_url TEXT,
+            source_city TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO events (
+            title, description, date, time, location, category,
+            is_indoor, is_free, has_parking, child_friendly,
+            weather_dependent, rain_cancellation, source_url, source_city
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            f'つくばみらい市 イベント{i}',
+            '地域の魅力を発信するイベントです。屋台やステージもあります。',
+            f'2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}',
+            f'{9 + i % 10:02d}:00',
+            'つくばみらい市中央公園（つくばみらい市）',
+            ['文化', 'スポーツ', '教育', '子育て', '地域'][i % 5],
+            i % 2, i % 3 == 0, i % 4 == 0, i % 5 == 0, i % 2 == 0,
+            '小雨決行' if i % 7 == 0 else None,
+            f'https://example.com/events/{i}',
+            'つくばみらい市役所'
+        )
+        for i in range(count)
+    ])
+    conn.commit()
+    return conn
+
+
+def measure(func):
+    """REPEAT回実行して最短時間（ミリ秒）とバイト数を返す"""
+    best = None
+    size = 0
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        size = len(func())
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def load_serializer(backend):
+    """指定バックエンドで json_serializer を読み込み直す"""
+    os.environ['JSON_BACKEND'] = backend
+    import json_serializer
+    module = importlib.reload(json_serializer)
+    return module if module.BACKEND == backend else None
+
+
+def legacy_event_dict(row):
+    """Event導入前の convert_event_to_dict 相当"""
+    return {
+        'id': row[0],
+        'title': row[1],
+        'description': row[2],
+        'date': row[3],
+        'time': row[4],
+        'location': row[5],
+        'category': row[6],
+        'is_indoor': bool(row[7]),
+        'is_free': bool(row[8]),
+        'has_parking': bool(row[9]),
+        'child_friendly': bool(row[10]),
+        'weather_dependent': bool(row[11]),
+        'rain_cancellation': row[12],
+        'source_url': row[13]
+    }
+
+
+def run_benchmark():
+    for count in SIZES:
+        conn = create_database(count)
+        print(f"\n📊 {count:,}件")
+
+        def legacy():
+            conn.row_factory = None
+            rows = conn.execute('SELECT * FROM events').fetchall()
+            events = [legacy_event_dict(row) for row in rows]
+            return json.dumps({'events': events}).encode('utf-8')
+
+        elapsed, size = measure(legacy)
+        print(f"  {'従来 (dict + json)':<28} {elapsed:9.1f} ms  {size:>12,} bytes")
+
+        for backend in ('json', 'msgspec', 'orjson'):
+            serializer = load_serializer(backend)
+            if serializer is None:
+                print(f"  {'* + ' + backend:<28} {'未インストール':>12}")
+                continue
+
+            for label, row_factory in (('sqlite3.Row', sqlite3.Row), ('Event', event_row_factory)):
+                def fast():
+                    conn.row_factory = row_factory
+                    rows = conn.execute('SELECT * FROM events').fetchall()
+                    return serializer.dumps({'events': rows})
+
+                elapsed, size = measure(fast)
+                print(f"  {label + ' + ' + backend:<28} {elapsed:9.1f} ms  {size:>12,} bytes")
+
+        def sqlite_json():
+            conn.row_factory = None
+            body = conn.execute('''
+                SELECT json_group_array(json_object(
+                    'id', id, 'title', title, 'description', description,
+                    'date', date, 'time', time, 'location', location,
+                    'category', category, 'is_indoor', is_indoor, 'is_free', is_free,
+                    'has_parking', has_parking, 'child_friendly', child_friendly,
+                    'weather_dependent', weather_dependent,
+                    'rain_cancellation', rain_cancellation, 'source_url', source_url
+                )) FROM events
+            ''').fetchone()[0]
+            return ('{"events":%s}' % body).encode('utf-8')
+
+        elapsed, size = measure(sqlite_json)
+        print(f"  {'SQLite json_group_array':<28} {elapsed:9.1f} ms  {size:>12,} bytes")
+
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("⏱️ JSONシリアライズ ベンチマーク")
+    print(f"Python {sys.version.split()[0]} / 各計測は{REPEAT}回中の最短値")
+    run_benchmark()
@@ -0,0 +1,242 @@
+"""
+イベントの属性のビットマップインデックス
+
+屋内・無料・駐車場などの真偽値、カテゴリ、市区町村はどれも値の種類が少ないため、
+値ごとに「その値を持つイベントの位置」を1ビットずつ立てた整数（Pythonのint）を持っておく。
+フィルター条件の組み合わせは整数のAND/ORだけで求まり、SQLの走査や行ごとの判定が要らない。
+ビットの位置は id 順に並べたイベントの添字。
+
+読み直しは eventsテーブルの世代番号（filter_cache.bump_generation）が変わったときだけ行い、
+updated_at 列があれば前回以降に更新された行だけを読んでビットを付け替える。
+重複検出（dedupe）で代表でないとされたイベントは duplicates のビットで除外する。
+非アクティブ（is_active = 0）の行も位置は持つが all のビットを立てないので、どの条件でも選ばれない。
+非アクティブ化は updated_at を更新するため、差分の読み直しでビットが外れる。
+"""
+
+import threading
+
+from dedupe import duplicate_event_ids
+from event_model import event_row_factory
+
+# ビットマップを持つ真偽値の列
+FLAG_COLUMNS = ('is_indoor', 'is_free', 'has_parking', 'child_friendly', 'weather_dependent', 'is_active')
+
+# フィルター名 → 対応する列
+FILTER_COLUMNS = {
+    'indoor_only': 'is_indoor',
+    'free_only': 'is_free',
+    'parking_required': 'has_parking',
+    'child_friendly': 'child_friendly'
+}
+
+# 問い合わせのあった市区町村のビットマップを保持する上限（任意の文字列で増え続けないように）
+MAX_CITY_BITMAPS = 64
+
+
+def iter_bits(bits):
+    """立っているビットの位置を小さい順に返す"""
+    text = bin(bits)[:1:-1]
+    position = text.find('1')
+    while position >= 0:
+        yield position
+        position = text.find('1', position + 1)
+
+
+def _cursor(conn, row_factory=None):
+    # 接続の row_factory に関係なく使うカーソル
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory
+    return cursor
+
+
+class BitmapIndex:
+    """eventsテーブルのビットマップインデックス"""
+
+    def __init__(self):
+        self.generation = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.events = []        # 位置 → Event
+        self._slots = {}        # id → 位置
+        self._id_total = 0      # 削除の検出用（id の合計）
+        self._watermark = None  # 読み込んだ行の updated_at の最大値
+        self.all = 0            # アクティブな行
+        self.flags = {column: 0 for column in FLAG_COLUMNS}
+        self.outdoor = 0        # is_indoor が 0 の行（不明は含まない）
+        self.duplicates = 0     # 代表でない（重複した）行
+        self.categories = {}
+        self._cities = {}
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    def refresh(self, conn, generation):
+        """世代番号が変わっていれば読み直す（読み直したら True）"""
+        if generation == self.generation:
+            return False
+        with self._lock:
+            if generation == self.generation:
+                return False
+            if not self._apply_changes(conn):
+                self._rebuild(conn)
+            self._load_duplicates(conn)
+            self.generation = generation
+            self._masks.clear()
+        return True
+
+    def _rebuild(self, conn):
+        """全行を読み込んで作り直す"""
+        self._reset()
+        events = _cursor(conn, event_row_factory).execute('SELECT * FROM events ORDER BY id').fetchall()
+        for event in events:
+            self._put(event)
+
+    def _apply_changes(self, conn):
+        """前回以降に更新された行だけを反映（差分で追えない場合は False）"""
+        if self._watermark is None:
+            return False
+
+        plain = _cursor(conn)
+        count, id_total = plain.execute('SELECT COUNT(*), TOTAL(id) FROM events').fetchone()
+        # 境界の時刻の行は前回読んだものも含めて読み直す（同じ秒の更新を取りこぼさない）
+        changed = _cursor(conn, event_row_factory).execute(
+            'SELECT * FROM events WHERE updated_at >= ? ORDER BY id', (self._watermark,)
+        ).fetchall()
+
+        last_id = self.events[-1].id if self.events else 0
+        new_ids = [event.id for event in changed if event.id not in self._slots]
+        if any(event_id <= last_id for event_id in new_ids):
+            return False
+        # 行が削除されていたら（件数か id の合計が合わない）作り直す
+        if count != len(self.events) + len(new_ids) or id_total != self._id_total + sum(new_ids):
+            return False
+
+        for event in changed:
+            self._put(event)
+        return True
+
+    def _load_duplicates(self, conn):
+        bits = 0
+        for event_id in duplicate_event_ids(_cursor(conn)):
+            slot = self._slots.get(event_id)
+            if slot is not None:
+                bits |= 1 << slot
+        self.duplicates = bits
+
+    def _put(self, event):
+        """1行分のビットを設定（既存の行なら付け替え）"""
+        slot = self._slots.get(event.id)
+        if slot is None:
+            slot = len(self.events)
+            self.events.append(event)
+            self._slots[event.id] = slot
+            self._id_total += event.id
+            old = None
+        else:
+            old = self.events[slot]
+            self.events[slot] = event
+
+        bit = 1 << slot
+        clear = ~bit
+        if event.is_active:
+            self.all |= bit
+        else:
+            self.all &= clear
+        for column in FLAG_COLUMNS:
+            if getattr(event, column):
+                self.flags[column] |= bit
+            else:
+                self.flags[column] &= clear
+        if event.is_indoor is not None and not event.is_indoor:
+            self.outdoor |= bit
+        else:
+            self.outdoor &= clear
+
+        if old is not None and old.category != event.category:
+            remaining = self.categories.get(old.category, 0) & clear
+            if remaining:
+                self.categories[old.category] = remaining
+            else:
+                self.categories.pop(old.category, None)
+        if event.category:
+            self.categories[event.category] = self.categories.get(event.category, 0) | bit
+
+        for city in self._cities:
+            if city in (event.location or ''):
+                self._cities[city] |= bit
+            else:
+                self._cities[city] &= clear
+
+        if event.updated_at and (self._watermark is None or event.updated_at > self._watermark):
+            self._watermark = event.updated_at
+
+    def city_bits(self, city):
+        """開催地（location）に市区町村名を含む行のビットマップ"""
+        with self._lock:
+            bits = self._cities.get(city)
+            if bits is None:
+                bits = 0
+                for slot, event in enumerate(self.events):
+                    if city in (event.location or ''):
+                        bits |= 1 << slot
+                if len(self._cities) < MAX_CITY_BITMAPS:
+                    self._cities[city] = bits
+            return bits
+
+    def mask(self, filters, unknown_as_outdoor=False, include_duplicates=True):
+        """フィルター条件に合う行のビットマップ
+
+        unknown_as_outdoor が True なら屋内かどうか不明な行も outdoor_only に含める
+        （EventFilter.matches_filters の判定）。False は /api/filter の SQL と同じ判定。
+        include_duplicates が False なら代表でない行を除く。
+        """
+        key = (tuple(bool(filters.get(name)) for name in FILTER_COLUMNS),
+               bool(filters.get('outdoor_only')), filters.get('category') or '',
+               filters.get('city') or '', unknown_as_outdoor, include_duplicates)
+        with self._lock:
+            bits = self._masks.get(key)
+            if bits is not None:
+                return bits
+
+            bits = self.all if include_duplicates else self.all & ~self.duplicates
+            for name, column in FILTER_COLUMNS.items():
+                if filters.get(name):
+                    bits &= self.flags[column]
+            if filters.get('outdoor_only'):
+                bits &= (self.all & ~self.flags['is_indoor']) if unknown_as_outdoor else self.outdoor
+            if filters.get('category'):
+                bits &= self.categories.get(filters['category'], 0)
+            if filters.get('city'):
+                bits &= self.city_bits(filters['city'])
+
+            if len(self._masks) < MAX_CITY_BITMAPS * 4:
+                self._masks[key] = bits
+            return bits
+
+    def select(self, filters, include_duplicates=False):
+        """フィルター条件に合うイベント（id 順、既定では同じ催しは代表の1件だけ）"""
+        with self._lock:
+            bits = self.mask(filters, include_duplicates=include_duplicates)
+            return [self.events[slot] for slot in iter_bits(bits)]
+
+    def contains(self, event_id, filters, unknown_as_outdoor=False):
+        """id のイベントが条件に合うか（インデックスに無ければ None）"""
+        with self._lock:
+            slot = self._slots.get(event_id)
+            if slot is None:
+                return None
+            return bool(self.mask(filters, unknown_as_outdoor) >> slot & 1)
+
+    def stats(self):
+        """/health 用の統計"""
+        return {
+            'generation': self.generation,
+            'events': len(self.events),
+            'active': bin(self.all).count('1'),
+            'duplicates': bin(self.duplicates).count('1'),
+            'categories': len(self.categories),
+            'cached_masks': len(self._masks)
+        }
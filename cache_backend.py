@@ -0,0 +1,589 @@
+"""
+キャッシュのバックエンド
+
+天気・イベントフィード・フィルターの各層は CacheBackend のインターフェースだけを使い、
+保存先は環境変数 CACHE_URL で切り替える。
+
+    memory://                   プロセス内のLRU（ワーカー間では共有されない）
+    sqlite:///tmp/cache.db      同じホストの全ワーカーで共有するSQLiteファイル
+    redis://redis:6379/0        Redis（redis-py）
+    redis+local://              Redisと同じコマンドで動くプロセス内の代替（開発・テスト用）
+
+キーは namespace() ごとに接頭辞で分けられ、値はTTL付きで保存する。
+共有する保存先（SQLite・Redis）には bytes はそのまま、それ以外は JSON にして保存する
+（str / 数値 / list / dict だけを保存できる。datetime などは呼び出し側で文字列にする）。
+get_or_set() は同じキーの再計算を1つのプロセスだけが行うようロックを取る（キャッシュスタンピード対策）。
+ロックの値には取得ごとの token を入れ、解放は token が一致するときだけ行う。
+TTLで切れた後に別のプロセスが取り直したロックを、遅れて終わったプロセスが消さないため。
+
+保存先に接続できないとき（Redisの停止など）は警告を出してキャッシュなしで動く
+（get はミス、set は何もしない、get_or_set は loader() を直接呼ぶ）。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# get_or_set で他のプロセスの計算を待つ間隔
+_LOCK_POLL_INTERVAL = 0.05
+
+# 保存先に接続できないときの例外（キャッシュを使わずに続ける）
+BACKEND_ERRORS = (sqlite3.Error, OSError) + ((redis.RedisError,) if redis is not None else ())
+
+# 保存する値の先頭1バイト（b: bytes そのまま、j: JSON）
+_BYTES_TAG = b'b'
+_JSON_TAG = b'j'
+
+
+def encode_value(value):
+    """共有する保存先に書く形式に変換"""
+    if isinstance(value, bytes):
+        return _BYTES_TAG + value
+    if orjson is not None:
+        return _JSON_TAG + orjson.dumps(value)
+    return _JSON_TAG + json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_value(data):
+    """encode_value の逆変換"""
+    data = bytes(data)
+    if data[:1] == _BYTES_TAG:
+        return data[1:]
+    return orjson.loads(data[1:]) if orjson is not None else json.loads(data[1:])
+
+
+class CacheBackend:
+    """キャッシュバックエンドの基底クラス
+
+    サブクラスは _get / _set / _add / _delete / _delete_if / _clear（必要なら _get_many / _set_many）を実装する。
+    キーの接頭辞（名前空間）と統計はこのクラスで扱う。
+    """
+
+    shared = False  # 複数のワーカーから同じ値が見えるか
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()  # ワーカーのスレッド間で統計がずれないように
+
+    def namespace(self, name):
+        """名前空間付きのキャッシュを取得（保存先は共有する）"""
+        return NamespacedCache(self, f'{self.prefix}{name}:')
+
+    def _key(self, key):
+        return f'{self.prefix}{key}'
+
+    def _record(self, hits, misses):
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get(self, key, default=None):
+        """値を取得（無い・期限切れ・保存先に接続できないときは default）"""
+        try:
+            value = self._get(self._key(key))
+        except BACKEND_ERRORS as e:
+            logger.warning("キャッシュを読めませんでした: %s: %s", type(self).__name__, e)
+            value = None
+        self._record(int(value is not None), int(value is None))
+        return default if value is None else value
+
+    def set(self, key, value, ttl=None):
+        """値を保存（ttl 秒で期限切れ。None なら期限なし。保存先に接続できなければ何もしない）"""
+        try:
+            self._set(self._key(key), value, ttl)
+        except BACKEND_ERRORS as e:
+            logger.warning("キャッシュに保存できませんでした: %s: %s", type(self).__name__, e)
+
+    def add(self, key, value, ttl=None):
+        """キーが無い場合だけ保存し、保存したかどうかを返す"""
+        return self._add(self._key(key), value, ttl)
+
+    def delete(self, key):
+        """値を削除"""
+        self._delete(self._key(key))
+
+    def acquire_lock(self, key, ttl):
+        """ロックを取り、解放に使う token を返す（他が持っていれば None）"""
+        token = uuid.uuid4().hex
+        return token if self.add(key, token, ttl=ttl) else None
+
+    def release_lock(self, key, token):
+        """token が一致するときだけロックを解放し、解放したかどうかを返す"""
+        return self._delete_if(self._key(key), token)
+
+    def clear(self):
+        """この名前空間の値をすべて削除"""
+        self._clear(self.prefix)
+
+    def get_many(self, keys):
+        """複数キーの値を取得（見つからないキーは含まない）"""
+        try:
+            stored = self._get_many([self._key(key) for key in keys])
+        except BACKEND_ERRORS as e:
+            logger.warning("キャッシュを読めませんでした: %s: %s", type(self).__name__, e)
+            stored = {}
+        found = {key: stored[self._key(key)] for key in keys if self._key(key) in stored}
+        self._record(len(found), len(keys) - len(found))
+        return found
+
+    def set_many(self, items, ttl=None):
+        """複数キーの値を保存（保存先に接続できなければ何もしない）"""
+        try:
+            self._set_many([(self._key(key), value) for key, value in items], ttl)
+        except BACKEND_ERRORS as e:
+            logger.warning("キャッシュに保存できませんでした: %s: %s", type(self).__name__, e)
+
+    def _get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self._get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def _set_many(self, items, ttl):
+        for key, value in items:
+            self._set(key, value, ttl)
+
+    def get_or_set(self, key, loader, ttl=None, lock_timeout=30, wait=10):
+        """値を取得し、無ければ loader() の結果を保存して返す
+
+        期限切れの直後に複数のリクエストが同時に来ても loader() を呼ぶのは
+        ロックを取れた1つだけで、他は wait 秒まで保存されるのを待つ。
+        保存先に接続できないときは loader() の結果をそのまま返す。
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        try:
+            token = self.acquire_lock(lock_key, lock_timeout)
+        except BACKEND_ERRORS as e:
+            logger.warning("キャッシュのロックを取れませんでした: %s: %s", type(self).__name__, e)
+            return loader()
+
+        if token is not None:
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(key, value, ttl)
+                return value
+            finally:
+                try:
+                    self.release_lock(lock_key, token)
+                except BACKEND_ERRORS as e:
+                    # 解放できなくても lock_timeout 秒で切れる
+                    logger.warning("キャッシュのロックを解放できませんでした: %s: %s", type(self).__name__, e)
+
+        # 他のプロセスが計算中
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(_LOCK_POLL_INTERVAL)
+            try:
+                value = self._get(self._key(key))
+            except BACKEND_ERRORS:
+                break
+            if value is not None:
+                return value
+
+        # 待っても保存されなければ自分で計算する（保存はしない）
+        return loader()
+
+    def stats(self):
+        """ヒット/ミスの統計を取得"""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'backend': type(self).__name__,
+            'shared': self.shared,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else 0.0
+        }
+
+
+class NamespacedCache(CacheBackend):
+    """接頭辞を付けて親のバックエンドに保存するキャッシュ"""
+
+    def __init__(self, parent, prefix):
+        super().__init__(prefix)
+        self.parent = parent
+        self.shared = parent.shared
+
+    def namespace(self, name):
+        return NamespacedCache(self.parent, f'{self.prefix}{name}:')
+
+    def stats(self):
+        stats = super().stats()
+        stats['backend'] = type(self.parent).__name__
+        stats['namespace'] = self.prefix.rstrip(':')
+        return stats
+
+    def _get(self, key):
+        return self.parent._get(key)
+
+    def _set(self, key, value, ttl):
+        self.parent._set(key, value, ttl)
+
+    def _add(self, key, value, ttl):
+        return self.parent._add(key, value, ttl)
+
+    def _delete(self, key):
+        self.parent._delete(key)
+
+    def _delete_if(self, key, value):
+        return self.parent._delete_if(key, value)
+
+    def _clear(self, prefix):
+        self.parent._clear(prefix)
+
+    def _get_many(self, keys):
+        return self.parent._get_many(keys)
+
+    def _set_many(self, items, ttl):
+        self.parent._set_many(items, ttl)
+
+
+class LocalLRUCache(CacheBackend):
+    """プロセス内の上限付きLRUキャッシュ"""
+
+    def __init__(self, maxsize=10000):
+        super().__init__()
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # キー → (値, 期限)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put(self, key, value, ttl):
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def _add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                return False
+            self._put(key, value, ttl)
+            return True
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _delete_if(self, key, value):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != value:
+                return False
+            del self._entries[key]
+            return True
+
+    def _clear(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def _set_many(self, items, ttl):
+        with self._lock:
+            for key, value in items:
+                self._put(key, value, ttl)
+
+
+class SQLiteCache(CacheBackend):
+    """同じホストのワーカー間で共有するSQLiteファイルのキャッシュ"""
+
+    shared = True
+
+    def __init__(self, db_path, max_rows=100000):
+        super().__init__()
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self._local = threading.local()
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        # WAL はファイルに記録されるので、接続ごとに設定しなくてよい
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        """スレッドごとの接続（fork した子プロセスでは親の接続を使わずに作り直す）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = sqlite3.connect(self.db_path, timeout=5)
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _expires_at(ttl):
+        return time.time() + ttl if ttl else None
+
+    def _get(self, key):
+        return self._get_many([key]).get(key)
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        found = {}
+        now = time.time()
+        conn = self._connect()
+        # SQLiteのパラメータ上限を超えないよう分割して問い合わせる
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(f'''
+                SELECT key, value FROM cache_entries
+                WHERE key IN ({','.join('?' * len(chunk))})
+                AND (expires_at IS NULL OR expires_at > ?)
+            ''', (*chunk, now)).fetchall()
+            found.update((key, decode_value(value)) for key, value in rows)
+        return found
+
+    def _set(self, key, value, ttl):
+        self._set_many([(key, value)], ttl)
+
+    def _set_many(self, items, ttl):
+        if not items:
+            return
+        expires_at = self._expires_at(ttl)
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                [(key, encode_value(value), expires_at) for key, value in items]
+            )
+            # 上限を超えた分は期限切れ・古い順に削除（REPLACEで rowid が振り直されるため rowid 順が書き込み順）
+            conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+            conn.execute('''
+                DELETE FROM cache_entries
+                WHERE rowid <= (SELECT MAX(rowid) FROM cache_entries) - ?
+            ''', (self.max_rows,))
+
+    def _add(self, key, value, ttl):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?', (key, time.time()))
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, encode_value(value), self._expires_at(ttl))
+            )
+            return cursor.rowcount == 1
+
+    def _delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def _delete_if(self, key, value):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                'DELETE FROM cache_entries WHERE key = ? AND value = ?', (key, encode_value(value))
+            )
+            return cursor.rowcount == 1
+
+    def _clear(self, prefix):
+        conn = self._connect()
+        with conn:
+            # LIKE の特殊文字を含むキーもあるため範囲で指定する
+            conn.execute(
+                'DELETE FROM cache_entries WHERE key >= ? AND key < ?',
+                (prefix, prefix + '\U0010ffff')
+            )
+
+
+class LocalRedisStandIn:
+    """RedisCache が使うコマンドだけを実装したプロセス内の代替（Redisサーバーが無い環境用）"""
+
+    def __init__(self):
+        self._data = {}  # キー → (値, 期限)
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, name):
+        with self._lock:
+            entry = self._alive(name)
+            return None if entry is None else entry[0]
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, name, value, px=None, nx=False):
+        with self._lock:
+            if nx and self._alive(name) is not None:
+                return None
+            self._data[name] = (value, time.monotonic() + px / 1000 if px else None)
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def release_lock(self, name, value):
+        """値が一致するときだけ削除する（Redisでは _COMPARE_AND_DELETE のスクリプトで行う処理）"""
+        with self._lock:
+            entry = self._alive(name)
+            if entry is None or entry[0] != value:
+                return 0
+            del self._data[name]
+            return 1
+
+    def scan_iter(self, match=None, count=None):
+        prefix = match[:-1] if match and match.endswith('*') else match
+        with self._lock:
+            keys = list(self._data)
+        return iter([key for key in keys if prefix is None or key.startswith(prefix)])
+
+    def pipeline(self, transaction=True):
+        return _StandInPipeline(self)
+
+
+class _StandInPipeline:
+    """LocalRedisStandIn 用のパイプライン（コマンドを順に実行するだけ）"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def set(self, *args, **kwargs):
+        self.commands.append((self.client.set, args, kwargs))
+        return self
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+# 値が一致するときだけ削除する（GET と DEL の間に他のプロセスが取り直しても消さない）
+_COMPARE_AND_DELETE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisCache(CacheBackend):
+    """Redisのキャッシュ（redis-py 互換のクライアントを使う）"""
+
+    shared = True
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url):
+        if redis is None:
+            raise RuntimeError('redis パッケージがインストールされていません')
+        return cls(redis.Redis.from_url(url))
+
+    @staticmethod
+    def _ttl_ms(ttl):
+        return int(ttl * 1000) if ttl else None
+
+    def _get(self, key):
+        value = self.client.get(key)
+        return None if value is None else decode_value(value)
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        values = self.client.mget(keys)
+        return {key: decode_value(value) for key, value in zip(keys, values) if value is not None}
+
+    def _set(self, key, value, ttl):
+        self.client.set(key, encode_value(value), px=self._ttl_ms(ttl))
+
+    def _set_many(self, items, ttl):
+        if not items:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items:
+            pipeline.set(key, encode_value(value), px=self._ttl_ms(ttl))
+        pipeline.execute()
+
+    def _add(self, key, value, ttl):
+        return bool(self.client.set(key, encode_value(value), px=self._ttl_ms(ttl), nx=True))
+
+    def _delete(self, key):
+        self.client.delete(key)
+
+    def _delete_if(self, key, value):
+        if isinstance(self.client, LocalRedisStandIn):
+            return bool(self.client.release_lock(key, encode_value(value)))
+        return bool(self.client.eval(_COMPARE_AND_DELETE, 1, key, encode_value(value)))
+
+    def _clear(self, prefix):
+        keys = list(self.client.scan_iter(match=f'{prefix}*', count=500))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_cache_backend(url=None):
+    """URL（省略時は環境変数 CACHE_URL）からキャッシュバックエンドを作成"""
+    url = url or os.getenv('CACHE_URL', 'memory://')
+    parsed = urlparse(url)
+
+    if parsed.scheme == 'memory':
+        return LocalLRUCache(maxsize=int(os.getenv('CACHE_MAXSIZE', '10000')))
+    if parsed.scheme == 'sqlite':
+        # sqlite:///tmp/cache.db → /tmp/cache.db、sqlite://cache.db → cache.db
+        return SQLiteCache(parsed.path if parsed.path else parsed.netloc)
+    if parsed.scheme in ('redis', 'rediss'):
+        return RedisCache.from_url(url)
+    if parsed.scheme == 'redis+local':
+        return RedisCache(LocalRedisStandIn())
+    raise ValueError(f'未対応のキャッシュURLです: {url}')
+
+
+default_cache = create_cache_backend()
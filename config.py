@@ -31,6 +31,17 @@ class Config:
     
     # データベース設定
     DATABASE_URL = os.getenv('DATABASE_URL', 'events.db')
+    CONTENT_DATABASE_URL = os.getenv('CONTENT_DATABASE_URL', 'content.db')
+    # 保持期間を過ぎた行の移動先（retention.py）
+    ARCHIVE_DATABASE_URL = os.getenv('ARCHIVE_DATABASE_URL', 'archive.db')
+    
+    # データ保持期間（日）
+    EVENT_RETENTION_DAYS = int(os.getenv('EVENT_RETENTION_DAYS', '180'))  # 非アクティブなイベント
+    CONTENT_RETENTION_DAYS = int(os.getenv('CONTENT_RETENTION_DAYS', '365'))
+    SCRAPING_LOG_RETENTION_DAYS = int(os.getenv('SCRAPING_LOG_RETENTION_DAYS', '90'))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '500'))
+    # 削除したイベントの記録を残す日数（これより古い /api/events?since= には全件を返す）
+    EVENT_CHANGES_MAX_AGE_DAYS = int(os.getenv('EVENT_CHANGES_MAX_AGE_DAYS', '7'))
     
     # API設定
     OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', 'your_api_key_here')
@@ -43,10 +54,17 @@ class Config:
     
     # キャッシュ設定
     WEATHER_CACHE_DURATION = int(os.getenv('WEATHER_CACHE_DURATION', '3600'))  # 1時間
+    # 期限切れ前に更新が終わるよう、既定ではキャッシュ有効期間の半分の間隔で予報を取得する
+    WEATHER_PREFETCH_INTERVAL = int(os.getenv('WEATHER_PREFETCH_INTERVAL', str(WEATHER_CACHE_DURATION // 2)))
+    # イベントフィード（/api/events）をキャッシュする秒数
+    FEED_CACHE_TTL = int(os.getenv('FEED_CACHE_TTL', '60'))
+    # /api/filter の結果をキャッシュする秒数（イベントが更新されると世代番号で無効になる）
+    FILTER_CACHE_TTL = int(os.getenv('FILTER_CACHE_TTL', '3600'))
     
     # ログ設定
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))  # DEBUGログを出力する割合
     
     # セキュリティ設定
     SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
@@ -69,6 +87,43 @@ class Config:
         '坂東市'
     ]
 
+    # /api/events/nearby の検索半径（km）
+    NEARBY_DEFAULT_RADIUS_KM = 5
+    NEARBY_MAX_RADIUS_KM = 50
+
+    # 天気APIで使う各都市の検索クエリ
+    CITY_WEATHER_QUERIES = {
+        'つくばみらい市': 'Tsukubamirai,Japan',
+        'つくば市': 'Tsukuba,Japan',
+        '守谷市': 'Moriya,Japan',
+        '常総市': 'Joso,Japan',
+        '取手市': 'Toride,Japan',
+        '龍ケ崎市': 'Ryugasaki,Japan',
+        '古河市': 'Koga,Ibaraki,Japan',
+        '坂東市': 'Bando,Japan'
+    }
+
+    # バックグラウンドタスク（tasks.py / Celery）
+    CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/1')
+    CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/2')
+    # true ならブローカーを使わずに呼び出し元でタスクを実行（テスト・開発用）
+    CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
+    # 同じ市のサイトへ同時にスクレイピングする数と、開始の間隔（秒）。どちらも全ワーカーで共有する
+    SCRAPE_HOST_CONCURRENCY = int(os.getenv('SCRAPE_HOST_CONCURRENCY', '1'))
+    SCRAPE_HOST_INTERVAL = float(os.getenv('SCRAPE_HOST_INTERVAL', '6'))
+    # コンテンツ更新タスクの実行数の上限（Celery の rate_limit なのでワーカーごと）
+    SCRAPE_RATE_LIMIT = os.getenv('SCRAPE_RATE_LIMIT', '10/m')
+
+    # /readyz: バックグラウンドで確認する間隔と、degraded と表示する鮮度の上限（秒）
+    READINESS_CHECK_INTERVAL = int(os.getenv('READINESS_CHECK_INTERVAL', '15'))
+    READY_MAX_SCRAPE_AGE = int(os.getenv('READY_MAX_SCRAPE_AGE', '172800'))  # 2日
+    READY_MAX_WEATHER_AGE = int(os.getenv('READY_MAX_WEATHER_AGE', str(WEATHER_CACHE_DURATION * 2)))
+
+    # 複数都市の天気をバックグラウンドで取得する間隔
+    WEATHER_REFRESH_INTERVAL = int(os.getenv('WEATHER_REFRESH_INTERVAL', '600'))  # 10分
+    # WeatherAPI.comのBulkリクエスト（有料プラン）を使う場合は true
+    WEATHERAPI_BULK = os.getenv('WEATHERAPI_BULK', 'False').lower() == 'true'
+
 class DevelopmentConfig(Config):
     """開発環境設定"""
     DEBUG = True
@@ -6,7 +6,6 @@ import re
 import time
 import schedule
 import logging
-import json
 import os
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -14,6 +13,10 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
+from content_export import export_content
+from content_store import ContentStore
+from dedupe import MinHashLSH, event_city, find_cluster
+from migrations import migrate
 
 # ログ設定
 logging.basicConfig(
@@ -28,7 +31,9 @@ logging.basicConfig(
 class ContentAutoUpdater:
     def __init__(self):
         self.db_path = 'content.db'
-        self.init_database()
+        self.store = ContentStore(self.db_path)
+        # 市のサイトから取得したイベント（季節イベントの重複チェック用）
+        self.events_db_path = 'events.db'
         
         # 地域特集コンテンツのソース
         self.seasonal_sources = {
@@ -121,90 +126,8 @@ class ContentAutoUpdater:
         }
     
     def init_database(self):
-        """データベース初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 季節イベントテーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS seasonal_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # グルメ情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS food_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 子育て情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS childcare_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 観光情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tourism_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 文化施設情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS culture_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """データベースを最新のスキーマにする（単独で実行するとき用。通常はデプロイ時に migrations.py で済ませる）"""
+        migrate(self.db_path, 'content')
     
     def scrape_seasonal_events(self):
         """季節イベントのスクレイピング"""
@@ -218,9 +141,8 @@ class ContentAutoUpdater:
                 # ここではサンプルデータを生成
                 sample_events = self.generate_sample_seasonal_events(source_id, source)
                 
-                for event in sample_events:
-                    self.save_seasonal_event(event)
-                    self.stats['seasonal_events'] += 1
+                self.store.save_many('seasonal_events', sample_events)
+                self.stats['seasonal_events'] += len(sample_events)
                 
                 time.sleep(2)  # レート制限対策
                 
@@ -241,9 +163,8 @@ class ContentAutoUpdater:
                 # ここではサンプルデータを生成
                 sample_food = self.generate_sample_food_info(source_id, source)
                 
-                for food in sample_food:
-                    self.save_food_info(food)
-                    self.stats['food_info'] += 1
+                self.store.save_many('food_info', sample_food)
+                self.stats['food_info'] += len(sample_food)
                 
                 time.sleep(2)
                 
@@ -264,9 +185,8 @@ class ContentAutoUpdater:
                 # ここではサンプルデータを生成
                 sample_childcare = self.generate_sample_childcare_info(source_id, source)
                 
-                for childcare in sample_childcare:
-                    self.save_childcare_info(childcare)
-                    self.stats['childcare_info'] += 1
+                self.store.save_many('childcare_info', sample_childcare)
+                self.stats['childcare_info'] += len(sample_childcare)
                 
                 time.sleep(2)
                 
@@ -287,9 +207,8 @@ class ContentAutoUpdater:
                 # ここではサンプルデータを生成
                 sample_tourism = self.generate_sample_tourism_info(source_id, source)
                 
-                for tourism in sample_tourism:
-                    self.save_tourism_info(tourism)
-                    self.stats['tourism_info'] += 1
+                self.store.save_many('tourism_info', sample_tourism)
+                self.stats['tourism_info'] += len(sample_tourism)
                 
                 time.sleep(2)
                 
@@ -310,9 +229,8 @@ class ContentAutoUpdater:
                 # ここではサンプルデータを生成
                 sample_culture = self.generate_sample_culture_info(source_id, source)
                 
-                for culture in sample_culture:
-                    self.save_culture_info(culture)
-                    self.stats['culture_info'] += 1
+                self.store.save_many('culture_info', sample_culture)
+                self.stats['culture_info'] += len(sample_culture)
                 
                 time.sleep(2)
                 
@@ -428,178 +346,44 @@ class ContentAutoUpdater:
             }
         ]
     
-    def save_seasonal_event(self, event):
-        """季節イベントをデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO seasonal_events 
-            (title, description, date, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (event['title'], event['description'], event['date'], 
-              event['location'], event['category'], event['city'], event['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_food_info(self, food):
-        """グルメ情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO food_info 
-            (title, description, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (food['title'], food['description'], food['location'], 
-              food['category'], food['city'], food['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_childcare_info(self, childcare):
-        """子育て情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO childcare_info 
-            (title, description, date, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (childcare['title'], childcare['description'], childcare['date'], 
-              childcare['location'], childcare['category'], childcare['city'], childcare['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_tourism_info(self, tourism):
-        """観光情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO tourism_info 
-            (title, description, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (tourism['title'], tourism['description'], tourism['location'], 
-              tourism['category'], tourism['city'], tourism['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_culture_info(self, culture):
-        """文化施設情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO culture_info 
-            (title, description, date, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (culture['title'], culture['description'], culture['date'], 
-              culture['location'], culture['category'], culture['city'], culture['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
     def export_to_json(self):
-        """データベースの内容をJSONファイルにエクスポート"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 各テーブルのデータを取得
-        cursor.execute('SELECT * FROM seasonal_events ORDER BY created_at DESC LIMIT 20')
-        seasonal_events = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM food_info ORDER BY created_at DESC LIMIT 20')
-        food_info = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM childcare_info ORDER BY created_at DESC LIMIT 20')
-        childcare_info = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM tourism_info ORDER BY created_at DESC LIMIT 20')
-        tourism_info = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM culture_info ORDER BY created_at DESC LIMIT 20')
-        culture_info = cursor.fetchall()
-        
-        conn.close()
-        
-        # JSONファイルに出力
-        content_data = {
-            'seasonal_events': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'date': row[3],
-                    'location': row[4],
-                    'category': row[5],
-                    'city': row[6],
-                    'source_url': row[7],
-                    'created_at': row[8]
-                } for row in seasonal_events
-            ],
-            'food_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'location': row[3],
-                    'category': row[4],
-                    'city': row[5],
-                    'source_url': row[6],
-                    'created_at': row[7]
-                } for row in food_info
-            ],
-            'childcare_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'date': row[3],
-                    'location': row[4],
-                    'category': row[5],
-                    'city': row[6],
-                    'source_url': row[7],
-                    'created_at': row[8]
-                } for row in childcare_info
-            ],
-            'tourism_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'location': row[3],
-                    'category': row[4],
-                    'city': row[5],
-                    'source_url': row[6],
-                    'created_at': row[7]
-                } for row in tourism_info
-            ],
-            'culture_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'date': row[3],
-                    'location': row[4],
-                    'category': row[5],
-                    'city': row[6],
-                    'source_url': row[7],
-                    'created_at': row[8]
-                } for row in culture_info
-            ],
-            'stats': self.stats,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        with open('api/content.json', 'w', encoding='utf-8') as f:
-            json.dump(content_data, f, ensure_ascii=False, indent=2)
+        """データベースの内容をJSONファイルにエクスポート（api/content.json と種類 × 市ごとの分割ファイル）"""
+        # 季節イベントは同じ催しを1件にまとめる
+        export_content(self.db_path, 'api', limit=20,
+                       transforms={'seasonal_events': self.dedupe_seasonal_events},
+                       extra={'stats': self.stats})
         
         logging.info("コンテンツデータをJSONファイルにエクスポート完了")
     
+    def dedupe_seasonal_events(self, items):
+        """季節イベント同士と、市のサイトから取得済みのイベントとの重複を除く"""
+        # 照合は1つの接続で行う（季節イベントごとに接続し直さない）
+        events_conn = sqlite3.connect(self.events_db_path, timeout=5)
+        
+        lsh = MinHashLSH()
+        unique = []
+        try:
+            for item in items:
+                if lsh.add(item.id, item.title, item.date, event_city(item.location, item.city)) is not None:
+                    continue
+                if events_conn is not None:
+                    try:
+                        if find_cluster(events_conn, item.title, item.date, item.location, item.city) is not None:
+                            continue
+                    except sqlite3.Error as e:
+                        # 未作成・マイグレーション前のイベントDB
+                        logging.warning(f"イベントDBを参照できないため季節イベント同士だけで重複を除きます: {e}")
+                        events_conn.close()
+                        events_conn = None
+                unique.append(item)
+        finally:
+            if events_conn is not None:
+                events_conn.close()
+        
+        if len(unique) < len(items):
+            logging.info(f"重複した季節イベントを除外: {len(items) - len(unique)}件")
+        return unique
+    
     def run_full_update(self):
         """全コンテンツの更新を実行"""
         logging.info("全コンテンツの自動更新を開始")
@@ -635,6 +419,7 @@ class ContentAutoUpdater:
 
 if __name__ == "__main__":
     updater = ContentAutoUpdater()
+    updater.init_database()
     
     # 初回実行
     updater.run_full_update()
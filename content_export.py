@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+地域特集コンテンツの静的JSONの書き出し（種類 × 市ごとの分割）
+
+フロントエンドは小さな目次（api/content/index.json）を読み、表示している種類・市の
+ファイルだけを取得する。全件入りの api/content.json は従来の利用者向けに引き続き書き出す。
+
+    api/content/index.json                  種類ごとの市の一覧・件数・ファイルの場所・版
+    api/content/<種類>/all.json             種類ごとの新着（市の絞り込みなし）
+    api/content/<種類>/<市のID>.json        種類 × 市の新着（市のIDは gazetteer の place_id の先頭）
+
+- 版（version）は全ファイルの内容のハッシュで、フロントエンドは ?v= に付けて取得する
+  （内容が変わらなければ同じURLになり、ブラウザ・CDN のキャッシュが使える）。
+- ファイルは一時ファイルに書いてから置き換えるため、書き出し中に読まれても壊れたJSONにならない。
+- 静的サイト（GitHub Pages）で配信するため書き出したファイルはコミットしている。api/content.json と
+  api/content/ は必ずこのスクリプトで一緒に書き出し、片方だけを更新しない（test_content_store で確認している）。
+
+    python content_export.py --db content.db --out api
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+from content_store import CONTENT_KINDS, DEFAULT_LIMIT, ContentStore
+from gazetteer import CITY_HALLS, normalize_name
+
+logger = logging.getLogger(__name__)
+
+ALL = 'all'
+OTHER = 'other'
+
+# 正規化した市の名前 → (市のID, 表示名)
+_CITIES = {normalize_name(hall.city): (hall.place_id.split('/')[0], hall.city) for hall in CITY_HALLS}
+
+
+def city_slug(city):
+    """コンテンツの市（'つくば市'・'守谷市季節イベント' など）→ 市のID（対象外は 'other'）"""
+    name = normalize_name(city or '')
+    # 'つくば市' が 'つくばみらい市' に一致しないよう、長い名前から照合する
+    for key in sorted(_CITIES, key=len, reverse=True):
+        if key in name:
+            return _CITIES[key][0]
+    return OTHER
+
+
+def build_partitions(store, limit=DEFAULT_LIMIT, transforms=None):
+    """{(種類, 市のID または 'all'): [ContentItem]} を作成
+
+    transforms は {種類: 一覧を受け取って絞り込んだ一覧を返す関数}（季節イベントの重複除去など）。
+    """
+    transforms = transforms or {}
+    partitions = {}
+    for kind, items in store.latest(limit=limit).items():
+        partitions[(kind, ALL)] = items
+    for (kind, city), items in store.latest_by_city(limit=limit).items():
+        partitions.setdefault((kind, city_slug(city)), []).extend(items)
+
+    for key, items in partitions.items():
+        # 同じ市のIDにまとめた複数の表記を新着順に並べ直す
+        items.sort(key=lambda item: (item.created_at or '', item.id), reverse=True)
+        del items[limit:]
+        transform = transforms.get(key[0])
+        if transform:
+            partitions[key] = transform(items)
+    return partitions
+
+
+def _write_json(path, data, indent=None):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        if indent is None:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(temporary, path)
+
+
+def write_partitions(partitions, out_dir='api', extra=None):
+    """分割したファイルと目次・api/content.json を書き出して目次を返す"""
+    generated_at = datetime.now().isoformat()
+    bodies = {
+        key: [item.to_dict() for item in items]
+        for key, items in sorted(partitions.items())
+    }
+    version = hashlib.sha1(
+        json.dumps(sorted(bodies.items()), ensure_ascii=False).encode('utf-8')
+    ).hexdigest()[:12]
+
+    index = {
+        'version': version,
+        'generated_at': generated_at,
+        'cities': {slug: name for slug, name in _CITIES.values()},
+        'kinds': {kind: {'all': None, 'cities': {}} for kind in CONTENT_KINDS}
+    }
+    written = set()
+    for (kind, city), items in bodies.items():
+        path = f'content/{kind}/{city}.json'
+        _write_json(os.path.join(out_dir, path), {'kind': kind, 'city': city, 'items': items})
+        written.add(os.path.normpath(os.path.join(out_dir, path)))
+        entry = {'path': path, 'count': len(items)}
+        if city == ALL:
+            index['kinds'][kind]['all'] = entry
+        else:
+            index['kinds'][kind]['cities'][city] = entry
+
+    # 前回あって今回無くなった市のファイルを削除
+    for kind in CONTENT_KINDS:
+        kind_dir = os.path.join(out_dir, 'content', kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for name in os.listdir(kind_dir):
+            path = os.path.normpath(os.path.join(kind_dir, name))
+            if name.endswith('.json') and path not in written:
+                os.remove(path)
+
+    _write_json(os.path.join(out_dir, 'content', 'index.json'), index)
+
+    # 従来の全件入りのJSON（種類ごとの all と同じ内容）
+    content_data = {kind: bodies.get((kind, ALL), []) for kind in CONTENT_KINDS}
+    content_data.update(extra or {})
+    content_data['timestamp'] = generated_at
+    _write_json(os.path.join(out_dir, 'content.json'), content_data, indent=2)
+
+    logger.info("コンテンツを書き出しました: %dファイル（版 %s）", len(bodies), version)
+    return index
+
+
+def export_content(db_path='content.db', out_dir='api', limit=DEFAULT_LIMIT, transforms=None, extra=None):
+    """コンテンツDBから分割ファイル・目次・api/content.json を書き出す"""
+    partitions = build_partitions(ContentStore(db_path), limit, transforms)
+    return write_partitions(partitions, out_dir, extra)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='地域特集コンテンツを種類 × 市ごとのJSONに書き出す')
+    parser.add_argument('--db', default='content.db')
+    parser.add_argument('--out', default='api')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = export_content(args.db, args.out, args.limit)
+    for kind, entry in index['kinds'].items():
+        cities = ', '.join(f"{city}:{city_entry['count']}" for city, city_entry in entry['cities'].items())
+        print(f"{kind}: {entry['all']['count'] if entry['all'] else 0}件 ({cities})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+地域特集コンテンツの保存と読み出し
+
+季節イベント・グルメ・子育て・観光・文化施設は、種類（kind）の列を持つ
+content_items テーブル1つに保存する（テーブルは migrations.py で作成）。
+書き出し・API は種類ごとの最新 N 件を1回のクエリで読む。
+
+- 一意キーは (種類, タイトル, URL)。再取得したときは内容（content_hash）が変わった行だけを更新し、
+  created_at（新着順の並び）は最初に保存したときのままにする。
+- 開催日の無い種類（グルメ・観光）は date が NULL になる。
+"""
+
+import hashlib
+import sqlite3
+from dataclasses import dataclass, fields
+from typing import Optional
+
+# 種類（ContentAutoUpdater.scrape_<種類> と api/content.json のキー）
+CONTENT_KINDS = ('seasonal_events', 'food_info', 'childcare_info', 'tourism_info', 'culture_info')
+
+# 開催日のある種類
+DATED_KINDS = frozenset(['seasonal_events', 'childcare_info', 'culture_info'])
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+CONTENT_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS content_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        city TEXT,
+        title TEXT NOT NULL,
+        description TEXT,
+        date TEXT,
+        location TEXT,
+        category TEXT,
+        source_url TEXT NOT NULL DEFAULT '',
+        content_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (kind, title, source_url)
+    )
+    ''',
+    # 種類ごとの新着順（書き出し・/api/content）
+    'CREATE INDEX IF NOT EXISTS idx_content_items_kind_created ON content_items (kind, created_at DESC, id DESC)',
+    # 種類 × 市の新着順（/api/content?city=）
+    '''
+    CREATE INDEX IF NOT EXISTS idx_content_items_kind_city_created
+    ON content_items (kind, city, created_at DESC, id DESC)
+    ''',
+    # 保持期間の判定（retention.py）
+    'CREATE INDEX IF NOT EXISTS idx_content_items_updated_at ON content_items (updated_at)',
+)
+
+
+@dataclass(slots=True)
+class ContentItem:
+    """content_items テーブルの1行"""
+    id: Optional[int] = None
+    kind: str = ''
+    city: Optional[str] = None
+    title: str = ''
+    description: Optional[str] = None
+    date: Optional[str] = None
+    location: Optional[str] = None
+    category: Optional[str] = None
+    source_url: str = ''
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+    def to_dict(self):
+        """api/content.json の1件"""
+        return {name: getattr(self, name) for name in ITEM_FIELDS if name not in ('kind', 'updated_at')}
+
+
+ITEM_FIELDS = tuple(f.name for f in fields(ContentItem))
+_COLUMNS = ', '.join(ITEM_FIELDS)
+
+
+def content_hash(item):
+    """一意キー以外の内容のハッシュ（変わっていなければ更新しない）"""
+    values = [item.get(name) or '' for name in ('city', 'description', 'date', 'location', 'category')]
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+
+def create_content_tables(conn):
+    """content_items テーブルとインデックスを作成（migrations.py から呼ばれる）"""
+    for statement in CONTENT_SCHEMA:
+        conn.execute(statement)
+
+
+def save_items(conn, kind, items):
+    """コンテンツを保存して、追加・更新した件数を返す（呼び出し側のトランザクション内で実行する）"""
+    if kind not in CONTENT_KINDS:
+        raise ValueError(f"未対応のコンテンツです: {kind}")
+    changed = 0
+    for item in items:
+        date = item.get('date') if kind in DATED_KINDS else None
+        cursor = conn.execute('''
+            INSERT INTO content_items
+            (kind, city, title, description, date, location, category, source_url, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (kind, title, source_url) DO UPDATE SET
+                city = excluded.city,
+                description = excluded.description,
+                date = excluded.date,
+                location = excluded.location,
+                category = excluded.category,
+                content_hash = excluded.content_hash,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE content_hash != excluded.content_hash
+        ''', (kind, item.get('city'), item['title'], item.get('description'), date,
+              item.get('location'), item.get('category'), item.get('source_url') or '',
+              content_hash(dict(item, date=date))))
+        changed += cursor.rowcount
+    return changed
+
+
+def latest_items(conn, kinds=CONTENT_KINDS, city=None, limit=DEFAULT_LIMIT):
+    """種類ごとの新着 limit 件を {種類: [ContentItem]} で返す（1回のクエリ）"""
+    kinds = tuple(kinds)
+    placeholders = ', '.join('?' * len(kinds))
+    where = f'kind IN ({placeholders})'
+    params = list(kinds)
+    if city:
+        where += ' AND city = ?'
+        params.append(city)
+    params.append(limit)
+
+    result = {kind: [] for kind in kinds}
+    rows = conn.execute(f'''
+        SELECT {_COLUMNS} FROM (
+            SELECT {_COLUMNS},
+                   ROW_NUMBER() OVER (PARTITION BY kind ORDER BY created_at DESC, id DESC) AS position
+            FROM content_items WHERE {where}
+        )
+        WHERE position <= ?
+        ORDER BY kind, position
+    ''', params)
+    for row in rows:
+        item = ContentItem(*row)
+        result[item.kind].append(item)
+    return result
+
+
+def latest_items_by_city(conn, limit=DEFAULT_LIMIT):
+    """種類 × 市ごとの新着 limit 件を {(種類, 市): [ContentItem]} で返す（1回のクエリ）"""
+    result = {}
+    rows = conn.execute(f'''
+        SELECT {_COLUMNS} FROM (
+            SELECT {_COLUMNS},
+                   ROW_NUMBER() OVER (PARTITION BY kind, city ORDER BY created_at DESC, id DESC) AS position
+            FROM content_items
+        )
+        WHERE position <= ?
+        ORDER BY kind, city, position
+    ''', (limit,))
+    for row in rows:
+        item = ContentItem(*row)
+        result.setdefault((item.kind, item.city), []).append(item)
+    return result
+
+
+class ContentStore:
+    """コンテンツDB（content.db・real_content*.db）の読み書き"""
+
+    def __init__(self, db_path='content.db'):
+        self.db_path = db_path
+
+    def _connect(self):
+        # テーブルは migrations.py で作成している
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def save(self, kind, item):
+        """1件を保存（内容が変わっていなければ書き込まない）"""
+        return self.save_many(kind, [item]) > 0
+
+    def save_many(self, kind, items):
+        """まとめて1トランザクションで保存して、追加・更新した件数を返す"""
+        conn = self._connect()
+        try:
+            with conn:
+                return save_items(conn, kind, items)
+        finally:
+            conn.close()
+
+    def latest(self, kinds=CONTENT_KINDS, city=None, limit=DEFAULT_LIMIT):
+        """種類ごとの新着 limit 件"""
+        conn = self._connect()
+        try:
+            return latest_items(conn, kinds, city, limit)
+        finally:
+            conn.close()
+
+    def latest_by_city(self, limit=DEFAULT_LIMIT):
+        """種類 × 市ごとの新着 limit 件"""
+        conn = self._connect()
+        try:
+            return latest_items_by_city(conn, limit)
+        finally:
+            conn.close()
+
+
+def backfill_content_items(conn, tables):
+    """種類ごとのテーブル（移行前）の行を content_items に移す"""
+    for kind in tables:
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({kind})')}
+        date = 'date' if 'date' in columns else 'NULL'
+        rows = conn.execute(f'''
+            SELECT city, title, description, {date}, location, category, source_url, created_at, updated_at
+            FROM {kind} ORDER BY id
+        ''').fetchall()
+        for city, title, description, date_value, location, category, source_url, created_at, updated_at in rows:
+            item = {'city': city, 'description': description, 'date': date_value,
+                    'location': location, 'category': category}
+            conn.execute('''
+                INSERT OR IGNORE INTO content_items
+                (kind, city, title, description, date, location, category, source_url,
+                 content_hash, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (kind, city, title, description, date_value, location, category, source_url or '',
+                  content_hash(item), created_at, updated_at))
@@ -0,0 +1,257 @@
+"""
+イベントの重複検出（MinHash + LSH）
+
+同じ催しが複数の市のサイトや季節イベントとして別々に掲載されるため、
+正規化したタイトルの文字2-gramの MinHash で近いものを同じクラスタにまとめる。
+
+- 署名を NUM_BANDS 個のバンドに分け、(開催日, バンド番号, バンドの値) のハッシュで索引する。
+  重複の候補は同じ開催日で少なくとも1つのバンドが一致するイベントだけなので、
+  新しいイベントの照合は全件との比較にならない。
+- 候補は署名の一致率（Jaccard係数の推定値）が DUPLICATE_THRESHOLD 以上で、
+  開催地の市が分かっている場合は同じ市のものだけを重複とみなす。
+- クラスタIDは最初に保存されたイベントの id。代表イベントはクラスタ内のアクティブなイベントのうち
+  id が最小のもので、問い合わせのたびに決める（代表が非アクティブ化・削除されたら次の行が代表になる）。
+  APIは代表イベントだけを返す。
+"""
+
+import random
+import re
+import sqlite3
+import unicodedata
+import zlib
+from array import array
+
+from gazetteer import normalize_location
+
+NUM_PERM = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+DUPLICATE_THRESHOLD = 0.6
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# 署名はDBに保存するため、プロセスによらず同じ係数を使う
+_rng = random.Random(20250801)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# 年・回数・記号など、掲載元によって付いたり付かなかったりする部分
+_NOISE = re.compile(r'(?:19|20)\d{2}年?|令和\d+年|第\d+回|[\W_]+')
+
+
+def normalize_title(title):
+    """比較用のタイトル"""
+    text = unicodedata.normalize('NFKC', title or '').lower()
+    return _NOISE.sub('', text.replace('ヶ', 'ケ'))
+
+
+def shingles(text, size=2):
+    """文字 n-gram の集合（短いタイトルはそのまま）"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(title):
+    """タイトルの MinHash 署名"""
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(normalize_title(title))]
+    if not hashes:
+        return array('I', [_MAX_HASH] * NUM_PERM)
+    return array('I', [min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH for a, b in _PERMUTATIONS])
+
+
+def band_keys(signature, date):
+    """LSHのバンドごとのキー（同じ開催日の中だけで照合する）"""
+    keys = []
+    for band in range(NUM_BANDS):
+        values = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys.append(zlib.crc32(f'{date}:{band}:'.encode('utf-8') + values.tobytes()))
+    return keys
+
+
+def similarity(signature, other):
+    """署名の一致率（Jaccard係数の推定値）"""
+    return sum(1 for a, b in zip(signature, other) if a == b) / NUM_PERM
+
+
+def event_city(location, source_city=None):
+    """開催地の市（分からなければ None）"""
+    place = normalize_location(location, source_city)
+    return place.city if place else None
+
+
+def is_same_event(signature, city, other_signature, other_city):
+    """署名と市から同じ催しかを判定"""
+    if city and other_city and city != other_city:
+        return False
+    return similarity(signature, other_signature) >= DUPLICATE_THRESHOLD
+
+
+class MinHashLSH:
+    """メモリ上の LSH（DBに保存しない一覧の重複除去用）"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._entries = {}
+
+    def add(self, key, title, date, city=None):
+        """登録して、同じ催しとみなした登録済みのキー（無ければ None）を返す"""
+        signature = minhash(title)
+        keys = band_keys(signature, date)
+        duplicate_of = None
+        for candidate in {k for band_key in keys for k in self._buckets.get(band_key, ())}:
+            other_signature, other_city = self._entries[candidate]
+            if is_same_event(signature, city, other_signature, other_city):
+                duplicate_of = candidate
+                break
+
+        self._entries[key] = (signature, city)
+        for band_key in keys:
+            self._buckets.setdefault(band_key, []).append(key)
+        return duplicate_of
+
+
+DEDUPE_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS event_clusters (
+        event_id INTEGER PRIMARY KEY,
+        cluster_id INTEGER NOT NULL,
+        city TEXT,
+        signature BLOB NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_event_clusters_cluster_id ON event_clusters (cluster_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS event_lsh (
+        band_key INTEGER NOT NULL,
+        event_id INTEGER NOT NULL,
+        PRIMARY KEY (band_key, event_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_event_lsh_event_id ON event_lsh (event_id)',
+)
+
+
+def create_dedupe_tables(conn):
+    """重複検出のテーブルを作成（migrations.py から呼ばれる）"""
+    for statement in DEDUPE_SCHEMA:
+        conn.execute(statement)
+
+
+def find_cluster(conn, title, date, location=None, source_city=None, exclude_id=None):
+    """同じ催しのクラスタID（無ければ None）"""
+    cluster_id, _, _, _ = _find_cluster(conn, title, date, location, source_city, exclude_id)
+    return cluster_id
+
+
+def _find_cluster(conn, title, date, location, source_city, exclude_id):
+    signature = minhash(title)
+    city = event_city(location, source_city)
+    keys = band_keys(signature, date)
+
+    candidates = conn.execute(f'''
+        SELECT DISTINCT c.event_id, c.cluster_id, c.city, c.signature
+        FROM event_lsh AS l JOIN event_clusters AS c ON c.event_id = l.event_id
+        WHERE l.band_key IN ({', '.join('?' * len(keys))})
+        ORDER BY c.cluster_id
+    ''', keys).fetchall()
+
+    for event_id, cluster_id, other_city, blob in candidates:
+        if event_id == exclude_id:
+            continue
+        other_signature = array('I')
+        other_signature.frombytes(blob)
+        if is_same_event(signature, city, other_signature, other_city):
+            return cluster_id, signature, city, keys
+    return None, signature, city, keys
+
+
+def assign_cluster(conn, event_id, title, date, location=None, source_city=None):
+    """イベントをクラスタに登録してクラスタIDを返す（呼び出し側のトランザクション内で実行する）"""
+    cluster_id, signature, city, keys = _find_cluster(conn, title, date, location, source_city, event_id)
+    if cluster_id is None:
+        cluster_id = event_id
+
+    conn.execute('DELETE FROM event_lsh WHERE event_id = ?', (event_id,))
+    conn.executemany('INSERT OR IGNORE INTO event_lsh (band_key, event_id) VALUES (?, ?)',
+                     [(key, event_id) for key in keys])
+    conn.execute('''
+        INSERT OR REPLACE INTO event_clusters (event_id, cluster_id, city, signature)
+        VALUES (?, ?, ?, ?)
+    ''', (event_id, cluster_id, city, signature.tobytes()))
+    return cluster_id
+
+
+def backfill_clusters(conn):
+    """まだクラスタに登録していないイベントを id 順に登録（件数を返す）"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(events)')}
+    source_city = 'source_city' if 'source_city' in columns else 'NULL'
+    rows = conn.execute(f'''
+        SELECT id, title, date, location, {source_city} FROM events
+        WHERE id NOT IN (SELECT event_id FROM event_clusters)
+        ORDER BY id
+    ''').fetchall()
+    for row in rows:
+        assign_cluster(conn, *row)
+    return len(rows)
+
+
+def release_clusters(conn, event_ids):
+    """削除したイベントの行を消し、それをクラスタIDにしていたクラスタを残りの最小の id に付け替える
+
+    削除した id が新しいイベントに再利用されても、別の催しが古いクラスタに入らないようにする
+    （呼び出し側のトランザクション内で実行する）。
+    """
+    placeholders = ', '.join('?' * len(event_ids))
+    conn.execute(f'DELETE FROM event_lsh WHERE event_id IN ({placeholders})', event_ids)
+    conn.execute(f'DELETE FROM event_clusters WHERE event_id IN ({placeholders})', event_ids)
+    conn.execute(f'''
+        UPDATE event_clusters SET cluster_id = (
+            SELECT MIN(other.event_id) FROM event_clusters AS other
+            WHERE other.cluster_id = event_clusters.cluster_id
+        )
+        WHERE cluster_id IN ({placeholders})
+    ''', event_ids)
+
+
+def duplicate_event_ids(conn):
+    """代表でない（重複した）アクティブなイベントの id"""
+    try:
+        rows = conn.execute('''
+            SELECT c.event_id FROM event_clusters AS c JOIN events AS e ON e.id = c.event_id
+            WHERE e.is_active = 1 AND c.event_id != (
+                SELECT MIN(other.event_id) FROM event_clusters AS other
+                JOIN events AS active ON active.id = other.event_id
+                WHERE other.cluster_id = c.cluster_id AND active.is_active = 1
+            )
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        # 重複検出を一度も実行していないDB
+        return set()
+    return {row[0] for row in rows}
+
+
+class EventDeduper:
+    """events.db のクラスタ情報の参照"""
+
+    def __init__(self, db_path='events.db'):
+        self.db_path = db_path
+
+    def _connect(self):
+        # テーブルと導入前のイベントの登録は migrations.py で済ませている
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def duplicate_ids(self):
+        """代表でない（重複した）イベントの id"""
+        conn = self._connect()
+        try:
+            return duplicate_event_ids(conn)
+        finally:
+            conn.close()
+
+    def find_cluster(self, title, date, location=None, source_city=None):
+        """同じ催しのクラスタID（無ければ None）"""
+        conn = self._connect()
+        try:
+            return find_cluster(conn, title, date, location, source_city)
+        finally:
+            conn.close()
@@ -20,7 +20,7 @@ pip install -r requirements.txt
 
 # データベースの初期化
 echo "🗄️ データベースを初期化中..."
-python -c "from app import init_db; init_db()"
+python migrations.py
 
 # ログディレクトリの作成
 echo "📁 ログディレクトリを作成中..."
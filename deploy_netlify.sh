@@ -26,7 +26,7 @@ fi
 echo "📊 データベースを準備中..."
 if [ ! -f "events.db" ]; then
     echo "データベースを初期化中..."
-    python init_db.py
+    python migrations.py
     python add_sample_data.py
 fi
 
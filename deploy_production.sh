@@ -37,7 +37,7 @@ docker-compose -f docker-compose.production.yml down
 
 # データベースを初期化
 echo "🗄️ データベースを初期化中..."
-python init_db.py
+python migrations.py
 
 # サンプルデータを追加
 echo "📊 サンプルデータを追加中..."
@@ -0,0 +1,122 @@
+"""
+イベントの差分（/api/events?since=）
+
+フロントエンドは前回の応答の cursor を since= に付けて、それ以降に変わったイベントだけを取得する。
+
+- 変更: updated_at >= since の行。updated_at を設定しない UPDATE でもトリガーで更新する。
+- 削除: 削除した行の id をトリガーで deleted_events に残す。保持期間（EVENT_CHANGES_MAX_AGE_DAYS 日）を
+  過ぎた行は retention.py が消すため、それより古い since には差分ではなく全件（full）を返す。
+- cursor は読み出す前の updated_at・deleted_at の最大値から CURSOR_OVERLAP_SECONDS 秒戻した値。
+  CURRENT_TIMESTAMP より後に確定したトランザクションの行を取りこぼさないよう、境目の行は再送する
+  （フロントエンドは id で上書きするので重複しない）。
+"""
+
+import sqlite3
+from datetime import datetime
+
+from event_model import event_row_factory
+
+CURSOR_FORMAT = '%Y-%m-%d %H:%M:%S'
+CURSOR_OVERLAP_SECONDS = 60
+EPOCH = '1970-01-01 00:00:00'
+
+CHANGES_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS deleted_events (
+        id INTEGER PRIMARY KEY,
+        deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_deleted_events_deleted_at ON deleted_events (deleted_at)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS events_changes_delete AFTER DELETE ON events BEGIN
+        INSERT OR REPLACE INTO deleted_events (id, deleted_at) VALUES (OLD.id, CURRENT_TIMESTAMP);
+    END
+    ''',
+    # updated_at を設定しなかった UPDATE（手作業の修正など）も差分に含める
+    '''
+    CREATE TRIGGER IF NOT EXISTS events_changes_touch
+    AFTER UPDATE ON events WHEN NEW.updated_at IS OLD.updated_at BEGIN
+        UPDATE events SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+    END
+    ''',
+)
+
+
+def create_change_tables(conn):
+    """削除の記録テーブルとトリガーを作成（migrations.py から呼ばれる）"""
+    for statement in CHANGES_SCHEMA:
+        conn.execute(statement)
+
+
+def parse_cursor(since):
+    """since= の値を検証して正規化した文字列を返す（形式が違えば ValueError）"""
+    return datetime.strptime(since.strip(), CURSOR_FORMAT).strftime(CURSOR_FORMAT)
+
+
+def current_cursor(conn):
+    """次の since= に使う値"""
+    return conn.execute('''
+        SELECT COALESCE(datetime(MAX(
+            COALESCE((SELECT MAX(updated_at) FROM events), ''),
+            COALESCE((SELECT MAX(deleted_at) FROM deleted_events), '')
+        ), ?), ?)
+    ''', (f'-{CURSOR_OVERLAP_SECONDS} seconds', EPOCH)).fetchone()[0]
+
+
+def changes_since(conn, since, max_age_days=7):
+    """since 以降の差分を返す
+
+    {'full': False, 'changed': [Event], 'removed': [削除したイベントの id], 'cursor': 次の since}
+    since が保持期間より古い場合は {'full': True, 'cursor': ...} を返すので、呼び出し側で全件を返す。
+    """
+    since = parse_cursor(since)
+    try:
+        cursor = current_cursor(conn)
+    except sqlite3.OperationalError:
+        # マイグレーション前のDB（削除の記録が無い）
+        return {'full': True, 'cursor': None}
+
+    expired = conn.execute(
+        "SELECT ? < datetime('now', '-' || ? || ' days')", (since, max_age_days)
+    ).fetchone()[0]
+    if expired:
+        return {'full': True, 'cursor': cursor}
+
+    query = conn.cursor()
+    query.row_factory = event_row_factory
+    changed = query.execute('SELECT * FROM events WHERE updated_at >= ? ORDER BY id', (since,)).fetchall()
+    removed = [row[0] for row in conn.execute(
+        'SELECT id FROM deleted_events WHERE deleted_at >= ? ORDER BY id', (since,)
+    )]
+    return {'full': False, 'changed': changed, 'removed': removed, 'cursor': cursor}
+
+
+class EventChanges:
+    """events.db の差分の参照"""
+
+    def __init__(self, db_path='events.db', max_age_days=7):
+        self.db_path = db_path
+        self.max_age_days = max_age_days
+
+    def _connect(self):
+        # 削除の記録テーブルとトリガーは migrations.py で作成している
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def since(self, since):
+        """since 以降の差分（changes_since を参照）"""
+        conn = self._connect()
+        try:
+            return changes_since(conn, since, self.max_age_days)
+        finally:
+            conn.close()
+
+    def cursor(self):
+        """現在の cursor（マイグレーション前のDBでは None）"""
+        conn = self._connect()
+        try:
+            return current_cursor(conn)
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
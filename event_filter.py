@@ -1,42 +1,95 @@
 from datetime import datetime, timedelta
+from hourly_forecast import city_for_event
+from score_memo import default_score_memo, score_key
+
+# 天気データがない日に付与する天気情報
+UNKNOWN_WEATHER = {'condition': '不明', 'temp': 20, 'humidity': 60}
 
 class EventFilter:
-    def __init__(self):
+    def __init__(self, score_memo=None, bitmap_index=None):
+        # スコアのメモはプロセス内で共有する（リクエストごとに EventFilter を作るため）
+        self.score_memo = default_score_memo if score_memo is None else score_memo
+        # フィルター条件の判定に使うビットマップインデックス（無ければ行ごとに判定）
+        self.bitmap_index = bitmap_index
         self.weather_priority = {
             'rainy': ['indoor', 'rain_ok', 'light_rain_ok'],
             'sunny': ['outdoor', 'indoor', 'any'],
             'cloudy': ['any', 'indoor', 'outdoor']
         }
     
-    def filter_events_by_weather(self, events, weather_data):
+    def filter_events_by_weather(self, events, weather_data, hourly=None):
         """天気予報に基づいてイベントをフィルタリング"""
         filtered_events = []
         
-        for event in events:
-            event_date = event[3]  # date column
-            weather_for_date = self.get_weather_for_date(weather_data, event_date)
-            
-            # 天気データがない場合はデフォルトスコアを使用
-            if weather_for_date:
-                suitability_score = self.calculate_suitability_score(event, weather_for_date)
-                weather_info = weather_for_date
-            else:
-                # 天気データがない場合はベーススコアを使用
-                suitability_score = self.calculate_base_score(event)
-                weather_info = {'condition': '不明', 'temp': 20, 'humidity': 60}
+        for event, weather_for_date, suitability_score in self.score_events(events, weather_data, hourly):
+            # 天気データがない場合はベーススコアが使われている
+            weather_info = weather_for_date or UNKNOWN_WEATHER
             
             # スコアが高いイベントのみを追加（閾値を下げる）
             if suitability_score > 0.1:
-                event_dict = self.convert_event_to_dict(event)
-                event_dict['suitability_score'] = suitability_score
-                event_dict['weather_info'] = weather_info
-                filtered_events.append(event_dict)
+                filtered_events.append(event.scored(suitability_score, weather_info))
         
         # スコア順にソート
-        filtered_events.sort(key=lambda x: x['suitability_score'], reverse=True)
+        filtered_events.sort(key=lambda x: x.suitability_score, reverse=True)
         
         return filtered_events
     
+    def score_events(self, events, weather_data, hourly=None):
+        """各イベントの適合性スコアを (イベント, その日の天気, スコア) で返す
+        
+        hourly（{都市名: HourlyForecast}）がある場合は、その日の天気の雨・晴れを
+        開催地の都市の開催時間帯の予報で置き換える。
+        計算済みのスコアはメモから取り出し、未計算の分だけを計算する。
+        """
+        forecast_by_date = {forecast['date']: forecast for forecast in weather_data['forecast']}
+        windows = self.get_hourly_windows(events, hourly, weather_data.get('location')) if hourly else None
+        
+        entries = []
+        for i, event in enumerate(events):
+            weather_for_date = forecast_by_date.get(event.date)
+            window = windows[i] if windows else None
+            if weather_for_date and window:
+                is_rainy, is_sunny, forecast_window = window
+                weather_for_date = dict(weather_for_date, is_rainy=is_rainy, is_sunny=is_sunny,
+                                        forecast_window=forecast_window)
+            entries.append((event, weather_for_date, score_key(event, weather_for_date)))
+        
+        memo = self.score_memo.get_many([key for _, _, key in entries])
+        
+        computed = {}
+        results = []
+        for event, weather_for_date, key in entries:
+            suitability_score = memo.get(key)
+            if suitability_score is None:
+                suitability_score = computed.get(key)
+            if suitability_score is None:
+                if weather_for_date:
+                    suitability_score = self.calculate_suitability_score(event, weather_for_date)
+                else:
+                    suitability_score = self.calculate_base_score(event)
+                computed[key] = suitability_score
+            results.append((event, weather_for_date, suitability_score))
+        
+        self.score_memo.set_many(computed.items())
+        
+        return results
+    
+    def get_hourly_windows(self, events, hourly, default_city=None):
+        """各イベントの開催時間帯の予報をイベントと同じ順で返す（無ければ None）"""
+        # 都市ごとにまとめて HourlyForecast に渡す
+        indexes_by_city = {}
+        for i, event in enumerate(events):
+            city = city_for_event(event, hourly, default_city)
+            if city in hourly:
+                indexes_by_city.setdefault(city, []).append(i)
+        
+        windows = [None] * len(events)
+        for city, indexes in indexes_by_city.items():
+            results = hourly[city].windows_for_events([events[i] for i in indexes])
+            for i, window in zip(indexes, results):
+                windows[i] = window
+        return windows
+    
     def get_weather_for_date(self, weather_data, event_date):
         """特定の日付の天気情報を取得"""
         for forecast in weather_data['forecast']:
@@ -49,13 +102,12 @@ class EventFilter:
         score = 0.5  # ベーススコア
         
         # 屋内/屋外の判定
-        is_indoor = event[7]  # is_indoor column
+        is_indoor = event.is_indoor
         is_rainy = weather_info.get('is_rainy', False)
         is_sunny = weather_info.get('is_sunny', False)
         
         # 天候依存性の判定
-        weather_dependent = event[11]  # weather_dependent column
-        rain_cancellation = event[12]  # rain_cancellation column
+        rain_cancellation = event.rain_cancellation
         
         # 屋内イベントのスコア調整
         if is_indoor:
@@ -76,17 +128,17 @@ class EventFilter:
                 score += 0.3  # 晴れの日は屋外イベントが有利
         
         # その他の要因によるスコア調整
-        if event[8]:  # is_free
+        if event.is_free:
             score += 0.1  # 無料イベントは有利
         
-        if event[10]:  # child_friendly
+        if event.child_friendly:
             score += 0.1  # 子連れOKは有利
         
-        if event[9]:  # has_parking
+        if event.has_parking:
             score += 0.05  # 駐車場ありは有利
         
         # 時間帯による調整
-        event_time = event[4]  # time column
+        event_time = event.time
         if event_time:
             hour = int(event_time.split(':')[0])
             if 9 <= hour <= 17:  # 日中イベント
@@ -99,17 +151,17 @@ class EventFilter:
         score = 0.5  # ベーススコア
         
         # その他の要因によるスコア調整
-        if event[8]:  # is_free
+        if event.is_free:
             score += 0.1  # 無料イベントは有利
         
-        if event[10]:  # child_friendly
+        if event.child_friendly:
             score += 0.1  # 子連れOKは有利
         
-        if event[9]:  # has_parking
+        if event.has_parking:
             score += 0.05  # 駐車場ありは有利
         
         # 時間帯による調整
-        event_time = event[4]  # time column
+        event_time = event.time
         if event_time:
             try:
                 hour = int(event_time.split(':')[0])
@@ -122,48 +174,28 @@ class EventFilter:
     
     def convert_event_to_dict(self, event):
         """イベントデータを辞書形式に変換"""
-        return {
-            'id': event[0],
-            'title': event[1],
-            'description': event[2],
-            'date': event[3],
-            'time': event[4],
-            'location': event[5],
-            'category': event[6],
-            'is_indoor': bool(event[7]),
-            'is_free': bool(event[8]),
-            'has_parking': bool(event[9]),
-            'child_friendly': bool(event[10]),
-            'weather_dependent': bool(event[11]),
-            'rain_cancellation': event[12],
-            'source_url': event[13]
-        }
+        return event.to_dict()
     
-    def get_recommended_events(self, events, weather_data, filters=None):
+    def get_recommended_events(self, events, weather_data, filters=None, hourly=None):
         """フィルター条件に基づいて推奨イベントを取得"""
         if not filters:
             filters = {}
         
         recommended = []
         
-        for event in events:
-            # フィルター条件をチェック
-            if self.matches_filters(event, filters):
-                event_date = event[3]
-                weather_for_date = self.get_weather_for_date(weather_data, event_date)
-                
-                if weather_for_date:
-                    suitability_score = self.calculate_suitability_score(event, weather_for_date)
-                    
-                    if suitability_score > 0.4:  # より厳しい条件
-                        event_dict = self.convert_event_to_dict(event)
-                        event_dict['suitability_score'] = suitability_score
-                        event_dict['weather_info'] = weather_for_date
-                        event_dict['recommendation_reason'] = self.get_recommendation_reason(event, weather_for_date)
-                        recommended.append(event_dict)
+        # フィルター条件をチェック
+        matched = [event for event in events if self.matches_filters(event, filters)]
+        
+        for event, weather_for_date, suitability_score in self.score_events(matched, weather_data, hourly):
+            if weather_for_date and suitability_score > 0.4:  # より厳しい条件
+                recommended.append(event.scored(
+                    suitability_score,
+                    weather_for_date,
+                    self.get_recommendation_reason(event, weather_for_date)
+                ))
         
         # スコア順にソート
-        recommended.sort(key=lambda x: x['suitability_score'], reverse=True)
+        recommended.sort(key=lambda x: x.suitability_score, reverse=True)
         
         return recommended[:10]  # 上位10件を返す
     
@@ -172,27 +204,37 @@ class EventFilter:
         if not filters:
             return True
         
+        # インデックスにあるイベントはビットマップで判定（条件ごとの結果はインデックス側で再利用される）
+        if self.bitmap_index is not None:
+            matched = self.bitmap_index.contains(event.id, filters, unknown_as_outdoor=True)
+            if matched is not None:
+                return matched
+        
         # 屋内/屋外フィルター
-        if filters.get('indoor_only') and not event[7]:  # is_indoor
+        if filters.get('indoor_only') and not event.is_indoor:
             return False
         
-        if filters.get('outdoor_only') and event[7]:  # is_indoor
+        if filters.get('outdoor_only') and event.is_indoor:
             return False
         
         # 無料イベントフィルター
-        if filters.get('free_only') and not event[8]:  # is_free
+        if filters.get('free_only') and not event.is_free:
             return False
         
         # 子連れOKフィルター
-        if filters.get('child_friendly') and not event[10]:  # child_friendly
+        if filters.get('child_friendly') and not event.child_friendly:
             return False
         
         # 駐車場ありフィルター
-        if filters.get('parking_required') and not event[9]:  # has_parking
+        if filters.get('parking_required') and not event.has_parking:
             return False
         
         # カテゴリフィルター
-        if filters.get('category') and event[6] != filters['category']:  # category
+        if filters.get('category') and event.category != filters['category']:
+            return False
+        
+        # 市区町村フィルター
+        if filters.get('city') and filters['city'] not in (event.location or ''):
             return False
         
         return True
@@ -201,7 +243,7 @@ class EventFilter:
         """推奨理由を生成"""
         reasons = []
         
-        is_indoor = event[7]
+        is_indoor = event.is_indoor
         is_rainy = weather_info.get('is_rainy', False)
         is_sunny = weather_info.get('is_sunny', False)
         
@@ -209,11 +251,11 @@ class EventFilter:
             reasons.append("雨の日なので屋内イベントがおすすめ")
         elif not is_indoor and is_sunny:
             reasons.append("晴れの日なので屋外イベントがおすすめ")
-        elif event[8]:  # is_free
+        elif event.is_free:
             reasons.append("無料で参加できます")
-        elif event[10]:  # child_friendly
+        elif event.child_friendly:
             reasons.append("お子様連れでも安心")
-        elif event[9]:  # has_parking
+        elif event.has_parking:
             reasons.append("駐車場完備")
         
         if not reasons:
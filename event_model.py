@@ -0,0 +1,121 @@
+"""
+イベントのレコード型
+
+SQLiteの行は列名で Event のフィールドに対応付けるため、
+app.init_db と EventScraper.init_database の列順の違いに影響されない。
+"""
+
+import sqlite3
+from dataclasses import dataclass, fields
+from typing import Optional
+
+
+@dataclass(slots=True)
+class Event:
+    """eventsテーブルの1行"""
+    id: Optional[int] = None
+    title: str = ''
+    description: Optional[str] = None
+    date: Optional[str] = None
+    time: Optional[str] = None
+    location: Optional[str] = None
+    category: Optional[str] = None
+    is_indoor: Optional[bool] = None
+    is_free: Optional[bool] = None
+    has_parking: bool = False
+    child_friendly: bool = False
+    weather_dependent: bool = False
+    rain_cancellation: Optional[str] = None
+    source_url: Optional[str] = None
+    source_city: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    is_active: bool = True
+
+    def to_dict(self):
+        """辞書形式に変換"""
+        return {name: getattr(self, name) for name in EVENT_FIELDS}
+
+    def scored(self, suitability_score, weather_info, recommendation_reason=None):
+        """スコア付きイベントを生成"""
+        return ScoredEvent(
+            *[getattr(self, name) for name in EVENT_FIELDS],
+            suitability_score=suitability_score,
+            weather_info=weather_info,
+            recommendation_reason=recommendation_reason
+        )
+
+
+@dataclass(slots=True)
+class ScoredEvent(Event):
+    """天気との適合性スコアを付与したイベント"""
+    suitability_score: float = 0.0
+    weather_info: Optional[dict] = None
+    recommendation_reason: Optional[str] = None
+
+
+EVENT_FIELDS = tuple(f.name for f in fields(Event))
+
+# 不明(None)を保持する真偽値列と、None を False として扱う真偽値列
+_TRISTATE_FIELDS = frozenset(['is_indoor', 'is_free'])
+_FLAG_FIELDS = frozenset(['has_parking', 'child_friendly', 'weather_dependent', 'is_active'])
+
+# 列名の並び → 行変換関数
+_loaders = {}
+_last_loader = (None, None)
+
+
+def _build_loader(column_names):
+    """列名の並びに対応する行変換関数を生成
+
+    行ごとのループや辞書を避けるため、namedtuple と同様に
+    列位置を埋め込んだ関数をその場で生成する。
+    """
+    column_index = {name: i for i, name in enumerate(column_names)}
+    arguments = []
+
+    for f in fields(Event):
+        if f.name not in column_index:
+            # 列が無いスキーマ（app.init_db など）ではデフォルト値を使う
+            arguments.append(repr(f.default))
+            continue
+        value = f'row[{column_index[f.name]}]'
+        if f.name in _TRISTATE_FIELDS:
+            value = f'None if {value} is None else bool({value})'
+        elif f.name in _FLAG_FIELDS:
+            value = f'bool({value})'
+        arguments.append(value)
+
+    source = f"def load(row):\n    return Event({', '.join(arguments)})\n"
+    namespace = {'Event': Event}
+    exec(source, namespace)
+    return namespace['load']
+
+
+def _get_loader(description):
+    """cursor.description に対応する行変換関数を取得"""
+    global _last_loader
+
+    # 同じクエリの行は同じ description オブジェクトを共有する
+    cached_description, loader = _last_loader
+    if description is cached_description:
+        return loader
+
+    column_names = tuple(column[0] for column in description)
+    loader = _loaders.get(column_names)
+    if loader is None:
+        loader = _loaders[column_names] = _build_loader(column_names)
+    _last_loader = (description, loader)
+    return loader
+
+
+def event_row_factory(cursor, row):
+    """sqlite3 の row_factory として使用する Event 変換関数"""
+    return _get_loader(cursor.description)(row)
+
+
+def connect_events_db(db_path='events.db'):
+    """Event を返す接続を作成"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = event_row_factory
+    return conn
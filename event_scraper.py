@@ -14,21 +14,40 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 import json
 import os
+from event_model import event_row_factory
+import metrics
+from cache_backend import default_cache
+from config import Config
+from filter_cache import FilterResultCache, bump_generation
+from geo_index import index_event
+from dedupe import assign_cluster
+from migrations import migrate
+from retention import enable_incremental_vacuum, run_retention
 
-# ログ設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraper.log'),
-        logging.StreamHandler()
-    ]
+# 再取得したときに比べる列（どれも変わっていなければ UPDATE しない）
+UPDATE_COLUMNS = (
+    'description', 'date', 'time', 'location', 'category', 'is_indoor', 'is_free',
+    'has_parking', 'child_friendly', 'weather_dependent', 'rain_cancellation'
 )
 
+def setup_scraper_logging():
+    """スクレイパー単体実行時のログ設定
+
+    import 時に設定するとWebアプリ側のハンドラーと重複するため、
+    実行スクリプトから明示的に呼び出す。
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('scraper.log'),
+            logging.StreamHandler()
+        ]
+    )
+
 class EventScraper:
     def __init__(self):
         self.db_path = 'events.db'
-        self.init_database()
         
         # スクレイピング対象サイト
         self.sources = {
@@ -92,49 +111,8 @@ class EventScraper:
         }
     
     def init_database(self):
-        """データベース初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT,
-                time TEXT,
-                location TEXT,
-                category TEXT,
-                is_indoor BOOLEAN,
-                is_free BOOLEAN,
-                has_parking BOOLEAN,
-                child_friendly BOOLEAN,
-                weather_dependent BOOLEAN,
-                rain_cancellation TEXT,
-                source_url TEXT,
-                source_city TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scraping_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                run_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                source_city TEXT,
-                events_found INTEGER,
-                events_added INTEGER,
-                events_updated INTEGER,
-                errors INTEGER,
-                duration_seconds REAL
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        logging.info("データベース初期化完了")
+        """データベースを最新のスキーマにする（単独で実行するとき用。通常はデプロイ時に migrations.py で済ませる）"""
+        migrate(self.db_path, 'events')
     
     def schedule_scraping(self):
         """スクレイピングスケジュール設定"""
@@ -172,6 +150,7 @@ class EventScraper:
             
             # データベースに保存
             self.save_events_to_db(all_events)
+            self.warm_filter_cache()
             
             duration = time.time() - start_time
             self.log_scraping_run(duration)
@@ -181,6 +160,16 @@ class EventScraper:
         except Exception as e:
             logging.error(f"毎日スクレイピングエラー: {e}")
     
+    def warm_filter_cache(self):
+        """よく使われるフィルター条件の結果を作成しておく"""
+        # プロセス内のキャッシュではWebサーバーから見えないため共有キャッシュのときだけ
+        if not default_cache.shared:
+            return
+        try:
+            FilterResultCache(self.db_path, ttl=Config.FILTER_CACHE_TTL).warm(Config.TARGET_CITIES)
+        except Exception as e:
+            logging.error(f"フィルターキャッシュの作成エラー: {e}")
+    
     def weekly_full_update(self):
         """週1回の全データ更新"""
         logging.info("週次フルアップデート開始")
@@ -192,6 +181,9 @@ class EventScraper:
             # 全ソースから最新データを取得
             self.daily_scraping()
             
+            # 保持期間を過ぎたイベント・コンテンツをアーカイブして削除
+            run_retention()
+            
             # データベースの最適化
             self.optimize_database()
             
@@ -355,31 +347,15 @@ class EventScraper:
     def extract_event_data(self, driver, url, source_id, source_info):
         """イベントページからデータを抽出"""
         try:
-            driver.get(url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            
-            # ページのHTMLを取得
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
+            with metrics.time_scraper(source_id, 'fetch'):
+                driver.get(url)
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.TAG_NAME, "body"))
+                )
+                page_source = driver.page_source
             
-            # イベント情報を抽出
-            event_data = {
-                'title': self.extract_title(soup),
-                'description': self.extract_description(soup),
-                'date': self.extract_date(soup),
-                'time': self.extract_time(soup),
-                'location': self.extract_location(soup),
-                'category': self.determine_category(soup),
-                'is_indoor': self.determine_indoor(soup),
-                'is_free': self.determine_free(soup),
-                'has_parking': self.determine_parking(soup),
-                'child_friendly': self.determine_child_friendly(soup),
-                'weather_dependent': self.determine_weather_dependent(soup),
-                'rain_cancellation': self.extract_rain_cancellation(soup),
-                'source_url': url,
-                'source_city': source_info['name']
-            }
+            with metrics.time_scraper(source_id, 'parse'):
+                event_data = self.parse_event_page(page_source, url, source_info)
             
             # より厳密な検証
             if self.validate_event_data_strict(event_data):
@@ -391,6 +367,29 @@ class EventScraper:
             logging.warning(f"データ抽出エラー: {e}")
             return None
     
+    def parse_event_page(self, page_source, url, source_info):
+        """イベントページのHTMLからデータを抽出"""
+        # ページのHTMLを解析
+        soup = BeautifulSoup(page_source, 'html.parser')
+        
+        # イベント情報を抽出
+        return {
+            'title': self.extract_title(soup),
+            'description': self.extract_description(soup),
+            'date': self.extract_date(soup),
+            'time': self.extract_time(soup),
+            'location': self.extract_location(soup),
+            'category': self.determine_category(soup),
+            'is_indoor': self.determine_indoor(soup),
+            'is_free': self.determine_free(soup),
+            'has_parking': self.determine_parking(soup),
+            'child_friendly': self.determine_child_friendly(soup),
+            'weather_dependent': self.determine_weather_dependent(soup),
+            'rain_cancellation': self.extract_rain_cancellation(soup),
+            'source_url': url,
+            'source_city': source_info['name']
+        }
+    
     def validate_event_data_strict(self, event_data):
         """より厳密なイベントデータ検証"""
         if not event_data.get('title'):
@@ -601,6 +600,8 @@ class EventScraper:
         
         new_events = 0
         updated_events = 0
+        unchanged_events = 0
+        duplicate_events = 0
         
         for event in events:
             try:
@@ -613,20 +614,18 @@ class EventScraper:
                 existing = cursor.fetchone()
                 
                 if existing:
-                    # 既存イベントを更新
-                    cursor.execute('''
+                    # 内容が変わったときだけ更新する（updated_at は差分API・スコアのメモのバージョン）
+                    values = tuple(event[column] for column in UPDATE_COLUMNS)
+                    cursor.execute(f'''
                         UPDATE events SET
-                            description = ?, date = ?, time = ?, location = ?,
-                            category = ?, is_indoor = ?, is_free = ?, has_parking = ?,
-                            child_friendly = ?, weather_dependent = ?, rain_cancellation = ?,
+                            {', '.join(f'{column} = ?' for column in UPDATE_COLUMNS)},
                             updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (
-                        event['description'], event['date'], event['time'], event['location'],
-                        event['category'], event['is_indoor'], event['is_free'], event['has_parking'],
-                        event['child_friendly'], event['weather_dependent'], event['rain_cancellation'],
-                        existing[0]
-                    ))
+                        WHERE id = ? AND ({', '.join(UPDATE_COLUMNS)}) IS NOT ({', '.join('?' * len(UPDATE_COLUMNS))})
+                    ''', values + (existing[0],) + values)
+                    if cursor.rowcount == 0:
+                        unchanged_events += 1
+                        continue
+                    event_id = existing[0]
                     updated_events += 1
                 else:
                     # 新規イベントを追加
@@ -642,12 +641,26 @@ class EventScraper:
                         event['has_parking'], event['child_friendly'], event['weather_dependent'],
                         event['rain_cancellation'], event['source_url'], event['source_city']
                     ))
+                    event_id = cursor.lastrowid
                     new_events += 1
                 
+                # 開催地を場所IDと座標に正規化
+                index_event(conn, event_id, event['location'], event['source_city'])
+                
+                # 他のサイトに掲載済みの同じ催しとまとめる
+                cluster_id = assign_cluster(
+                    conn, event_id, event['title'], event['date'], event['location'], event['source_city']
+                )
+                if cluster_id != event_id:
+                    duplicate_events += 1
+                
             except Exception as e:
                 logging.error(f"イベント保存エラー: {e}")
                 continue
         
+        # /api/filter のキャッシュを無効にするため世代番号を進める
+        if new_events or updated_events:
+            bump_generation(conn)
         conn.commit()
         conn.close()
         
@@ -655,7 +668,8 @@ class EventScraper:
         self.stats['updated_events'] += updated_events
         self.stats['total_events'] += len(events)
         
-        logging.info(f"イベント保存完了: 新規{new_events}件, 更新{updated_events}件")
+        logging.info(f"イベント保存完了: 新規{new_events}件, 更新{updated_events}件, "
+                     f"変更なし{unchanged_events}件, 重複{duplicate_events}件")
     
     def deactivate_old_events(self):
         """古いイベントを非アクティブ化"""
@@ -663,12 +677,15 @@ class EventScraper:
         cursor = conn.cursor()
         
         # 30日以上前のイベントを非アクティブ化
+        # updated_at も更新してビットマップインデックスの差分更新で拾えるようにする
         cursor.execute('''
-            UPDATE events SET is_active = 0 
-            WHERE date < date('now', '-30 days')
+            UPDATE events SET is_active = 0, updated_at = CURRENT_TIMESTAMP
+            WHERE date < date('now', '-30 days') AND is_active = 1
         ''')
         
         deactivated_count = cursor.rowcount
+        if deactivated_count:
+            bump_generation(conn)
         conn.commit()
         conn.close()
         
@@ -679,7 +696,8 @@ class EventScraper:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('VACUUM')
+        # 空き領域は retention の incremental_vacuum で返すため、全体の VACUUM は初回だけ
+        enable_incremental_vacuum(conn)
         cursor.execute('ANALYZE')
         
         conn.close()
@@ -707,6 +725,7 @@ class EventScraper:
     def get_active_events(self):
         """アクティブなイベントを取得"""
         conn = sqlite3.connect(self.db_path)
+        conn.row_factory = event_row_factory
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -736,6 +755,8 @@ class EventScraper:
                 time.sleep(300)  # エラー時は5分待機
 
 if __name__ == "__main__":
+    setup_scraper_logging()
     scraper = EventScraper()
+    scraper.init_database()
     scraper.schedule_scraping()
     scraper.run_scheduler() 
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+イベントの集計（トリガーで更新する集計テーブル）
+
+/health・統計API・manage_scraper.py stats で毎回 events を全件集計しないよう、
+events への INSERT / UPDATE / DELETE のたびにトリガーで集計テーブルを更新する。
+読み取りは集計テーブルの数行だけで済む。
+
+- event_stats: 全件数・アクティブ件数
+- event_city_stats: 情報元の市ごとのアクティブ件数
+- event_daily_created: 登録日ごとの件数（「過去7日間の新規」は最大8行の合計）
+
+集計が食い違っていないかは verify_stats で全件集計と比較できる（rebuild_stats で作り直す）。
+"""
+
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# 1行分の集計への加算（sign は +1 / -1、row は NEW / OLD）
+_APPLY = '''
+    UPDATE event_stats SET value = value + {sign} WHERE key = 'total';
+    UPDATE event_stats SET value = value + {sign} * ({row}.is_active = 1) WHERE key = 'active';
+    INSERT INTO event_city_stats (source_city, active) VALUES (COALESCE({row}.source_city, ''), {sign} * ({row}.is_active = 1))
+        ON CONFLICT (source_city) DO UPDATE SET active = active + excluded.active;
+    INSERT INTO event_daily_created (day, count) VALUES (COALESCE(date({row}.created_at), ''), {sign})
+        ON CONFLICT (day) DO UPDATE SET count = count + excluded.count;
+'''
+
+STATS_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS event_stats (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS event_city_stats (
+        source_city TEXT PRIMARY KEY,
+        active INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS event_daily_created (
+        day TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS events_stats_insert AFTER INSERT ON events BEGIN
+        {_APPLY.format(sign='+1', row='NEW')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS events_stats_delete AFTER DELETE ON events BEGIN
+        {_APPLY.format(sign='-1', row='OLD')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS events_stats_update
+    AFTER UPDATE OF is_active, source_city, created_at ON events BEGIN
+        {_APPLY.format(sign='-1', row='OLD')}
+        {_APPLY.format(sign='+1', row='NEW')}
+    END
+    ''',
+)
+
+
+def create_stats_tables(conn):
+    """集計テーブルとトリガーを作成し、現在の events から集計する（migrations.py から呼ばれる）"""
+    for statement in STATS_SCHEMA:
+        conn.execute(statement)
+    rebuild_stats(conn)
+
+
+def compute_stats(conn):
+    """events を全件集計した結果（検証用）"""
+    total, active = conn.execute(
+        'SELECT COUNT(*), COALESCE(SUM(is_active = 1), 0) FROM events'
+    ).fetchone()
+    recent = conn.execute(
+        "SELECT COUNT(*) FROM events WHERE created_at >= date('now', '-7 days')"
+    ).fetchone()[0]
+    city_stats = dict(conn.execute(
+        'SELECT source_city, COUNT(*) FROM events WHERE is_active = 1 GROUP BY source_city'
+    ).fetchall())
+    return {
+        'total_events': total,
+        'active_events': active,
+        'recent_events': recent,
+        'city_stats': city_stats
+    }
+
+
+def read_stats(conn):
+    """集計テーブルから読んだ結果（compute_stats と同じ形）"""
+    counters = dict(conn.execute('SELECT key, value FROM event_stats').fetchall())
+    recent = conn.execute(
+        "SELECT COALESCE(SUM(count), 0) FROM event_daily_created WHERE day >= date('now', '-7 days')"
+    ).fetchone()[0]
+    city_stats = {
+        city or None: active
+        for city, active in conn.execute('SELECT source_city, active FROM event_city_stats WHERE active > 0')
+    }
+    return {
+        'total_events': counters.get('total', 0),
+        'active_events': counters.get('active', 0),
+        'recent_events': recent,
+        'city_stats': city_stats
+    }
+
+
+def rebuild_stats(conn):
+    """集計テーブルを events から作り直す（呼び出し側のトランザクション内で実行する）"""
+    conn.execute('DELETE FROM event_stats')
+    conn.execute('DELETE FROM event_city_stats')
+    conn.execute('DELETE FROM event_daily_created')
+    conn.execute('''
+        INSERT INTO event_stats (key, value)
+        SELECT 'total', COUNT(*) FROM events
+        UNION ALL
+        SELECT 'active', COALESCE(SUM(is_active = 1), 0) FROM events
+    ''')
+    conn.execute('''
+        INSERT INTO event_city_stats (source_city, active)
+        SELECT COALESCE(source_city, ''), SUM(is_active = 1) FROM events GROUP BY COALESCE(source_city, '')
+    ''')
+    conn.execute('''
+        INSERT INTO event_daily_created (day, count)
+        SELECT COALESCE(date(created_at), ''), COUNT(*) FROM events GROUP BY 1
+    ''')
+
+
+def verify_stats(conn, repair=False):
+    """集計テーブルと全件集計の差分を {項目: (集計テーブル, 全件集計)} で返す
+
+    repair=True なら差分があったときに集計テーブルを作り直す。
+    """
+    stored = read_stats(conn)
+    actual = compute_stats(conn)
+    diff = {name: (stored[name], actual[name]) for name in actual if stored[name] != actual[name]}
+    if diff:
+        logger.warning("イベントの集計が全件集計と一致しません: %s", diff)
+        if repair:
+            with conn:
+                rebuild_stats(conn)
+    return diff
+
+
+class EventStats:
+    """events.db の集計の参照"""
+
+    def __init__(self, db_path='events.db'):
+        self.db_path = db_path
+
+    def _connect(self):
+        # 集計テーブルとトリガーは migrations.py で作成している
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def summary(self):
+        """全件数・アクティブ件数・過去7日間の新規・市ごとの件数"""
+        conn = self._connect()
+        try:
+            return read_stats(conn)
+        finally:
+            conn.close()
+
+    def verify(self, repair=False):
+        """集計テーブルと全件集計の差分"""
+        conn = self._connect()
+        try:
+            return verify_stats(conn, repair)
+        finally:
+            conn.close()
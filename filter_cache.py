@@ -0,0 +1,165 @@
+"""
+/api/filter の結果キャッシュ
+
+フィルター条件は真偽値5つとカテゴリ・市区町村だけなので、条件の組み合わせは少ない。
+正規化した条件のタプルと eventsテーブルの世代番号をキーに、シリアライズ済みのJSONを保存する。
+世代番号はイベントを保存・非アクティブ化したときに1つ進むため、
+テーブルが変わると古い結果は参照されなくなる（TTLで自然に消える）。
+キャッシュに無い条件の結果はSQLではなくビットマップインデックス（bitmap_index）から求める。
+"""
+
+import logging
+import sqlite3
+
+import json_serializer
+import metrics
+from bitmap_index import BitmapIndex
+from cache_backend import default_cache
+
+logger = logging.getLogger(__name__)
+
+# キーに使う条件の並び（真偽値のフィルターと、値をそのまま使うフィルター）
+FLAG_FILTERS = ('indoor_only', 'outdoor_only', 'free_only', 'parking_required', 'child_friendly')
+VALUE_FILTERS = ('category', 'city')
+
+_FALSE_VALUES = frozenset(['', '0', 'false', 'off', 'no'])
+
+
+def normalize_filters(args):
+    """リクエストパラメータから正規化したフィルター条件を作成"""
+    filters = {name: (args.get(name) or '').strip().lower() not in _FALSE_VALUES for name in FLAG_FILTERS}
+    for name in VALUE_FILTERS:
+        filters[name] = (args.get(name) or '').strip()
+    return filters
+
+
+def filter_key(filters):
+    """正規化したフィルター条件のタプル（キャッシュキー）"""
+    return tuple(filters[name] for name in FLAG_FILTERS + VALUE_FILTERS)
+
+
+def get_generation(conn):
+    """eventsテーブルの世代番号を取得"""
+    # 接続に event_row_factory が設定されていても値だけを読む
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    try:
+        row = cursor.execute("SELECT value FROM events_meta WHERE key = 'generation'").fetchone()
+    except sqlite3.OperationalError:
+        # マイグレーション（migrations.py）前のDB
+        return 0
+    return row[0] if row else 0
+
+
+def bump_generation(conn):
+    """eventsテーブルの世代番号を進める（呼び出し側のトランザクション内で実行する）"""
+    conn.execute('''
+        INSERT INTO events_meta (key, value) VALUES ('generation', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    ''')
+
+
+def build_filter_query(filters):
+    """フィルター条件から (SQL, パラメータ) を作成（BitmapIndex.select と同じ結果になる）"""
+    query = 'SELECT * FROM events WHERE is_active = 1'
+    params = []
+
+    if filters.get('indoor_only'):
+        query += ' AND is_indoor = 1'
+    if filters.get('outdoor_only'):
+        query += ' AND is_indoor = 0'
+    if filters.get('free_only'):
+        query += ' AND is_free = 1'
+    if filters.get('parking_required'):
+        query += ' AND has_parking = 1'
+    if filters.get('child_friendly'):
+        query += ' AND child_friendly = 1'
+    if filters.get('category'):
+        query += ' AND category = ?'
+        params.append(filters['category'])
+    if filters.get('city'):
+        query += ' AND (location LIKE ? OR location LIKE ?)'
+        params.append(f'%{filters["city"]}%')
+        params.append(f'%（{filters["city"]}）%')
+
+    return query, params
+
+
+class FilterResultCache:
+    """フィルター結果（シリアライズ済みJSON）のキャッシュ"""
+
+    def __init__(self, db_path='events.db', cache=None, ttl=3600, index=None):
+        self.db_path = db_path
+        self.cache = cache or default_cache.namespace('filter')
+        self.ttl = ttl
+        self.index = index or BitmapIndex()
+
+    def refresh_index(self, conn=None):
+        """世代番号が変わっていればインデックスを更新して返す"""
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.db_path)
+        try:
+            generation = get_generation(conn)
+            with metrics.time_db_query('events_bitmap_refresh'):
+                self.index.refresh(conn, generation)
+        finally:
+            if own_conn:
+                conn.close()
+        return self.index
+
+    def get_response(self, filters):
+        """フィルター結果のJSON（bytes）を取得"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            key = (get_generation(conn), filter_key(filters))
+            rendered = []
+
+            def render():
+                rendered.append(True)
+                self.refresh_index(conn)
+                return self._render(filters)
+
+            body = self.cache.get_or_set(key, render, ttl=self.ttl)
+            metrics.record_cache('filter', not rendered)
+        finally:
+            conn.close()
+        return body
+
+    def _render(self, filters):
+        events = self.index.select(filters)
+
+        # DEBUGが無効なときは extra の組み立ても行わない
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('フィルター適用', extra={
+                'filters': filters, 'generation': self.index.generation, 'result_count': len(events)
+            })
+
+        with metrics.time_serialization('/api/filter'):
+            return json_serializer.dumps({'events': events})
+
+    def popular_filters(self, cities=()):
+        """キャッシュを温めておくフィルター条件（条件なし・単一条件・カテゴリ・市区町村）"""
+        empty = normalize_filters({})
+        combinations = [empty]
+        combinations += [dict(empty, **{name: True}) for name in FLAG_FILTERS]
+        combinations += [dict(empty, category=category) for category in sorted(self.index.categories)]
+        combinations += [dict(empty, city=city) for city in cities]
+        return combinations
+
+    def warm(self, cities=()):
+        """よく使われる条件の結果を現在の世代で作成しておく"""
+        self.refresh_index()
+        generation = self.index.generation
+        items = [
+            ((generation, filter_key(filters)), self._render(filters))
+            for filters in self.popular_filters(cities)
+        ]
+
+        self.cache.set_many(items, ttl=self.ttl)
+        logger.info("フィルター結果のキャッシュを作成しました: %d件（世代%d）", len(items), generation)
+        return len(items)
+
+    def stats(self):
+        """ヒット/ミスの統計を取得"""
+        return dict(self.cache.stats(), index=self.index.stats())
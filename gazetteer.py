@@ -0,0 +1,95 @@
+"""
+対象8市の地名辞書（オフライン）
+
+スクレイピングしたイベントの開催地は自由記述のため、会場名・市役所名から
+正規の場所ID（place_id）と座標に対応付ける。会場が分からない場合は市役所の座標を使う。
+座標は地図上のおおよその位置（距離での絞り込み用で、数十m程度の誤差は許容する）。
+"""
+
+import unicodedata
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class Place:
+    """地名辞書の1件"""
+    place_id: str
+    name: str
+    city: str
+    lat: float
+    lon: float
+    aliases: tuple = ()
+
+
+# 市役所（市全体の代表地点を兼ねる）
+CITY_HALLS = (
+    Place('tsukubamirai/city-hall', 'つくばみらい市役所', 'つくばみらい市', 35.9631, 140.0372),
+    Place('tsukuba/city-hall', 'つくば市役所', 'つくば市', 36.0835, 140.0764),
+    Place('moriya/city-hall', '守谷市役所', '守谷市', 35.9514, 139.9755),
+    Place('joso/city-hall', '常総市役所', '常総市', 36.0236, 139.9939),
+    Place('toride/city-hall', '取手市役所', '取手市', 35.9112, 140.0504),
+    Place('ryugasaki/city-hall', '龍ケ崎市役所', '龍ケ崎市', 35.9115, 140.1823),
+    Place('koga/city-hall', '古河市役所', '古河市', 36.1786, 139.7553),
+    Place('bando/city-hall', '坂東市役所', '坂東市', 36.0484, 139.8887),
+)
+
+# よく使われる会場
+VENUES = (
+    Place('tsukubamirai/kirakuyama', 'きらくやまふれあいの丘', 'つくばみらい市', 35.9925, 140.0283),
+    Place('tsukubamirai/miraidaira-station', 'みらい平駅', 'つくばみらい市', 35.9896, 140.0382),
+    Place('tsukuba/expo-center', 'つくばエキスポセンター', 'つくば市', 36.0828, 140.1117, ('エキスポセンター',)),
+    Place('tsukuba/capio', 'つくばカピオ', 'つくば市', 36.0875, 140.1105),
+    Place('tsukuba/doho-park', '洞峰公園', 'つくば市', 36.0647, 140.1208),
+    Place('tsukuba/mount-tsukuba', '筑波山', 'つくば市', 36.2253, 140.1067),
+    Place('moriya/library', '守谷市立図書館', '守谷市', 35.9519, 139.9763, ('守谷中央図書館',)),
+    Place('toride/ryokuchi-park', '取手緑地運動公園', '取手市', 35.9005, 140.0657),
+    Place('toride/station', '取手駅', '取手市', 35.8953, 140.0632),
+    Place('ryugasaki/tatsunoko-arena', 'たつのこアリーナ', '龍ケ崎市', 35.9023, 140.1716),
+    Place('koga/kubo-park', '古河公方公園', '古河市', 36.1827, 139.7226),
+    Place('koga/station', '古河駅', '古河市', 36.1925, 139.7085),
+    Place('joso/mitsukaido-station', '水海道駅', '常総市', 36.0189, 139.9944),
+    Place('bando/iwai-park', '岩井公園', '坂東市', 36.0519, 139.8880),
+)
+
+PLACES = CITY_HALLS + VENUES
+PLACES_BY_ID = {place.place_id: place for place in PLACES}
+CITY_HALL_BY_CITY = {place.city: place for place in CITY_HALLS}
+
+
+def normalize_name(text):
+    """表記ゆれを吸収した地名（全角/半角、空白、ヶ/ケ、竜/龍）"""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = ''.join(text.split())
+    return text.replace('ヶ', 'ケ').replace('竜ケ崎', '龍ケ崎')
+
+
+def _by_length(names):
+    # 'つくば市' より 'つくばみらい市' を先に照合するため長い名前から並べる
+    return sorted(names, key=lambda item: len(item[0]), reverse=True)
+
+
+# (正規化した名前, 場所)
+_VENUE_NAMES = _by_length(
+    (normalize_name(name), place) for place in VENUES for name in (place.name,) + place.aliases
+)
+_CITY_NAMES = _by_length((normalize_name(place.city), place) for place in CITY_HALLS)
+
+
+def normalize_location(location, source_city=None):
+    """開催地の記述から場所を特定（会場 → 開催地の市 → 情報元の市の順に照合、無ければ None）"""
+    text = normalize_name(location)
+    if text:
+        for name, place in _VENUE_NAMES:
+            if name in text:
+                return place
+        for name, place in _CITY_NAMES:
+            if name in text:
+                return place
+
+    # 開催地が空のイベントは情報元（'守谷市役所' など）の市の代表地点
+    source = normalize_name(source_city)
+    if source:
+        for name, place in _CITY_NAMES:
+            if name in source:
+                return place
+    return None
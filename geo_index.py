@@ -0,0 +1,134 @@
+"""
+イベントの開催地の座標インデックス
+
+開催地は gazetteer.normalize_location で場所ID・座標に正規化し、
+座標は SQLite の R-tree（event_geo）に保存する。
+「現在地から半径◯km以内」の検索は R-tree で外接矩形内の行だけを取り出し、
+その少数の行についてだけ実際の距離を計算する。
+"""
+
+import math
+import sqlite3
+
+from event_model import event_row_factory
+from gazetteer import PLACES_BY_ID, normalize_location
+
+# 緯度1度あたりの距離(km)
+KM_PER_DEGREE = 111.32
+EARTH_RADIUS_KM = 6371.0
+
+
+GEO_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS event_places (
+        event_id INTEGER PRIMARY KEY,
+        place_id TEXT
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_event_places_place_id ON event_places (place_id)',
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS event_geo USING rtree(
+        event_id, min_lat, max_lat, min_lon, max_lon
+    )
+    ''',
+)
+
+
+def create_geo_tables(conn):
+    """座標インデックスのテーブルを作成（migrations.py から呼ばれる）"""
+    for statement in GEO_SCHEMA:
+        conn.execute(statement)
+
+
+def index_event(conn, event_id, location, source_city=None):
+    """1件のイベントの開催地を正規化して保存（呼び出し側のトランザクション内で実行する）
+
+    場所を特定できなかったイベントも place_id を NULL で記録し、再度の照合を省く。
+    """
+    place = normalize_location(location, source_city)
+    conn.execute(
+        'INSERT OR REPLACE INTO event_places (event_id, place_id) VALUES (?, ?)',
+        (event_id, place.place_id if place else None)
+    )
+    conn.execute('DELETE FROM event_geo WHERE event_id = ?', (event_id,))
+    if place:
+        conn.execute(
+            'INSERT INTO event_geo (event_id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)',
+            (event_id, place.lat, place.lat, place.lon, place.lon)
+        )
+    return place
+
+
+def backfill_event_places(conn):
+    """まだ正規化していないイベントを正規化（件数を返す）"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(events)')}
+    source_city = 'source_city' if 'source_city' in columns else 'NULL'
+    rows = conn.execute(f'''
+        SELECT id, location, {source_city} FROM events
+        WHERE id NOT IN (SELECT event_id FROM event_places)
+    ''').fetchall()
+    for event_id, location, city in rows:
+        index_event(conn, event_id, location, city)
+    return len(rows)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """2点間の距離(km)（ハバーサイン）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class EventGeoIndex:
+    """距離によるイベント検索"""
+
+    def __init__(self, db_path='events.db'):
+        self.db_path = db_path
+
+    def _connect(self):
+        # テーブルと導入前のイベントの正規化は migrations.py で済ませている
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def nearby(self, lat, lon, radius_km, upcoming_only=True, limit=100):
+        """半径内のイベントを近い順に (イベント, 場所, 距離km) で返す"""
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+
+        conn = self._connect()
+        try:
+            # 非アクティブ・終了したイベントは距離を計算する前に除く
+            query = '''
+                SELECT g.event_id, p.place_id FROM event_geo AS g
+                JOIN event_places AS p ON p.event_id = g.event_id
+                JOIN events AS e ON e.id = g.event_id
+                WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lon >= ? AND g.max_lon <= ?
+                AND e.is_active = 1
+            '''
+            if upcoming_only:
+                query += " AND e.date >= date('now')"
+            candidates = conn.execute(query, (lat - dlat, lat + dlat, lon - dlon, lon + dlon)).fetchall()
+
+            # 外接矩形の角の部分を除く
+            matches = {}
+            for event_id, place_id in candidates:
+                place = PLACES_BY_ID.get(place_id)
+                if place is None:
+                    continue
+                distance = distance_km(lat, lon, place.lat, place.lon)
+                if distance <= radius_km:
+                    matches[event_id] = (place, distance)
+            if not matches:
+                return []
+
+            conn.row_factory = event_row_factory
+            events = conn.execute(
+                f"SELECT * FROM events WHERE id IN ({', '.join('?' * len(matches))})", list(matches)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        results = [(event, *matches[event.id]) for event in events]
+        results.sort(key=lambda item: (item[2], item[0].date or '', item[0].time or ''))
+        return results[:limit]
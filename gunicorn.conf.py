@@ -2,6 +2,7 @@
 
 import multiprocessing
 import os
+import shutil
 
 # サーバー設定
 bind = "0.0.0.0:8080"
@@ -34,6 +35,36 @@ limit_request_line = 4094
 limit_request_fields = 100
 limit_request_field_size = 8190
 
+# メトリクス設定（全ワーカーの値を /metrics で集計するための共有ディレクトリ）
+# preload_app でアプリが読み込まれる前に用意する必要があるため、設定読み込み時に作成する
+prometheus_multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+def on_starting(server):
+    """ワーカーを起動する前に、マスタープロセスで1回だけDBのスキーマを最新にする"""
+    from migrations import migrate_all
+    for db_path, version in migrate_all().items():
+        server.log.info("DBスキーマ: %s (version %d)", db_path, version)
+
+def when_ready(server):
+    """WEATHER_PREFETCH_IN_MASTER=true のときだけ、マスタープロセスで天気予報の定期取得を開始
+
+    既定では celery-beat の refresh_weather_forecasts が取得する（両方で取得すると重複する）。
+    マスターはワーカーを fork し直すため（max_requests）、スレッドがログ・SQLite・SSLのロックを
+    持っている瞬間に fork すると子プロセスが止まることがある。Celery を使わない構成でだけ有効にする。
+    """
+    if os.getenv('WEATHER_PREFETCH_IN_MASTER', 'false').lower() != 'true':
+        return
+    from weather_refresher import create_forecast_prefetcher
+    create_forecast_prefetcher().start()
+    server.log.info("天気予報の定期取得を開始しました")
+
+def child_exit(server, worker):
+    """終了したワーカーのメトリクスを集計対象から外す"""
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
 # 環境変数
 raw_env = [
     "FLASK_ENV=production",
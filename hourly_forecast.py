@@ -0,0 +1,147 @@
+"""
+1時間ごとの天気予報
+
+都市ごとに予報開始日の0時からの経過時間（時間単位のオフセット）を添字にした配列で保持する。
+雨・晴れの時間数は累積和にしておくため、イベントの開催時間帯と重なる予報は
+時間帯の長さによらず添字の計算と引き算だけで求まる。
+"""
+
+import re
+from array import array
+from datetime import date
+
+# フラグのビット
+RAINY = 1
+SUNNY = 2
+
+# 終了時刻が分からないイベントの想定開催時間
+DEFAULT_EVENT_HOURS = 2
+
+# '10:00', '10時', '10:00〜12:00', '9:30-16:00' などから開始・終了の時を取り出す
+_TIME_RANGE = re.compile(r'^\s*(\d{1,2})(?:[:：時]\d{0,2}分?)?\s*(?:[〜~～\-－]\s*(\d{1,2}))?')
+
+
+def parse_event_hours(event_time):
+    """イベントの時刻文字列から (開始の時, 終了の時) を取得（解釈できなければ None）"""
+    if not event_time:
+        return None
+    match = _TIME_RANGE.match(event_time)
+    if not match:
+        return None
+
+    start = int(match.group(1))
+    if start > 23:
+        return None
+    end = int(match.group(2)) if match.group(2) else start + DEFAULT_EVENT_HOURS
+    if end <= start:
+        end = start + DEFAULT_EVENT_HOURS
+    return start, end
+
+
+def city_for_event(event, cities, default=None):
+    """イベントの開催地（location・source_city）から対象都市を判定"""
+    # 'つくば市' と 'つくばみらい市' のような部分一致を避けるため長い名前から調べる
+    for city in sorted(cities, key=len, reverse=True):
+        if (event.location and city in event.location) or (event.source_city and city in event.source_city):
+            return city
+    return default
+
+
+class HourlyForecast:
+    """1都市分の1時間ごとの予報"""
+
+    __slots__ = ('start_date', 'flags', 'precipitation', '_start_ordinal', '_rainy_sum', '_sunny_sum')
+
+    def __init__(self, start_date, flags, precipitation):
+        self.start_date = start_date
+        self.flags = flags if isinstance(flags, array) else array('B', flags)
+        self.precipitation = precipitation if isinstance(precipitation, array) else array('f', precipitation)
+        self._start_ordinal = date.fromisoformat(start_date).toordinal()
+
+        # 雨・晴れの時間数の累積和（先頭は0）
+        rainy_sum = array('H', [0])
+        sunny_sum = array('H', [0])
+        rainy = sunny = 0
+        for flag in self.flags:
+            rainy += flag & RAINY
+            sunny += (flag & SUNNY) >> 1
+            rainy_sum.append(rainy)
+            sunny_sum.append(sunny)
+        self._rainy_sum = rainy_sum
+        self._sunny_sum = sunny_sum
+
+    def __len__(self):
+        return len(self.flags)
+
+    def offset(self, event_date, hour):
+        """日付と時からオフセットを計算（予報の範囲外なら None）"""
+        try:
+            index = (date.fromisoformat(event_date).toordinal() - self._start_ordinal) * 24 + hour
+        except (TypeError, ValueError):
+            return None
+        if 0 <= index < len(self.flags):
+            return index
+        return None
+
+    def window(self, start, end):
+        """オフセット [start, end) の時間帯の (雨が降るか, 晴れが多いか)"""
+        end = min(end, len(self.flags))
+        hours = end - start
+        rainy_hours = self._rainy_sum[end] - self._rainy_sum[start]
+        sunny_hours = self._sunny_sum[end] - self._sunny_sum[start]
+        is_rainy = rainy_hours > 0
+        return is_rainy, not is_rainy and sunny_hours * 2 >= hours
+
+    def windows_for_events(self, events):
+        """各イベントの開催時間帯の予報をまとめて取得
+
+        戻り値はイベントと同じ順の (雨が降るか, 晴れが多いか, 'HH:00-HH:00') のリスト。
+        開催時刻が不明・予報の範囲外のイベントは None。
+        """
+        results = []
+        for event in events:
+            hours = parse_event_hours(event.time)
+            start = self.offset(event.date, hours[0]) if hours else None
+            if start is None:
+                results.append(None)
+                continue
+            end = start + (hours[1] - hours[0])
+            is_rainy, is_sunny = self.window(start, end)
+            results.append((is_rainy, is_sunny, f'{hours[0]:02d}:00-{min(hours[1], 24):02d}:00'))
+        return results
+
+    def to_blobs(self):
+        """SQLiteに保存するためのバイト列"""
+        return self.flags.tobytes(), self.precipitation.tobytes()
+
+    @classmethod
+    def from_blobs(cls, start_date, flags_blob, precipitation_blob):
+        """to_blobs() のバイト列から復元"""
+        flags = array('B')
+        flags.frombytes(flags_blob)
+        precipitation = array('f')
+        precipitation.frombytes(precipitation_blob)
+        return cls(start_date, flags, precipitation)
+
+    @classmethod
+    def from_hours(cls, hours):
+        """(日時'YYYY-MM-DD HH:MM', 雨か, 晴れか, 降水量mm) の並びから作成
+
+        予報が欠けている時間は雨でも晴れでもない扱いになる。
+        """
+        hours = sorted(hours)
+        if not hours:
+            return None
+
+        start_date = hours[0][0][:10]
+        start_ordinal = date.fromisoformat(start_date).toordinal()
+        last = hours[-1][0]
+        size = (date.fromisoformat(last[:10]).toordinal() - start_ordinal) * 24 + int(last[11:13]) + 1
+
+        flags = array('B', bytes(size))
+        precipitation = array('f', [0.0]) * size
+        for time_text, is_rainy, is_sunny, precip in hours:
+            index = (date.fromisoformat(time_text[:10]).toordinal() - start_ordinal) * 24 + int(time_text[11:13])
+            flags[index] = (RAINY if is_rainy else 0) | (SUNNY if is_sunny else 0)
+            precipitation[index] = precip or 0.0
+        return cls(start_date, flags, precipitation)
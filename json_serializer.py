@@ -0,0 +1,126 @@
+"""
+高速JSONシリアライザー
+
+orjson / msgspec がインストールされていればそれを使い、
+どちらも無い場合は標準ライブラリの json にフォールバックする。
+バックエンドは環境変数 JSON_BACKEND (auto / orjson / msgspec / json) で固定できる。
+"""
+
+import dataclasses
+import json
+import os
+import sqlite3
+from datetime import date, datetime
+
+from flask import has_request_context, request
+from flask.json.provider import JSONProvider
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+# データクラスごとのフィールド名（標準json使用時のみ参照）
+_dataclass_fields = {}
+
+
+def _default(obj):
+    """各エンコーダーが直接扱えない型を変換"""
+    if isinstance(obj, sqlite3.Row):
+        # 列名はカーソル単位で共有されるため、キーの再計算は発生しない
+        return dict(zip(obj.keys(), obj))
+    if dataclasses.is_dataclass(obj):
+        names = _dataclass_fields.get(type(obj))
+        if names is None:
+            names = _dataclass_fields[type(obj)] = tuple(f.name for f in dataclasses.fields(obj))
+        return {name: getattr(obj, name) for name in names}
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _select_backend():
+    """利用するバックエンド名を決定"""
+    requested = os.getenv('JSON_BACKEND', 'auto').lower()
+
+    if requested == 'orjson' and orjson is not None:
+        return 'orjson'
+    if requested == 'msgspec' and msgspec is not None:
+        return 'msgspec'
+    if requested == 'json':
+        return 'json'
+
+    # auto（または指定ライブラリが未インストール）の場合は速い順に選ぶ
+    if orjson is not None:
+        return 'orjson'
+    if msgspec is not None:
+        return 'msgspec'
+    return 'json'
+
+
+BACKEND = _select_backend()
+
+if BACKEND == 'orjson':
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        """オブジェクトをJSONバイト列に変換"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+
+elif BACKEND == 'msgspec':
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(obj):
+        """オブジェクトをJSONバイト列に変換"""
+        return _encoder.encode(obj)
+
+    loads = _decoder.decode
+
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj):
+        """オブジェクトをJSONバイト列に変換"""
+        return _encoder.encode(obj).encode('utf-8')
+
+    loads = json.loads
+
+
+def dumps_str(obj):
+    """オブジェクトをJSON文字列に変換"""
+    return dumps(obj).decode('utf-8')
+
+
+class FastJSONProvider(JSONProvider):
+    """json_serializer を使うFlask用JSONプロバイダー"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps_str(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        # str を経由せずバイト列のままレスポンスに載せる
+        obj = self._prepare_response_obj(args, kwargs)
+        endpoint = request.url_rule.rule if has_request_context() and request.url_rule else 'unmatched'
+        with metrics.time_serialization(endpoint):
+            body = dumps(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -1,84 +1,162 @@
+import atexit
+import json
 import logging
 import os
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# LogRecord が標準で持つ属性（これ以外は extra で渡された構造化フィールドとして出力する）
+_RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+# プロセス内で1つだけ起動するリスナーと、キューに積むハンドラー
+_listener = None
+_queue_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1レコードのJSON形式で出力するフォーマッター"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """大量に出るDEBUGログを一定割合だけ通すフィルター"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
 
 def setup_logger(app):
-    """ログ設定をセットアップ"""
-    
+    """ログ設定をセットアップ
+
+    ロガーはキューに積むだけで、ファイル・標準出力への書き込みは
+    QueueListener のスレッドで行う。何度呼ばれてもハンドラーは重複しない。
+    スレッドは fork で引き継がれないため、fork した子プロセス（preload_app の gunicorn ワーカー）では
+    新しいキューでリスナーを起動し直す。
+    """
+    global _queue_handler
+
+    # ログレベル
+    log_level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO'))
+    sample_rate = float(app.config.get('LOG_DEBUG_SAMPLE_RATE', 1.0))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+
+    # Flaskアプリケーションロガーはルートロガーに伝播させるだけにする
+    app.logger.setLevel(log_level)
+    for handler in list(app.logger.handlers):
+        app.logger.removeHandler(handler)
+    app.logger.propagate = True
+
+    if _listener is not None:
+        return app.logger
+
     # ログディレクトリを作成
     log_dir = 'logs'
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
+
     # ログファイル名
     log_file = os.path.join(log_dir, 'app.log')
-    
-    # ログレベル
-    log_level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO'))
-    
-    # フォーマッター
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
+
+    formatter = JsonFormatter()
+
     # ファイルハンドラー（ローテーション付き）
     file_handler = RotatingFileHandler(
-        log_file, 
+        log_file,
         maxBytes=1024 * 1024,  # 1MB
-        backupCount=10
+        backupCount=10,
+        encoding='utf-8'
     )
     file_handler.setFormatter(formatter)
-    file_handler.setLevel(log_level)
-    
+
     # コンソールハンドラー
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    console_handler.setLevel(log_level)
-    
-    # ルートロガーを設定
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    
-    # Flaskアプリケーションロガー
-    app.logger.setLevel(log_level)
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(console_handler)
-    
+
+    # 既存のハンドラー（basicConfig などで追加されたもの）を外して二重出力を防ぐ
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+
+    _queue_handler = QueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(SamplingFilter(sample_rate))
+    root_logger.addHandler(_queue_handler)
+
+    start_listener(file_handler, console_handler)
+    atexit.register(stop_listener)
+    os.register_at_fork(after_in_child=_restart_listener)
+
     return app.logger
 
+
+def start_listener(*handlers):
+    """新しいキューで書き込みのスレッドを起動する"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_listener():
+    """キューに残ったログを書き出してスレッドを止める"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_listener():
+    # 親のキューに残っているログは親が書き出すので、子は新しいキューを使う
+    if _listener is not None:
+        start_listener(*_listener.handlers)
+
 def log_event_scraping(city_name, event_count, success=True):
     """イベントスクレイピングのログ"""
     logger = logging.getLogger('event_scraper')
     if success:
-        logger.info(f"{city_name}から{event_count}件のイベントを取得しました")
+        logger.info("%sから%d件のイベントを取得しました", city_name, event_count,
+                    extra={'city': city_name, 'event_count': event_count})
     else:
-        logger.error(f"{city_name}からのイベント取得に失敗しました")
+        logger.error("%sからのイベント取得に失敗しました", city_name, extra={'city': city_name})
 
 def log_weather_api(city_name, success=True, error_message=None):
     """天気APIのログ"""
     logger = logging.getLogger('weather_api')
     if success:
-        logger.info(f"{city_name}の天気予報を取得しました")
+        logger.info("%sの天気予報を取得しました", city_name, extra={'city': city_name})
     else:
-        logger.error(f"{city_name}の天気予報取得に失敗: {error_message}")
+        logger.error("%sの天気予報取得に失敗: %s", city_name, error_message, extra={'city': city_name})
 
 def log_user_action(action, user_ip=None, details=None):
     """ユーザーアクションのログ"""
     logger = logging.getLogger('user_actions')
-    message = f"アクション: {action}"
-    if user_ip:
-        message += f", IP: {user_ip}"
-    if details:
-        message += f", 詳細: {details}"
-    logger.info(message)
+    logger.info("アクション: %s", action, extra={'action': action, 'user_ip': user_ip, 'details': details})
 
 def log_error(error_type, error_message, stack_trace=None):
     """エラーログ"""
     logger = logging.getLogger('errors')
-    message = f"エラー種別: {error_type}, メッセージ: {error_message}"
-    if stack_trace:
-        message += f", スタックトレース: {stack_trace}"
-    logger.error(message) 
\ No newline at end of file
+    logger.error("エラー種別: %s, メッセージ: %s", error_type, error_message,
+                 extra={'error_type': error_type, 'stack_trace': stack_trace})
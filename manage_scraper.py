@@ -5,14 +5,11 @@
 
 import sys
 import time
-import logging
-from event_scraper import EventScraper
+from event_scraper import EventScraper, setup_scraper_logging
+from event_stats import EventStats
 
 # ログ設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_scraper_logging()
 
 def main():
     """メイン関数"""
@@ -22,10 +19,12 @@ def main():
         print("  python manage_scraper.py run       # 1回実行")
         print("  python manage_scraper.py test      # テスト実行")
         print("  python manage_scraper.py stats     # 統計表示")
+        print("  python manage_scraper.py stats --verify  # 集計を全件集計と照合（食い違いは修正）")
         return
     
     command = sys.argv[1]
     scraper = EventScraper()
+    scraper.init_database()
     
     if command == "start":
         print("🚀 スクレイピングスケジューラーを開始します...")
@@ -58,22 +57,21 @@ def main():
         print(f"  更新イベント: {scraper.stats['updated_events']}")
         print(f"  エラー数: {scraper.stats['errors']}")
         
-        # データベースから実際の統計を取得
-        conn = scraper.db_path
-        import sqlite3
-        conn = sqlite3.connect(scraper.db_path)
-        cursor = conn.cursor()
+        # データベースの統計（トリガーで更新している集計テーブルから読む）
+        event_stats = EventStats(scraper.db_path)
+        if "--verify" in sys.argv[2:]:
+            diff = event_stats.verify(repair=True)
+            if diff:
+                print("⚠️ 集計が全件集計と一致しなかったため作り直しました:")
+                for name, (stored, actual) in diff.items():
+                    print(f"    {name}: {stored} → {actual}")
+            else:
+                print("  ✅ 集計は全件集計と一致しています")
         
-        cursor.execute("SELECT COUNT(*) FROM events WHERE is_active = 1")
-        active_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM events WHERE created_at >= date('now', '-7 days')")
-        recent_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT source_city, COUNT(*) FROM events WHERE is_active = 1 GROUP BY source_city")
-        city_stats = cursor.fetchall()
-        
-        conn.close()
+        summary = event_stats.summary()
+        active_count = summary['active_events']
+        recent_count = summary['recent_events']
+        city_stats = summary['city_stats'].items()
         
         print(f"  アクティブイベント: {active_count}")
         print(f"  過去7日間の新規: {recent_count}")
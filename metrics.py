@@ -0,0 +1,152 @@
+"""
+Prometheus形式のメトリクス
+
+環境変数 PROMETHEUS_MULTIPROC_DIR が設定されている場合は prometheus_client の
+マルチプロセスモードで動作し、gunicornの全ワーカーの値を集計して /metrics で返す。
+prometheus_client が未インストールの環境では計測は何もしない。
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+# 秒単位のバケット（DBクエリやシリアライズのような短い処理も区別できるようにする）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _NoopMetric:
+    """prometheus_client が無い場合の代替"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', 'ルートごとのリクエスト処理時間',
+        ['method', 'endpoint', 'status'], buckets=LATENCY_BUCKETS
+    )
+    DB_QUERY_LATENCY = Histogram(
+        'db_query_duration_seconds', 'SQL文ごとのクエリ実行時間',
+        ['statement'], buckets=LATENCY_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        'cache_requests_total', 'キャッシュ参照回数（result=hit/miss）',
+        ['cache', 'result']
+    )
+    UPSTREAM_LATENCY = Histogram(
+        'upstream_request_duration_seconds', '外部HTTP APIの応答時間',
+        ['service', 'outcome'], buckets=LATENCY_BUCKETS
+    )
+    SERIALIZATION_LATENCY = Histogram(
+        'json_serialization_duration_seconds', 'JSONシリアライズ時間',
+        ['endpoint'], buckets=LATENCY_BUCKETS
+    )
+    SCRAPER_LATENCY = Histogram(
+        'scraper_page_duration_seconds', 'スクレイパーのページ取得・解析時間（phase=fetch/parse）',
+        ['source', 'phase'], buckets=LATENCY_BUCKETS
+    )
+else:
+    REQUEST_LATENCY = DB_QUERY_LATENCY = CACHE_REQUESTS = _NoopMetric()
+    UPSTREAM_LATENCY = SERIALIZATION_LATENCY = SCRAPER_LATENCY = _NoopMetric()
+
+
+@contextmanager
+def _timer(histogram):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def time_db_query(statement):
+    """DBクエリの実行時間を計測"""
+    return _timer(DB_QUERY_LATENCY.labels(statement=statement))
+
+
+def time_serialization(endpoint):
+    """JSONシリアライズ時間を計測"""
+    return _timer(SERIALIZATION_LATENCY.labels(endpoint=endpoint))
+
+
+def time_scraper(source, phase):
+    """スクレイパーのページ取得（fetch）・解析（parse）時間を計測"""
+    return _timer(SCRAPER_LATENCY.labels(source=source, phase=phase))
+
+
+@contextmanager
+def time_upstream(service):
+    """外部HTTP APIの応答時間を計測（例外時は outcome=error）"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        UPSTREAM_LATENCY.labels(service=service, outcome=outcome).observe(time.perf_counter() - start)
+
+
+def record_cache(cache, hit):
+    """キャッシュのヒット/ミスを記録"""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def generate_metrics():
+    """/metrics 用の (本文, Content-Type) を生成"""
+    if prometheus_client is None:
+        return None, None
+
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # 全ワーカーが書き出した値を集計する
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def init_app(app):
+    """Flaskアプリにリクエスト計測と /metrics エンドポイントを登録"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            # ラベルの種類が増えすぎないよう、URLではなくルート定義で集計する
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(
+                method=request.method, endpoint=endpoint, status=response.status_code
+            ).observe(time.perf_counter() - start)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        body, content_type = generate_metrics()
+        if body is None:
+            return 'prometheus_client is not installed\n', 503, {'Content-Type': 'text/plain'}
+        return body, 200, {'Content-Type': content_type, 'Cache-Control': 'no-store'}
+
+
+def mark_process_dead(pid):
+    """終了したワーカーの値を集計対象から外す（gunicornの child_exit から呼ぶ）"""
+    if prometheus_client is not None and os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
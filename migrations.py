@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+DBのスキーマとマイグレーション
+
+events.db・content.db（real_content*.db も同じスキーマ）・restaurants.db のテーブルは
+ここで定義したものだけを正とし、アプリ・スクレイパーのコンストラクタではテーブルを作らない。
+デプロイ時（gunicorn の起動時・スクレイパーの単独実行時）に1回だけ実行する:
+
+    python migrations.py            # 全DBを最新にする
+    python migrations.py --status   # 各DBのバージョンを表示
+
+- バージョンは PRAGMA user_version に記録する。各マイグレーションは書き込みロック
+  （BEGIN IMMEDIATE）を取ってから実行し、user_version の更新と同じトランザクションで確定する。
+- 既存のテーブルの列が正規のスキーマと違う場合（app.init_db や飲食店スクレイパーの各版で
+  作られたテーブル）は、作り直して共通の列をコピーする。
+- journal_mode=WAL と auto_vacuum=INCREMENTAL はDBファイルに保存される設定なので、ここで設定する。
+- 天気予報のキャッシュ（weather_cache.ForecastCache）とアーカイブ（retention.Archive）のテーブルもここで作成する。
+- cache_backend.SQLiteCache は専用の使い捨てのファイル（CACHE_URL）なので、クラスが作成する。
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+
+from config import RESTAURANTS_DB, Config
+from content_store import backfill_content_items, create_content_tables
+from dedupe import backfill_clusters, create_dedupe_tables
+from event_changes import create_change_tables
+from event_stats import create_stats_tables
+from geo_index import backfill_event_places, create_geo_tables
+from retention import create_archive_tables, enable_incremental_vacuum
+from weather_cache import LEGACY_TABLES, WEATHER_CACHE_DB, create_weather_tables
+
+logger = logging.getLogger(__name__)
+
+# テーブル名 → CREATE TABLE 文（{table} にテーブル名が入る）
+EVENT_TABLES = {
+    'events': '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            date TEXT,
+            time TEXT,
+            location TEXT,
+            category TEXT,
+            is_indoor BOOLEAN,
+            is_free BOOLEAN,
+            has_parking BOOLEAN,
+            child_friendly BOOLEAN,
+            weather_dependent BOOLEAN,
+            rain_cancellation TEXT,
+            source_url TEXT,
+            source_city TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+    ''',
+    'scraping_log': '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            source_city TEXT,
+            events_found INTEGER,
+            events_added INTEGER,
+            events_updated INTEGER,
+            errors INTEGER,
+            duration_seconds REAL
+        )
+    ''',
+    # フィルター結果のキャッシュの世代番号（filter_cache.bump_generation）
+    'events_meta': '''
+        CREATE TABLE {table} (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''',
+}
+
+# 種類ごとのコンテンツのテーブル（_content_items で content_items に移すまでのスキーマ）
+# 開催日のあるコンテンツ（季節イベント・子育て・文化施設）
+_DATED_CONTENT = '''
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        date TEXT,
+        location TEXT,
+        category TEXT,
+        city TEXT,
+        source_url TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# 開催日の無いコンテンツ（グルメ・観光）
+_UNDATED_CONTENT = '''
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        location TEXT,
+        category TEXT,
+        city TEXT,
+        source_url TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+CONTENT_TABLES = {
+    'seasonal_events': _DATED_CONTENT,
+    'food_info': _UNDATED_CONTENT,
+    'childcare_info': _DATED_CONTENT,
+    'tourism_info': _UNDATED_CONTENT,
+    'culture_info': _DATED_CONTENT,
+}
+
+# restaurant_scraper.py（市・住所・電話）と他の版（場所）の列を合わせたもの
+RESTAURANT_TABLES = {
+    'restaurants': '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            city TEXT,
+            address TEXT,
+            phone TEXT,
+            location TEXT,
+            category TEXT,
+            opening_date TEXT,
+            source_url TEXT,
+            source_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+    ''',
+}
+
+
+def _columns(conn, table):
+    return [tuple(row[1:]) for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def ensure_table(conn, table, create_sql):
+    """テーブルを正規のスキーマにする（無ければ作成、列が違えば作り直して共通の列をコピー）
+
+    作り直すとテーブルのインデックス・トリガーも消えるため、それらは後のマイグレーションで作成する。
+    """
+    existing = _columns(conn, table)
+    if not existing:
+        conn.execute(create_sql.format(table=table))
+        return
+
+    staging = f'{table}__migrating'
+    conn.execute(f'DROP TABLE IF EXISTS {staging}')
+    conn.execute(create_sql.format(table=staging))
+    canonical = _columns(conn, staging)
+    if canonical == existing:
+        conn.execute(f'DROP TABLE {staging}')
+        return
+
+    existing_names = {column[0] for column in existing}
+    common = ', '.join(column[0] for column in canonical if column[0] in existing_names)
+    conn.execute(f'INSERT INTO {staging} ({common}) SELECT {common} FROM {table}')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {staging} RENAME TO {table}')
+    logger.info("テーブルを正規のスキーマに作り直しました: %s", table)
+
+
+def _events_tables(conn):
+    for table, create_sql in EVENT_TABLES.items():
+        ensure_table(conn, table, create_sql)
+
+
+def _events_indexes(conn):
+    # 有効なイベントの一覧・古いイベントの非アクティブ化
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_active_date ON events (is_active, date)')
+    # スクレイパーの既存イベントの照合
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_title_source_url ON events (title, source_url)')
+    # ビットマップインデックスの差分更新（updated_at >= 前回の更新）
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_updated_at ON events (updated_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scraping_log_run_date ON scraping_log (run_date)')
+
+
+def _events_geo(conn):
+    create_geo_tables(conn)
+    backfill_event_places(conn)
+
+
+def _events_dedupe(conn):
+    create_dedupe_tables(conn)
+    backfill_clusters(conn)
+
+
+def _events_weather(conn):
+    # 天気予報の共有キャッシュ（weather_cache.ForecastCache）。以前の形式のテーブルは削除する
+    create_weather_tables(conn)
+    for table in LEGACY_TABLES:
+        conn.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def _content_tables(conn):
+    for table, create_sql in CONTENT_TABLES.items():
+        ensure_table(conn, table, create_sql)
+
+
+def _content_unique(conn):
+    # INSERT OR REPLACE で同じ記事が重複して増えていたため、(タイトル, URL) を一意にする
+    for table in CONTENT_TABLES:
+        conn.execute(f'''
+            DELETE FROM {table} WHERE id NOT IN (
+                SELECT MAX(id) FROM {table} GROUP BY title, source_url
+            )
+        ''')
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_title_source_url ON {table} (title, source_url)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table} (created_at)')
+
+
+def _content_items(conn):
+    # 種類ごとの5テーブルを content_items 1つにまとめる
+    create_content_tables(conn)
+    backfill_content_items(conn, CONTENT_TABLES)
+    for table in CONTENT_TABLES:
+        conn.execute(f'DROP TABLE {table}')
+
+
+def _restaurant_tables(conn):
+    for table, create_sql in RESTAURANT_TABLES.items():
+        ensure_table(conn, table, create_sql)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_restaurants_name_city ON restaurants (name, city)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_restaurants_active ON restaurants (is_active, opening_date)')
+
+
+# スキーマ名 → マイグレーション（i 番目を適用すると user_version が i + 1 になる）
+# 適用済みのマイグレーションは変更せず、末尾に追加する
+MIGRATIONS = {
+    'events': [_events_tables, _events_indexes, _events_geo, _events_dedupe, create_stats_tables,
+               create_change_tables, _events_weather],
+    'content': [_content_tables, _content_unique, _content_items],
+    'restaurants': [_restaurant_tables],
+    # WEATHER_CACHE_DB を events.db と別のファイルにした場合の予報キャッシュ
+    'weather': [_events_weather],
+    # 保持期間を過ぎた行のアーカイブ（retention.Archive）
+    'archive': [create_archive_tables],
+}
+
+
+def databases(settings=Config):
+    """マイグレーションする (DBのパス, スキーマ名)"""
+    return [
+        (settings.DATABASE_URL, 'events'),
+        (settings.CONTENT_DATABASE_URL, 'content'),
+        # RealContentScraper / RealContentScraperV2 の保存先
+        ('real_content.db', 'content'),
+        ('real_content_v2.db', 'content'),
+        (RESTAURANTS_DB, 'restaurants'),
+        (settings.ARCHIVE_DATABASE_URL, 'archive'),
+    ] + ([(WEATHER_CACHE_DB, 'weather')] if WEATHER_CACHE_DB != settings.DATABASE_URL else [])
+
+
+def schema_version(db_path):
+    """DBの user_version（ファイルが無ければ 0）"""
+    if not os.path.exists(db_path):
+        return 0
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def migrate(db_path, schema):
+    """DBを最新のスキーマにして user_version を返す（最新なら何もしない）"""
+    migrations = MIGRATIONS[schema]
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(migrations[version:], start=version + 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # 同時に起動した別のプロセスが先に適用していないか、ロックを取ってから確認する
+                if conn.execute('PRAGMA user_version').fetchone()[0] >= number:
+                    conn.execute('ROLLBACK')
+                    continue
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {number}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            logger.info("マイグレーションを適用しました: %s %d (%s)", db_path, number, migration.__name__)
+
+        if conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+            conn.execute('PRAGMA journal_mode=WAL')
+        enable_incremental_vacuum(conn)
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def migrate_all(settings=Config):
+    """全DBを最新にして {DBのパス: user_version} を返す"""
+    return {db_path: migrate(db_path, schema) for db_path, schema in databases(settings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DBのスキーマを最新にする')
+    parser.add_argument('--status', action='store_true', help='適用せずに各DBのバージョンを表示')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for db_path, schema in databases():
+        latest = len(MIGRATIONS[schema])
+        version = schema_version(db_path) if args.status else migrate(db_path, schema)
+        mark = '✅' if version >= latest else '⏳'
+        print(f"{mark} {db_path} ({schema}): {version}/{latest}")
+
+
+if __name__ == '__main__':
+    main()
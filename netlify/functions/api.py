@@ -1,8 +1,106 @@
+import hashlib
 import json
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 以下のモジュール変数はウォームスタート（同じコンテナでの2回目以降の呼び出し）で再利用される。
+# events.db はデプロイ時に同梱される読み取り専用のファイルなので、
+# コンテナが生きている間は接続も組み立て済みのレスポンスも作り直す必要がない。
+DB_PATH = os.path.join(os.path.dirname(__file__), 'events.db')
+
+# 差分（?since=）の形式と、次の since に使う値を戻す秒数（event_changes.py と同じ）
+CURSOR_FORMAT = '%Y-%m-%d %H:%M:%S'
+CURSOR_OVERLAP_SECONDS = 60
+EVENT_CHANGES_MAX_AGE_DAYS = int(os.getenv('EVENT_CHANGES_MAX_AGE_DAYS', '7'))
+
+# WeatherAPI.comのキー
+WEATHER_API_KEY = os.getenv('WEATHERAPI_KEY', '88ed0e701cfc4c7fb0d13301253107')
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', '600'))  # 10分
+# 天気の応答を待つ全体の期限（秒）。間に合わなかった都市は前回の値で返す
+WEATHER_DEADLINE = float(os.getenv('WEATHER_DEADLINE', '4'))
+WEATHER_REQUEST_TIMEOUT = 10
+
+WEATHER_CITIES = [
+    {'name': 'つくば市', 'query': 'Tsukuba,Japan'},
+    {'name': 'つくばみらい市', 'query': 'Tsukubamirai,Japan'},
+    {'name': '取手市', 'query': 'Toride,Japan'},
+    {'name': '守谷市', 'query': 'Moriya,Japan'}
+]
+
+_conn = None
+_conn_lock = threading.Lock()
+
+# エンドポイント名 → 組み立て済みのJSON（timestamp を除いた部分）
+_responses = {}
+
+# 都市名 → (期限, 天気)。取得に失敗した都市は保存せず、期限切れの値は代わりの値として残す
+_weather_cache = {}
+# 都市名 → 取得中の Future（期限に間に合わなかった取得を次の呼び出しで待ち直す）
+_weather_pending = {}
+_weather_session = None
+_weather_executor = ThreadPoolExecutor(max_workers=len(WEATHER_CITIES))
+
+
+def _dumps(obj):
+    """レスポンスボディ用のJSON文字列を生成（orjsonがあれば使用）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj)
+
+
+def get_connection():
+    """読み取り専用の接続（最初の呼び出しで開き、以降は使い回す）
+
+    immutable=1 でファイルの変更確認とロックを省く。
+    """
+    global _conn
+    if _conn is None:
+        with _conn_lock:
+            if _conn is None:
+                _conn = sqlite3.connect(f'file:{DB_PATH}?mode=ro&immutable=1', uri=True,
+                                        check_same_thread=False)
+    return _conn
+
+
+def cached_response(name, build):
+    """組み立て済みのJSONを返す（無ければ build() で作って保存）"""
+    body = _responses.get(name)
+    if body is None:
+        body = _responses[name] = build()
+    return body
+
+
+def _with_timestamp(body):
+    """組み立て済みのJSONオブジェクトの末尾に timestamp を付ける"""
+    return '%s,"timestamp":%s}' % (body[:-1], _dumps(datetime.now().isoformat()))
+
+
+def json_response(event, headers, body):
+    """組み立て済みのJSONのレスポンス
+
+    ETag は timestamp を付ける前の本文から作るので、データが同じなら毎回同じになる。
+    If-None-Match が一致すれば本文を送らず 304 を返す（sw.js・ブラウザのキャッシュを使わせる）。
+    """
+    etag = '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()[:20]
+    headers = dict(headers, **{'ETag': etag, 'Cache-Control': 'no-cache'})
+    request_headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    if etag in request_headers.get('if-none-match', ''):
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': _with_timestamp(body)
+    }
+
 def handler(event, context):
     """Netlify Function handler"""
     
@@ -10,7 +108,9 @@ def handler(event, context):
     headers = {
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Headers': 'Content-Type',
-        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+        # sw.js が別オリジンのレスポンスの ETag を比べられるようにする
+        'Access-Control-Expose-Headers': 'ETag'
     }
     
     # Handle preflight requests
@@ -26,7 +126,8 @@ def handler(event, context):
     try:
         if path == 'events':
             return get_events(event, headers)
-        elif path == 'weather':
+        elif path in ('weather', 'cities'):
+            # /api/weather/cities は複数都市の天気をまとめて返す
             return get_weather(event, headers)
         elif path == 'stats':
             return get_stats(event, headers)
@@ -36,137 +137,154 @@ def handler(event, context):
             return {
                 'statusCode': 404,
                 'headers': headers,
-                'body': json.dumps({'error': 'Endpoint not found'})
+                'body': _dumps({'error': 'Endpoint not found'})
             }
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': str(e)})
+            'body': _dumps({'error': str(e)})
         }
 
 def get_events(event, headers):
-    """スクレイピングされたイベントデータを取得"""
+    """スクレイピングされたイベントデータを取得（?since= なら前回以降の差分）"""
+    since = ((event.get('queryStringParameters') or {}).get('since') or '').strip()
     try:
-        # データベースファイルのパス（Netlify Functions環境用）
-        db_path = os.path.join(os.path.dirname(__file__), 'events.db')
-        
-        # データベースに接続
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # アクティブなイベントを取得
-        cursor.execute('''
-            SELECT id, title, description, date, time, location, category,
-                   is_indoor, is_free, has_parking, child_friendly,
-                   weather_dependent, rain_cancellation, source_url, source_city
-            FROM events 
-            WHERE is_active = 1 
-            ORDER BY date ASC, created_at DESC
-        ''')
-        
-        events = []
-        for row in cursor.fetchall():
-            event = {
-                'id': row[0],
-                'title': row[1],
-                'description': row[2] or '',
-                'date': row[3],
-                'time': row[4] or '',
-                'location': row[5] or '',
-                'category': row[6] or 'その他',
-                'is_indoor': bool(row[7]) if row[7] is not None else None,
-                'is_free': bool(row[8]) if row[8] is not None else None,
-                'has_parking': bool(row[9]) if row[9] is not None else False,
-                'child_friendly': bool(row[10]) if row[10] is not None else False,
-                'weather_dependent': bool(row[11]) if row[11] is not None else False,
-                'rain_cancellation': row[12] or None,
-                'source_url': row[13] or '',
-                'source_city': row[14] or ''
-            }
-            events.append(event)
-        
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'events': events,
-                'count': len(events),
-                'timestamp': datetime.now().isoformat()
-            })
-        }
+        if since:
+            try:
+                since = datetime.strptime(since, CURSOR_FORMAT).strftime(CURSOR_FORMAT)
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': _dumps({'error': 'since は YYYY-MM-DD HH:MM:SS で指定してください'})
+                }
+            body = _build_events_delta(since)
+            if body is not None:
+                return json_response(event, headers, body)
+        return json_response(event, headers, cached_response('events', _build_events))
         
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': f'Database error: {str(e)}'})
+            'body': _dumps({'error': f'Database error: {str(e)}'})
         }
 
+# イベント1件のJSON（SQLite側で組み立てる）
+_EVENT_JSON = '''
+    json_object(
+        'id', id,
+        'title', title,
+        'description', COALESCE(description, ''),
+        'date', date,
+        'time', COALESCE(time, ''),
+        'location', COALESCE(location, ''),
+        'category', COALESCE(NULLIF(category, ''), 'その他'),
+        'is_indoor', CASE WHEN is_indoor IS NULL THEN NULL
+                          WHEN is_indoor THEN json('true') ELSE json('false') END,
+        'is_free', CASE WHEN is_free IS NULL THEN NULL
+                        WHEN is_free THEN json('true') ELSE json('false') END,
+        'has_parking', CASE WHEN has_parking THEN json('true') ELSE json('false') END,
+        'child_friendly', CASE WHEN child_friendly THEN json('true') ELSE json('false') END,
+        'weather_dependent', CASE WHEN weather_dependent THEN json('true') ELSE json('false') END,
+        'rain_cancellation', NULLIF(rain_cancellation, ''),
+        'source_url', COALESCE(source_url, ''),
+        'source_city', COALESCE(source_city, '')
+    )
+'''
+
+def _ordered_json(conn, sql, params=()):
+    """1行1件のJSON文字列を ORDER BY の順で返す
+
+    json_group_array は集約の中で行の順序を保証しないため、配列はPython側で組み立てる。
+    """
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+def _json_array(items):
+    """JSON文字列の一覧をJSON配列の文字列にする"""
+    return '[%s]' % ','.join(items)
+
+
+def _events_cursor():
+    """次の since= に使う値（削除の記録が無い、マイグレーション前のDBでは None）"""
+    try:
+        return get_connection().execute('''
+            SELECT COALESCE(datetime(MAX(
+                COALESCE((SELECT MAX(updated_at) FROM events), ''),
+                COALESCE((SELECT MAX(deleted_at) FROM deleted_events), '')
+            ), ?), '1970-01-01 00:00:00')
+        ''', (f'-{CURSOR_OVERLAP_SECONDS} seconds',)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def _build_events():
+    """アクティブなイベントの一覧のJSON"""
+    # 1件ずつSQLite側でJSONに変換し、Python側では並んだ文字列をつなぐだけにする
+    # （行ごとに辞書を組み立てない）
+    rows = _ordered_json(get_connection(), f'''
+        SELECT {_EVENT_JSON} FROM events
+        WHERE is_active = 1
+        ORDER BY date ASC, created_at DESC
+    ''')
+    return '{"events":%s,"count":%d,"cursor":%s,"full":true}' % (
+        _json_array(rows), len(rows), _dumps(_events_cursor()))
+
+def _build_events_delta(since):
+    """since 以降に変わったイベントのJSON（差分を返せないときは None で、全件を返す）"""
+    cursor = _events_cursor()
+    if cursor is None:
+        return None
+    conn = get_connection()
+    expired = conn.execute(
+        "SELECT ? < datetime('now', '-' || ? || ' days')", (since, EVENT_CHANGES_MAX_AGE_DAYS)
+    ).fetchone()[0]
+    if expired:
+        return None
+
+    events = _ordered_json(conn, f'''
+        SELECT {_EVENT_JSON} FROM events
+        WHERE updated_at >= :since AND is_active = 1
+        ORDER BY date ASC, created_at DESC
+    ''', {'since': since})
+    removed = [row[0] for row in conn.execute('''
+        SELECT id FROM events WHERE updated_at >= :since AND is_active = 0
+        UNION SELECT id FROM deleted_events WHERE deleted_at >= :since
+        ORDER BY id
+    ''', {'since': since})]
+    return '{"events":%s,"removed":%s,"cursor":%s,"full":false}' % (
+        _json_array(events), _dumps(removed), _dumps(cursor))
+
 def get_weather(event, headers):
-    """天気データを取得（WeatherAPI.comを使用）"""
+    """天気データを取得（WeatherAPI.comを使用）
+
+    期限切れの都市を並列に取得し、全体で WEATHER_DEADLINE 秒まで待つ。
+    応答時間は最も遅い1都市（最大でも期限）で決まり、都市数の合計にはならない。
+    """
     try:
-        import requests
-        
-        # WeatherAPI.comのキー
-        API_KEY = '88ed0e701cfc4c7fb0d13301253107'
-        
-        # 複数都市の天気データを取得
-        cities = [
-            {'name': 'つくば市', 'query': 'Tsukuba,Japan'},
-            {'name': 'つくばみらい市', 'query': 'Tsukubamirai,Japan'},
-            {'name': '取手市', 'query': 'Toride,Japan'},
-            {'name': '守谷市', 'query': 'Moriya,Japan'}
-        ]
-        
+        now = time.monotonic()
         weather_data = {}
-        
-        for city in cities:
-            try:
-                response = requests.get(
-                    f'https://api.weatherapi.com/v1/current.json',
-                    params={
-                        'key': API_KEY,
-                        'q': city['query'],
-                        'aqi': 'no'
-                    },
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    weather_data[city['name']] = {
-                        'temperature': round(data['current']['temp_c']),
-                        'condition': data['current']['condition']['text'],
-                        'humidity': data['current']['humidity'],
-                        'rain_probability': round(data['current']['precip_mm'] * 10) if data['current']['precip_mm'] > 0 else 0,
-                        'icon': data['current']['condition']['icon']
-                    }
-                else:
-                    weather_data[city['name']] = {
-                        'temperature': '--',
-                        'condition': 'データ取得中',
-                        'humidity': '--',
-                        'rain_probability': 0,
-                        'icon': '113'
-                    }
-                    
-            except Exception as e:
-                weather_data[city['name']] = {
-                    'temperature': '--',
-                    'condition': 'データ取得中',
-                    'humidity': '--',
-                    'rain_probability': 0,
-                    'icon': '113'
-                }
-        
+        futures = {}
+        for city in WEATHER_CITIES:
+            cached = _weather_cache.get(city['name'])
+            if cached and cached[0] > now:
+                weather_data[city['name']] = cached[1]
+            else:
+                futures[refresh_city_weather(city)] = city
+
+        if futures:
+            wait(futures, timeout=WEATHER_DEADLINE)
+
+        for future, city in futures.items():
+            weather = future.result() if future.done() else None
+            weather_data[city['name']] = weather or fallback_weather(city['name'])
+
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps({
-                'weather': weather_data,
+            'body': _dumps({
+                'weather': {city['name']: weather_data[city['name']] for city in WEATHER_CITIES},
                 'timestamp': datetime.now().isoformat()
             })
         }
@@ -175,75 +293,141 @@ def get_weather(event, headers):
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': f'Weather API error: {str(e)}'})
+            'body': _dumps({'error': f'Weather API error: {str(e)}'})
         }
 
-def get_stats(event, headers):
-    """スクレイピング統計を取得"""
+def refresh_city_weather(city):
+    """1都市の取得を開始して Future を返す（同じ都市の取得中なら、その Future）
+
+    期限後に完了した取得もキャッシュに入るため、次の呼び出しで使われる。
+    """
+    future = _weather_pending.get(city['name'])
+    if future is None or future.done():
+        future = _weather_pending[city['name']] = _weather_executor.submit(_fetch_and_cache, city)
+    return future
+
+def _fetch_and_cache(city):
+    weather = fetch_city_weather(city)
+    if weather is not None:
+        _weather_cache[city['name']] = (time.monotonic() + WEATHER_CACHE_TTL, weather)
+    return weather
+
+def fallback_weather(name):
+    """取得できなかった都市の値（前回の値があれば stale を付けて返す）"""
+    cached = _weather_cache.get(name)
+    if cached:
+        return dict(cached[1], stale=True)
+    return {
+        'temperature': '--',
+        'condition': 'データ取得中',
+        'humidity': '--',
+        'rain_probability': 0,
+        'icon': '113'
+    }
+
+def fetch_city_weather(city):
+    """1都市の現在の天気（失敗したら None）"""
+    global _weather_session
+    import requests
+
+    if _weather_session is None:
+        # 接続（TLS）をウォームスタートでも使い回す
+        _weather_session = requests.Session()
+
     try:
-        db_path = os.path.join(os.path.dirname(__file__), 'events.db')
-        
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # 統計データを取得
-        cursor.execute("SELECT COUNT(*) FROM events WHERE is_active = 1")
-        active_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM events WHERE created_at >= date('now', '-7 days')")
-        recent_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT source_city, COUNT(*) FROM events WHERE is_active = 1 GROUP BY source_city")
-        city_stats = dict(cursor.fetchall())
-        
-        conn.close()
-        
+        response = _weather_session.get(
+            'https://api.weatherapi.com/v1/current.json',
+            params={
+                'key': WEATHER_API_KEY,
+                'q': city['query'],
+                'aqi': 'no'
+            },
+            timeout=WEATHER_REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            return None
+        current = response.json()['current']
         return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'active_events': active_count,
-                'recent_events': recent_count,
-                'city_stats': city_stats,
-                'timestamp': datetime.now().isoformat()
-            })
+            'temperature': round(current['temp_c']),
+            'condition': current['condition']['text'],
+            'humidity': current['humidity'],
+            'rain_probability': round(current['precip_mm'] * 10) if current['precip_mm'] > 0 else 0,
+            'icon': current['condition']['icon']
         }
+    except Exception:
+        return None
+
+def get_stats(event, headers):
+    """スクレイピング統計を取得"""
+    try:
+        return json_response(event, headers, cached_response('stats', _build_stats))
         
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': f'Stats error: {str(e)}'})
+            'body': _dumps({'error': f'Stats error: {str(e)}'})
         }
 
+def _build_stats():
+    """統計のJSON（集計テーブルがあるDBはそこから読む。event_stats.py を参照）"""
+    conn = get_connection()
+    has_summary = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_stats'"
+    ).fetchone()
+
+    if has_summary:
+        active_count = conn.execute(
+            "SELECT COALESCE(MAX(value), 0) FROM event_stats WHERE key = 'active'"
+        ).fetchone()[0]
+        recent_count = conn.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM event_daily_created WHERE day >= date('now', '-7 days')"
+        ).fetchone()[0]
+        city_stats = {
+            city or None: count
+            for city, count in conn.execute('SELECT source_city, active FROM event_city_stats WHERE active > 0')
+        }
+    else:
+        active_count, recent_count = conn.execute('''
+            SELECT COALESCE(SUM(is_active = 1), 0),
+                   COALESCE(SUM(created_at >= date('now', '-7 days')), 0)
+            FROM events
+        ''').fetchone()
+        city_stats = dict(conn.execute(
+            "SELECT source_city, COUNT(*) FROM events WHERE is_active = 1 GROUP BY source_city"
+        ).fetchall())
+
+    return _dumps({
+        'active_events': active_count,
+        'recent_events': recent_count,
+        'city_stats': city_stats
+    })
+
 def debug_info(event, headers):
     """デバッグ情報を取得"""
     try:
-        db_path = os.path.join(os.path.dirname(__file__), 'events.db')
+        db_path = DB_PATH
         
         # ファイルの存在確認
         file_exists = os.path.exists(db_path)
         file_size = os.path.getsize(db_path) if file_exists else 0
         
         # データベースに接続してテスト
-        conn = None
         table_exists = False
         event_count = 0
+        db_error = None
         
         if file_exists:
             try:
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
+                conn = get_connection()
                 
                 # テーブルの存在確認
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='events'")
-                table_exists = cursor.fetchone() is not None
+                table_exists = conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name='events'"
+                ).fetchone() is not None
                 
                 if table_exists:
-                    cursor.execute("SELECT COUNT(*) FROM events")
-                    event_count = cursor.fetchone()[0]
-                
-                conn.close()
+                    event_count = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
             except Exception as e:
                 db_error = str(e)
         else:
@@ -252,15 +436,18 @@ def debug_info(event, headers):
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps({
+            'body': _dumps({
                 'debug_info': {
                     'file_exists': file_exists,
                     'file_size': file_size,
                     'table_exists': table_exists,
                     'event_count': event_count,
-                    'db_error': db_error if 'db_error' in locals() else None,
+                    'db_error': db_error,
                     'current_path': os.path.dirname(__file__),
-                    'db_path': db_path
+                    'db_path': db_path,
+                    # ウォームスタートで再利用している状態
+                    'cached_responses': sorted(_responses),
+                    'cached_weather': sorted(_weather_cache)
                 },
                 'timestamp': datetime.now().isoformat()
             })
@@ -270,5 +457,5 @@ def debug_info(event, headers):
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': f'Debug error: {str(e)}'})
-        } 
\ No newline at end of file
+            'body': _dumps({'error': f'Debug error: {str(e)}'})
+        }
@@ -0,0 +1,172 @@
+"""
+死活監視（/livez）と準備完了の確認（/readyz）
+
+Docker の HEALTHCHECK などが数秒～数十秒おきに呼ぶため、プローブ自体は I/O をしない。
+DBへの接続・最後のスクレイピング・天気キャッシュの鮮度はバックグラウンドのスレッドが
+一定間隔で確認して保持し、/readyz はその結果を返すだけにする。
+
+- DB: スクレイピングの書き込みロックで一時的に読めないことがあるため、
+  直近 READINESS_CHECK_INTERVAL × 3 秒以内に一度でも読めていれば準備完了とする。
+- スクレイピング・天気の鮮度は上限を超えると degraded と表示するが、準備完了のままにする
+  （古いデータでもページは返せるため、ロードバランサーから外さない）。
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessMonitor:
+    """準備完了の判定に使う値をバックグラウンドで更新する"""
+
+    thread_name = 'readiness-monitor'
+
+    def __init__(self, db_path='events.db', interval=15, max_scrape_age=172800, max_weather_age=7200,
+                 weather_refresher=None, forecast_client=None, cities=()):
+        self.db_path = db_path
+        self.interval = interval
+        self.max_scrape_age = max_scrape_age
+        self.max_weather_age = max_weather_age
+        self.weather_refresher = weather_refresher
+        self.forecast_client = forecast_client
+        self.cities = list(cities)
+        self.started_at = time.time()
+        self._signals = None
+        self._db_ok_at = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """確認スレッドを起動（プロセスごとに1回。preload_app でfork後も動くよう pid で判定する）"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """確認スレッドを停止"""
+        self._stop.set()
+
+    def run_forever(self):
+        """stop() されるまで一定間隔で確認する（呼び出し元のスレッドで実行）"""
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("準備完了の確認に失敗しました")
+            self._stop.wait(self.interval)
+
+    def refresh(self):
+        """各項目を確認して保持する"""
+        now = time.time()
+        db_error = None
+        scrape_age = None
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=1)
+            try:
+                conn.execute('SELECT 1 FROM events LIMIT 1').fetchone()
+                self._db_ok_at = now
+                scrape_age = self._scrape_age(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            db_error = str(e)
+
+        weather_age = self._weather_age()
+        forecast_age = self._forecast_age()
+
+        db_age = None if self._db_ok_at is None else now - self._db_ok_at
+        checks = {
+            'database': {
+                'ok': db_age is not None and db_age <= self.interval * 3,
+                'age_seconds': _round(db_age),
+                'error': db_error
+            },
+            'scrape': {
+                'ok': scrape_age is not None and scrape_age <= self.max_scrape_age,
+                'age_seconds': _round(scrape_age),
+                'max_age_seconds': self.max_scrape_age
+            },
+            'weather': {
+                'ok': weather_age is not None and weather_age <= self.max_weather_age,
+                'age_seconds': _round(weather_age),
+                'max_age_seconds': self.max_weather_age
+            },
+            'forecast': {
+                'ok': forecast_age is not None and forecast_age <= self.max_weather_age,
+                'age_seconds': _round(forecast_age),
+                'max_age_seconds': self.max_weather_age
+            }
+        }
+        self._signals = {'checked_at': now, 'checks': checks}
+        return self._signals
+
+    def _scrape_age(self, conn):
+        """最後に成功したスクレイピングからの秒数（記録が無ければ None）"""
+        try:
+            row = conn.execute('''
+                SELECT (julianday('now') - julianday(MAX(run_date))) * 86400 FROM scraping_log
+                WHERE errors = 0 OR events_found > 0
+            ''').fetchone()
+        except sqlite3.OperationalError:
+            # スクレイパーを一度も実行していないDB
+            return None
+        return row[0]
+
+    def _weather_age(self):
+        """現在の天気（CityWeatherRefresher）の取得からの秒数"""
+        if self.weather_refresher is None:
+            return None
+        current = self.weather_refresher.cache.get('current')
+        if not current or not current.get('updated_at'):
+            return None
+        return time.time() - datetime.fromisoformat(current['updated_at']).timestamp()
+
+    def _forecast_age(self):
+        """天気予報の共有キャッシュのうち最も古い都市の秒数"""
+        if self.forecast_client is None or not self.cities:
+            return None
+        try:
+            freshness = self.forecast_client.freshness(self.cities)
+        except sqlite3.Error:
+            return None
+        ages = [entry['age_seconds'] for entry in freshness['cities'].values()]
+        if not ages or None in ages:
+            return None
+        return max(ages)
+
+    def status(self):
+        """/readyz の (内容, 準備完了か)（保持している値を返すだけで I/O はしない）"""
+        self.start()
+        signals = self._signals
+        now = time.time()
+        if signals is None:
+            return {'status': 'starting', 'uptime_seconds': _round(now - self.started_at)}, False
+
+        checks = signals['checks']
+        # 確認スレッドが止まっている場合も準備完了としない
+        signals_age = now - signals['checked_at']
+        ready = checks['database']['ok'] and signals_age <= self.interval * 3
+        degraded = not all(check['ok'] for check in checks.values())
+        return {
+            'status': 'not_ready' if not ready else 'degraded' if degraded else 'ok',
+            'checked_seconds_ago': _round(signals_age),
+            'uptime_seconds': _round(now - self.started_at),
+            'checks': checks
+        }, ready
+
+
+def _round(seconds):
+    return None if seconds is None else round(seconds, 1)
@@ -1,6 +1,5 @@
 import requests
 from bs4 import BeautifulSoup
-import sqlite3
 from datetime import datetime, timedelta
 import re
 import time
@@ -9,6 +8,9 @@ import json
 import os
 from urllib.parse import urljoin, urlparse
 import random
+from content_export import export_content
+from content_store import ContentStore
+from migrations import migrate
 
 # ログ設定
 logging.basicConfig(
@@ -23,7 +25,7 @@ logging.basicConfig(
 class RealContentScraperV2:
     def __init__(self):
         self.db_path = 'real_content_v2.db'
-        self.init_database()
+        self.store = ContentStore(self.db_path)
         
         # 実際のスクレイピング対象サイト（正しいURL構造）
         self.scraping_sources = {
@@ -82,90 +84,8 @@ class RealContentScraperV2:
         }
     
     def init_database(self):
-        """データベース初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 季節イベントテーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS seasonal_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # グルメ情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS food_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 子育て情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS childcare_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 観光情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tourism_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 文化施設情報テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS culture_info (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                category TEXT,
-                city TEXT,
-                source_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """データベースを最新のスキーマにする（単独で実行するとき用。通常はデプロイ時に migrations.py で済ませる）"""
+        migrate(self.db_path, 'content')
     
     def get_page_content(self, url):
         """ページコンテンツを取得"""
@@ -498,175 +418,9 @@ class RealContentScraperV2:
         
         return None
     
-    def save_seasonal_event(self, event):
-        """季節イベントをデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO seasonal_events 
-            (title, description, date, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (event['title'], event['description'], event['date'], 
-              event['location'], event['category'], event['city'], event['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_food_info(self, food):
-        """グルメ情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO food_info 
-            (title, description, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (food['title'], food['description'], food['location'], 
-              food['category'], food['city'], food['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_childcare_info(self, childcare):
-        """子育て情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO childcare_info 
-            (title, description, date, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (childcare['title'], childcare['description'], childcare['date'], 
-              childcare['location'], childcare['category'], childcare['city'], childcare['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_tourism_info(self, tourism):
-        """観光情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO tourism_info 
-            (title, description, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (tourism['title'], tourism['description'], tourism['location'], 
-              tourism['category'], tourism['city'], tourism['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_culture_info(self, culture):
-        """文化施設情報をデータベースに保存"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO culture_info 
-            (title, description, date, location, category, city, source_url, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (culture['title'], culture['description'], culture['date'], 
-              culture['location'], culture['category'], culture['city'], culture['source_url']))
-        
-        conn.commit()
-        conn.close()
-    
     def export_to_json(self):
-        """データベースの内容をJSONファイルにエクスポート"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 各テーブルのデータを取得
-        cursor.execute('SELECT * FROM seasonal_events ORDER BY created_at DESC LIMIT 20')
-        seasonal_events = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM food_info ORDER BY created_at DESC LIMIT 20')
-        food_info = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM childcare_info ORDER BY created_at DESC LIMIT 20')
-        childcare_info = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM tourism_info ORDER BY created_at DESC LIMIT 20')
-        tourism_info = cursor.fetchall()
-        
-        cursor.execute('SELECT * FROM culture_info ORDER BY created_at DESC LIMIT 20')
-        culture_info = cursor.fetchall()
-        
-        conn.close()
-        
-        # JSONファイルに出力
-        content_data = {
-            'seasonal_events': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'date': row[3],
-                    'location': row[4],
-                    'category': row[5],
-                    'city': row[6],
-                    'source_url': row[7],
-                    'created_at': row[8]
-                } for row in seasonal_events
-            ],
-            'food_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'location': row[3],
-                    'category': row[4],
-                    'city': row[5],
-                    'source_url': row[6],
-                    'created_at': row[7]
-                } for row in food_info
-            ],
-            'childcare_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'date': row[3],
-                    'location': row[4],
-                    'category': row[5],
-                    'city': row[6],
-                    'source_url': row[7],
-                    'created_at': row[8]
-                } for row in childcare_info
-            ],
-            'tourism_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'location': row[3],
-                    'category': row[4],
-                    'city': row[5],
-                    'source_url': row[6],
-                    'created_at': row[7]
-                } for row in tourism_info
-            ],
-            'culture_info': [
-                {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2],
-                    'date': row[3],
-                    'location': row[4],
-                    'category': row[5],
-                    'city': row[6],
-                    'source_url': row[7],
-                    'created_at': row[8]
-                } for row in culture_info
-            ],
-            'stats': self.stats,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        with open('api/content.json', 'w', encoding='utf-8') as f:
-            json.dump(content_data, f, ensure_ascii=False, indent=2)
+        """データベースの内容をJSONファイルにエクスポート（api/content.json と種類 × 市ごとの分割ファイル）"""
+        export_content(self.db_path, 'api', limit=20, extra={'stats': self.stats})
         
         logging.info("実際のコンテンツデータをJSONファイルにエクスポート完了")
     
@@ -680,28 +434,23 @@ class RealContentScraperV2:
                 
                 # 季節イベント
                 seasonal_events = self.extract_seasonal_events(city_id, source)
-                for event in seasonal_events:
-                    self.save_seasonal_event(event)
+                self.store.save_many('seasonal_events', seasonal_events)
                 
                 # グルメ情報
                 food_info = self.extract_food_info(city_id, source)
-                for food in food_info:
-                    self.save_food_info(food)
+                self.store.save_many('food_info', food_info)
                 
                 # 子育て情報
                 childcare_info = self.extract_childcare_info(city_id, source)
-                for childcare in childcare_info:
-                    self.save_childcare_info(childcare)
+                self.store.save_many('childcare_info', childcare_info)
                 
                 # 観光情報
                 tourism_info = self.extract_tourism_info(city_id, source)
-                for tourism in tourism_info:
-                    self.save_tourism_info(tourism)
+                self.store.save_many('tourism_info', tourism_info)
                 
                 # 文化施設情報
                 culture_info = self.extract_culture_info(city_id, source)
-                for culture in culture_info:
-                    self.save_culture_info(culture)
+                self.store.save_many('culture_info', culture_info)
                 
                 # 都市間の待機時間
                 time.sleep(random.uniform(3, 5))
@@ -716,5 +465,6 @@ class RealContentScraperV2:
 
 if __name__ == "__main__":
     scraper = RealContentScraperV2()
+    scraper.init_database()
     scraper.run_real_scraping()
 
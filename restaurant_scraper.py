@@ -7,12 +7,12 @@ import re
 import logging
 from typing import List, Dict, Optional
 from config import X_API_KEY, X_API_SECRET, X_ACCESS_TOKEN, X_ACCESS_TOKEN_SECRET, RESTAURANTS_DB
+from migrations import migrate
 
 class RestaurantScraper:
     def __init__(self, db_path: str = RESTAURANTS_DB):
         self.db_path = db_path
         self.setup_logging()  # ログ設定を最初に実行
-        self.init_database()
         
         # 検索キーワード（つくば市周辺）
         self.search_keywords = [
@@ -53,30 +53,8 @@ class RestaurantScraper:
         self.logger = logging.getLogger(__name__)
 
     def init_database(self):
-        """データベース初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS restaurants (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                city TEXT NOT NULL,
-                address TEXT,
-                phone TEXT,
-                category TEXT,
-                opening_date TEXT,
-                source_url TEXT,
-                source_type TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """データベースを最新のスキーマにする（単独で実行するとき用。通常はデプロイ時に migrations.py で済ませる）"""
+        migrate(self.db_path, 'restaurants')
         self.logger.info("データベース初期化完了")
 
     def scrape_twitter_restaurants(self) -> List[Dict]:
@@ -326,6 +304,7 @@ class RestaurantScraper:
 # 使用例
 if __name__ == "__main__":
     scraper = RestaurantScraper()
+    scraper.init_database()
     
     # Twitter API認証情報（実際の値に置き換え）
     # api_key = "your_api_key"
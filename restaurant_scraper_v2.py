@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import tweepy
 from config import RESTAURANTS_DB, LOG_LEVEL, LOG_FILE
+from migrations import migrate
 
 # ログ設定
 logging.basicConfig(
@@ -45,30 +46,10 @@ class RestaurantScraperV2:
             "常総 開店"
         ]
         
-        self.init_database()
 
     def init_database(self):
-        """データベースを初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS restaurants (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                location TEXT,
-                opening_date TEXT,
-                category TEXT,
-                source_url TEXT,
-                source_type TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """データベースを最新のスキーマにする（単独で実行するとき用。通常はデプロイ時に migrations.py で済ませる）"""
+        migrate(self.db_path, 'restaurants')
         self.logger.info("データベース初期化完了")
 
     def scrape_twitter_restaurants_v2(self) -> List[Dict]:
@@ -207,6 +188,7 @@ class RestaurantScraperV2:
 def main():
     """メイン関数"""
     scraper = RestaurantScraperV2()
+    scraper.init_database()
     scraper.run_scraper()
 
 if __name__ == '__main__':
@@ -0,0 +1,253 @@
+"""
+データ保持期間の管理（期限切れの行のアーカイブと削除）
+
+テーブルごとの保持ポリシーに従い、期限切れの行を圧縮してアーカイブDBへ移し、
+元のテーブルからは小さなバッチで削除する。最後に incremental_vacuum で空き領域を返す。
+よく読むテーブル（events など）を小さく保ち、ページキャッシュに収まるようにするのが目的。
+
+- アーカイブは archived_rows テーブルに1行ずつ、列名付きの JSON を zlib で圧縮して保存する。
+  (元のDB, テーブル, 行ID) が主キーなので、削除の前に中断して再実行しても重複しない。
+- 天気予報のキャッシュ（weather_cache.ForecastCache）と cache_entries（cache_backend.SQLiteCache）は
+  書き込み時に古い行を削除しているため対象外。
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from config import Config
+from dedupe import release_clusters
+from filter_cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RetentionPolicy:
+    """1テーブル分の保持ポリシー"""
+    db_path: str
+    table: str
+    # 期限切れの行の条件（? に保持日数が入る）
+    expired: str
+    days: int
+    archive: bool = True
+    # 削除した行の id を受け取り、関連する行を削除する処理（同じトランザクション内で呼ばれる）
+    on_delete: Optional[Callable] = None
+
+
+def _delete_event_dependents(conn, ids):
+    """削除したイベントの場所・重複検出の行を削除し、フィルターの世代番号を進める"""
+    placeholders = ', '.join('?' * len(ids))
+    for table in ('event_places', 'event_geo'):
+        try:
+            conn.execute(f'DELETE FROM {table} WHERE event_id IN ({placeholders})', ids)
+        except sqlite3.OperationalError:
+            # まだ作成されていないテーブル
+            pass
+    try:
+        # 代表だったイベントを消したクラスタは残りのイベントに付け替える
+        release_clusters(conn, ids)
+    except sqlite3.OperationalError:
+        pass
+    bump_generation(conn)
+
+
+def default_policies(settings=Config):
+    """イベントDBとコンテンツDBの既定のポリシー"""
+    events_db = settings.DATABASE_URL
+    content_db = settings.CONTENT_DATABASE_URL
+    event_days = settings.EVENT_RETENTION_DAYS
+    content_days = settings.CONTENT_RETENTION_DAYS
+
+    # 開催日が無い行（グルメ・観光など）は最終更新日で判定する
+    content_expired = "COALESCE(NULLIF(date, ''), date(updated_at)) < date('now', '-' || ? || ' days')"
+
+    return [
+        RetentionPolicy(events_db, 'events',
+                        "is_active = 0 AND date < date('now', '-' || ? || ' days')",
+                        event_days, on_delete=_delete_event_dependents),
+        RetentionPolicy(events_db, 'scraping_log',
+                        "run_date < datetime('now', '-' || ? || ' days')",
+                        settings.SCRAPING_LOG_RETENTION_DAYS),
+        # 差分API（event_changes.py）の削除の記録。元の行はアーカイブ済みなので記録は移さない
+        RetentionPolicy(events_db, 'deleted_events',
+                        "deleted_at < datetime('now', '-' || ? || ' days')",
+                        settings.EVENT_CHANGES_MAX_AGE_DAYS, archive=False),
+        RetentionPolicy(content_db, 'content_items', content_expired, content_days),
+    ]
+
+
+ARCHIVE_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS archived_rows (
+        source_db TEXT NOT NULL,
+        source_table TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        archived_at INTEGER NOT NULL,
+        payload BLOB NOT NULL,
+        PRIMARY KEY (source_db, source_table, row_id)
+    ) WITHOUT ROWID
+    ''',
+)
+
+
+def create_archive_tables(conn):
+    """アーカイブのテーブルを作成（migrations.py から呼ばれる）"""
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+
+
+class Archive:
+    """期限切れの行の保存先（圧縮したJSON）"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def _connect(self):
+        # テーブルは migrations.py で作成している
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def put(self, source_db, table, columns, rows):
+        """行を圧縮して保存（行の先頭の列が id）"""
+        archived_at = int(time.time())
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO archived_rows (source_db, source_table, row_id, archived_at, payload)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [
+                    (os.path.basename(source_db), table, row[0], archived_at,
+                     zlib.compress(json.dumps(dict(zip(columns, row)), ensure_ascii=False).encode('utf-8')))
+                    for row in rows
+                ])
+        finally:
+            conn.close()
+
+    def get(self, source_db, table, row_id):
+        """アーカイブした行を辞書で取得（無ければ None）"""
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT payload FROM archived_rows WHERE source_db = ? AND source_table = ? AND row_id = ?
+            ''', (os.path.basename(source_db), table, row_id)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+
+def enable_incremental_vacuum(conn):
+    """auto_vacuum を INCREMENTAL にする（未設定のDBは一度だけ VACUUM が必要）"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        logger.info("auto_vacuum を INCREMENTAL に変更しました")
+
+
+def apply_policy(policy, archive, batch_size=500, dry_run=False):
+    """1テーブル分のポリシーを適用して、削除した行数を返す"""
+    conn = sqlite3.connect(policy.db_path, timeout=10)
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (policy.table,)
+        ).fetchone()
+        if not exists:
+            return 0
+
+        if dry_run:
+            return conn.execute(
+                f'SELECT COUNT(*) FROM {policy.table} WHERE {policy.expired}', (policy.days,)
+            ).fetchone()[0]
+
+        deleted = 0
+        while True:
+            # 1バッチ分を読んで、アーカイブしてから削除する（書き込みロックは削除の間だけ）
+            cursor = conn.execute(
+                f'SELECT * FROM {policy.table} WHERE {policy.expired} ORDER BY id LIMIT ?',
+                (policy.days, batch_size)
+            )
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            if policy.archive:
+                archive.put(policy.db_path, policy.table, columns, rows)
+
+            ids = [row[0] for row in rows]
+            with conn:
+                conn.execute(f"DELETE FROM {policy.table} WHERE id IN ({', '.join('?' * len(ids))})", ids)
+                if policy.on_delete:
+                    policy.on_delete(conn, ids)
+            deleted += len(ids)
+
+            if len(rows) < batch_size:
+                break
+    finally:
+        conn.close()
+
+    if deleted:
+        logger.info("保持期間を過ぎた行を削除しました: %s.%s %d件",
+                    os.path.basename(policy.db_path), policy.table, deleted)
+    return deleted
+
+
+def vacuum(db_path, pages=None):
+    """空きページをファイルから切り詰める"""
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        enable_incremental_vacuum(conn)
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if pages is None:
+            conn.execute('PRAGMA incremental_vacuum').fetchall()
+        else:
+            conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+    finally:
+        conn.close()
+    return freelist
+
+
+def run_retention(policies=None, archive_path=None, batch_size=None, dry_run=False):
+    """全ポリシーを適用して {'DB名.テーブル名': 削除件数} を返す"""
+    policies = default_policies() if policies is None else policies
+    archive = None if dry_run else Archive(archive_path or Config.ARCHIVE_DATABASE_URL)
+    batch_size = batch_size or Config.RETENTION_BATCH_SIZE
+
+    results = {}
+    for policy in policies:
+        if not os.path.exists(policy.db_path):
+            continue
+        try:
+            count = apply_policy(policy, archive, batch_size, dry_run)
+        except sqlite3.Error as e:
+            logger.error("保持ポリシーの適用に失敗しました: %s.%s %s", policy.db_path, policy.table, e)
+            continue
+        results[f'{os.path.basename(policy.db_path)}.{policy.table}'] = count
+
+    if not dry_run:
+        for db_path in sorted({policy.db_path for policy in policies if os.path.exists(policy.db_path)}):
+            freed = vacuum(db_path)
+            if freed:
+                logger.info("空き領域を解放しました: %s %dページ", db_path, freed)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='保持期間を過ぎた行をアーカイブして削除')
+    parser.add_argument('--dry-run', action='store_true', help='削除せずに対象の件数だけを表示')
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for name, count in run_retention(batch_size=args.batch_size, dry_run=args.dry_run).items():
+        print(f"{name}: {count}件")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+適合性スコアのメモ化
+
+スコアはイベント行かその日の予報が変わったときにしか変化しないため、
+(イベントID, イベントのバージョン, 予報日のフィンガープリント) をキーに結果を保持する。
+どちらかが変わるとキーが変わるので、古いエントリは参照されずLRUから自然に押し出される。
+共有キャッシュ（cache_backend）が使える場合は、ワーカー間でも計算結果を共有する。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from cache_backend import default_cache
+
+# スコア計算に使うイベントの属性（updated_at が無いスキーマでのバージョン代わり）
+SCORING_FIELDS = ('is_indoor', 'is_free', 'has_parking', 'child_friendly', 'rain_cancellation', 'time')
+
+
+def event_version(event):
+    """イベントのバージョンを取得"""
+    if event.updated_at:
+        return event.updated_at
+    return tuple(getattr(event, name) for name in SCORING_FIELDS)
+
+
+def forecast_fingerprint(weather_info):
+    """予報日のフィンガープリントを取得（スコアに影響する値のみ）
+
+    1時間ごとの予報がある場合、is_rainy / is_sunny は開催時間帯の値になっているため、
+    時間帯の予報が変わったイベントだけが再計算される。
+    """
+    if not weather_info:
+        return None
+    return (
+        weather_info.get('date'),
+        bool(weather_info.get('is_rainy', False)),
+        bool(weather_info.get('is_sunny', False))
+    )
+
+
+def score_key(event, weather_info):
+    """メモのキーを生成"""
+    return (event.id, event_version(event), forecast_fingerprint(weather_info))
+
+
+class ScoreMemo:
+    """適合性スコアの上限付きLRUメモ"""
+
+    def __init__(self, maxsize=10000, store=None, store_ttl=86400):
+        self.maxsize = maxsize
+        # get_many / set_many を持つ共有ストア（cache_backend のキャッシュ）
+        self.store = store
+        self.store_ttl = store_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """複数キーのスコアを取得（見つからないキーは含まない）"""
+        found = {}
+        missing = {}
+
+        with self._lock:
+            for key in keys:
+                if key in found or key in missing:
+                    continue
+                score = self._entries.get(key)
+                if score is None:
+                    missing[key] = repr(key)
+                else:
+                    self._entries.move_to_end(key)
+                    found[key] = score
+
+        # メモリに無い分は共有ストアから一括取得
+        if missing and self.store is not None:
+            stored = self.store.get_many(list(missing.values()))
+            if stored:
+                shared = {key: stored[name] for key, name in missing.items() if name in stored}
+                found.update(shared)
+                self._put_many(shared.items())
+
+        hits = sum(1 for key in keys if key in found)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return found
+
+    def set_many(self, items):
+        """複数キーのスコアを保存"""
+        items = list(items)
+        self._put_many(items)
+        if self.store is not None:
+            self.store.set_many([(repr(key), score) for key, score in items], ttl=self.store_ttl)
+
+    def _put_many(self, items):
+        with self._lock:
+            for key, score in items:
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """メモを空にする"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """ヒット/ミスの統計を取得"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'shared_store': self.store is not None
+        }
+
+
+def _create_default_memo():
+    """環境変数に基づいてプロセス共通のメモを作成"""
+    maxsize = int(os.getenv('SCORE_MEMO_SIZE', '10000'))
+    # プロセス内のキャッシュしか無い場合はメモ自身のLRUで十分
+    store = default_cache.namespace('score') if default_cache.shared else None
+    return ScoreMemo(maxsize=maxsize, store=store)
+
+
+default_score_memo = _create_default_memo()
@@ -16,10 +16,12 @@ pkill -f "python app.py" 2>/dev/null
 sleep 2
 
 # データベースの確認
+echo "📊 データベースのスキーマを更新中..."
 if [ ! -f "events.db" ]; then
-    echo "📊 データベースを初期化中..."
-    python init_db.py
+    python migrations.py
     python add_sample_data.py
+else
+    python migrations.py
 fi
 
 # アプリケーションを起動
@@ -30,10 +32,10 @@ python app.py &
 echo "⏳ アプリケーションの起動を待機中..."
 sleep 5
 
-# ヘルスチェック
+# ヘルスチェック（/readyz はDBの確認が済むと200を返す）
 echo "🏥 ヘルスチェック中..."
 for i in {1..10}; do
-    if curl -s http://localhost:8080/health > /dev/null 2>&1; then
+    if curl -sf http://localhost:8080/readyz > /dev/null 2>&1; then
         echo "✅ アプリケーションが正常に起動しました！"
         echo ""
         echo "📱 アクセスURL:"
@@ -49,7 +51,7 @@ for i in {1..10}; do
     fi
 done
 
-if ! curl -s http://localhost:8080/health > /dev/null 2>&1; then
+if ! curl -sf http://localhost:8080/readyz > /dev/null 2>&1; then
     echo "❌ アプリケーションの起動に失敗しました"
     echo "ログを確認してください:"
     echo "ps aux | grep python"
@@ -1,8 +1,18 @@
 // 今日行けるイベントサイト - JavaScript
 
-let currentEvents = [];
+let currentEvents = [];  // フィルター後の表示中のイベント
 let multiCityWeather = {};
 
+// 取得済みの全イベント（id → イベント）と、差分取得（/api/events?since=）の起点
+const eventsById = new Map();
+let eventsCursor = null;
+
+// イベント一覧の仮想化: 表示範囲の前後に余分に描画するカード数と、仮想化する最小件数
+const EVENT_LIST_OVERSCAN = 6;
+const EVENT_LIST_VIRTUAL_MIN = 40;
+let eventRowHeight = 0;  // 描画したカードから測った1件あたりの高さ（余白を含む）
+let eventListFrame = null;
+
 // APIエンドポイント（静的JSONファイル使用）
 const API_BASE = 'https://tsukuba.netlify.app/api';
 
@@ -52,10 +62,10 @@ function trackPageView(pageTitle) {
 
 // 地域リスト
 const CITIES = [
-    { name: 'つくば市', query: 'Tsukuba,Japan' },
-    { name: 'つくばみらい市', query: 'Tsukubamirai,Japan' },
-    { name: '取手市', query: 'Toride,Japan' },
-    { name: '守谷市', query: 'Moriya,Japan' }
+    { name: 'つくば市' },
+    { name: 'つくばみらい市' },
+    { name: '取手市' },
+    { name: '守谷市' }
 ];
 
 // ページ読み込み時の初期化
@@ -65,6 +75,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Google Analytics ページビューの追跡
     trackPageView('茨城県南のイベント情報');
     
+    // オフライン用のキャッシュ（2回目以降はキャッシュから即座に表示する）
+    registerServiceWorker();
+    
     // データ読み込み
     loadData();
     
@@ -80,6 +93,27 @@ document.addEventListener('DOMContentLoaded', function() {
     console.log('✅ ページ初期化完了');
 });
 
+// Service Worker の登録（sw.js）
+function registerServiceWorker() {
+    if (!('serviceWorker' in navigator)) return;
+    
+    navigator.serviceWorker.register('/sw.js').catch(error => {
+        console.log('❌ Service Worker の登録エラー:', error);
+    });
+    
+    // キャッシュから表示したデータが裏の再検証で新しくなったら描き直す
+    navigator.serviceWorker.addEventListener('message', event => {
+        const message = event.data || {};
+        if (message.type !== 'data-updated') return;
+        console.log('🔄 データが更新されました:', message.url);
+        if (message.url.includes('/content/')) {
+            loadContentData();
+        } else if (message.url.includes('/events')) {
+            refreshEvents();
+        }
+    });
+}
+
 // 忍者アドマックス 広告の初期化
 function initializeNinjaAds() {
     console.log('🎯 忍者アドマックス 広告初期化開始');
@@ -222,26 +256,8 @@ async function loadScrapedEvents() {
             if (data.events && data.events.length > 0) {
                 console.log(`✅ スクレイピングデータを取得: ${data.events.length}件`);
                 
-                // データベースの形式に合わせて変換
-                currentEvents = data.events.map(event => ({
-                    id: event.id,
-                    title: event.title,
-                    date: event.date,
-                    time: event.time,
-                    location: event.location,
-                    description: event.description,
-                    category: event.category,
-                    is_free: event.is_free,
-                    has_parking: event.has_parking,
-                    child_friendly: event.child_friendly,
-                    is_indoor: event.is_indoor,
-                    weather_dependent: event.weather_dependent,
-                    rain_cancellation: event.rain_cancellation,
-                    source_url: event.source_url,
-                    source_city: event.source_city
-                }));
-                
-                updateEventsDisplay();
+                // 静的JSONは全件（cursor を持たないため、次の更新で差分の起点を取得する）
+                applyEventChanges(data);
                 return;
             } else {
                 console.log('⚠️ イベントデータが空です');
@@ -259,61 +275,28 @@ async function loadScrapedEvents() {
 // 複数地域の天気データ読み込み
 async function loadMultiCityWeatherData() {
     try {
-        // WeatherAPIのキーを設定
-        const API_KEY = '88ed0e701cfc4c7fb0d13301253107';
+        // 外部APIはサーバー側でまとめて取得しているため、集約済みの結果を1回で取得
+        const response = await fetch(`${API_BASE}/weather/cities`);
         
-        // 各都市の天気データを並行して取得
-        const weatherPromises = CITIES.map(async (city) => {
-            try {
-                const response = await fetch(`https://api.weatherapi.com/v1/current.json?key=${API_KEY}&q=${city.query}&aqi=no`);
-                
-                if (response.ok) {
-                    const weatherData = await response.json();
-                    return {
-                        city: city.name,
-                        data: {
-                            temperature: Math.round(weatherData.current.temp_c),
-                            condition: weatherData.current.condition.text,
-                            humidity: weatherData.current.humidity,
-                            rain_probability: weatherData.current.precip_mm > 0 ? Math.round(weatherData.current.precip_mm * 10) : 0,
-                            icon: weatherData.current.condition.icon
-                        }
-                    };
-                } else {
-                    console.log(`⚠️ ${city.name}の天気データ取得エラー`);
-                    return {
-                        city: city.name,
-                        data: {
-                            temperature: '--',
-                            condition: 'データ取得中',
-                            humidity: '--',
-                            rain_probability: 0,
-                            icon: '113'
-                        }
-                    };
-                }
-            } catch (error) {
-                console.log(`⚠️ ${city.name}の天気APIエラー:`, error);
-                return {
-                    city: city.name,
-                    data: {
-                        temperature: '--',
-                        condition: 'データ取得中',
-                        humidity: '--',
-                        rain_probability: 0,
-                        icon: '113'
-                    }
-                };
-            }
-        });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
         
-        const weatherResults = await Promise.all(weatherPromises);
+        const data = await response.json();
+        const weather = data.weather || {};
         
-        // 結果をオブジェクトに格納
-        weatherResults.forEach(result => {
-            multiCityWeather[result.city] = result.data;
+        // 表示対象の地域だけを格納
+        multiCityWeather = {};
+        CITIES.forEach(city => {
+            if (weather[city.name]) {
+                multiCityWeather[city.name] = weather[city.name];
+            }
         });
         
+        if (Object.keys(multiCityWeather).length === 0) {
+            throw new Error('天気データが空です');
+        }
+        
         console.log('✅ 複数地域の天気データを取得しました');
         
     } catch (error) {
@@ -571,8 +554,7 @@ function loadSampleData() {
         }
     ];
     
-    currentEvents = sampleEvents;
-    updateEventsDisplay();
+    applyEventChanges({ events: sampleEvents, full: true });
 }
 
 // フィルター適用
@@ -586,8 +568,8 @@ function filterEvents() {
     const childFriendly = document.getElementById('child-friendly-filter')?.checked || false;
     const parkingRequired = document.getElementById('parking-filter')?.checked || false;
 
-    // フィルタリングロジック
-    let filteredEvents = currentEvents.filter(event => {
+    // フィルタリングロジック（取得済みの全イベントから絞り込む）
+    const filteredEvents = Array.from(eventsById.values()).filter(event => {
         if (category && event.category !== category) return false;
         if (city && !event.location.includes(city)) return false;
         if (location === 'indoor' && !event.is_indoor) return false;
@@ -597,6 +579,7 @@ function filterEvents() {
         if (parkingRequired && !event.has_parking) return false;
         return true;
     });
+    filteredEvents.sort(compareEvents);
 
     // 表示更新
     currentEvents = filteredEvents;
@@ -605,6 +588,66 @@ function filterEvents() {
     console.log(`✅ フィルター適用完了: ${filteredEvents.length}件`);
 }
 
+// APIのイベントを表示用の形式に変換
+function normalizeEvent(event) {
+    return {
+        id: event.id,
+        title: event.title,
+        date: event.date,
+        time: event.time,
+        location: event.location || '',
+        description: event.description,
+        category: event.category,
+        is_free: event.is_free,
+        has_parking: event.has_parking,
+        child_friendly: event.child_friendly,
+        is_indoor: event.is_indoor,
+        weather_dependent: event.weather_dependent,
+        rain_cancellation: event.rain_cancellation,
+        source_url: event.source_url,
+        source_city: event.source_city
+    };
+}
+
+// 開催日の早い順（同じ日は新しく登録した順）
+function compareEvents(a, b) {
+    if (a.date !== b.date) return (a.date || '') < (b.date || '') ? -1 : 1;
+    return b.id - a.id;
+}
+
+// 全件（full）または差分（変わったイベントと removed の id）を取得済みのイベントに反映
+function applyEventChanges(data) {
+    if (data.full !== false) {
+        eventsById.clear();
+        eventsCursor = null;
+    }
+    (data.removed || []).forEach(id => eventsById.delete(id));
+    (data.events || []).forEach(event => eventsById.set(event.id, normalizeEvent(event)));
+    if (data.cursor) eventsCursor = data.cursor;
+    filterEvents();
+}
+
+// 前回の取得以降に変わったイベントだけを取得（cursor が無ければ全件）
+async function refreshEvents() {
+    const url = eventsCursor
+        ? `${API_BASE}/events?since=${encodeURIComponent(eventsCursor)}`
+        : `${API_BASE}/events`;
+    try {
+        const response = await fetch(url, { cache: 'no-cache' });
+        if (!response.ok) {
+            console.log('❌ APIエラー:', response.status, response.statusText);
+            return;
+        }
+        const data = await response.json();
+        applyEventChanges(data);
+        console.log(data.full === false
+            ? `✅ イベントの差分を反映: 更新${(data.events || []).length}件 削除${(data.removed || []).length}件`
+            : `✅ イベントを取得: ${eventsById.size}件`);
+    } catch (error) {
+        console.log('❌ イベントの更新エラー:', error);
+    }
+}
+
 // イベント表示更新
 function updateEventsDisplay() {
     const container = document.getElementById('events-container');
@@ -618,6 +661,7 @@ function updateEventsDisplay() {
     }
     
     if (currentEvents.length === 0) {
+        delete container.dataset.virtual;
         container.innerHTML = `
             <div class="alert alert-info">
                 <i class="fas fa-info-circle me-2"></i>
@@ -627,11 +671,78 @@ function updateEventsDisplay() {
         return;
     }
     
-    // イベントカード生成
-    const eventsHTML = currentEvents.map(event => createEventCard(event)).join('');
-    container.innerHTML = eventsHTML;
+    // 件数が少なければ全件を描画
+    if (currentEvents.length < EVENT_LIST_VIRTUAL_MIN) {
+        delete container.dataset.virtual;
+        container.innerHTML = currentEvents.map(event => createEventCard(event)).join('');
+        return;
+    }
+    
+    // 仮想リスト: 上下の余白と、表示範囲のカードだけを置く
+    if (!container.dataset.virtual) {
+        container.dataset.virtual = 'true';
+        container.innerHTML = `
+            <div class="event-list-spacer"></div>
+            <div class="event-list-items"></div>
+            <div class="event-list-spacer"></div>
+        `;
+        eventRowHeight = 0;
+    }
+    container.dataset.start = '';
+    renderEventWindow();
+}
+
+// スクロール位置に合わせて表示範囲のカードを描画
+function renderEventWindow() {
+    eventListFrame = null;
+    const container = document.getElementById('events-container');
+    if (!container || !container.dataset.virtual) return;
+    
+    const [topSpacer, items, bottomSpacer] = container.children;
+    const total = currentEvents.length;
+    const rowHeight = eventRowHeight || 200;
+    const listTop = container.getBoundingClientRect().top + window.scrollY;
+    const visibleTop = Math.max(0, window.scrollY - listTop);
+    const visibleCount = Math.ceil(window.innerHeight / rowHeight);
+    
+    const start = Math.max(0, Math.floor(visibleTop / rowHeight) - EVENT_LIST_OVERSCAN);
+    const end = Math.min(total, start + visibleCount + EVENT_LIST_OVERSCAN * 2);
+    const range = `${start}:${end}:${total}`;
+    
+    // 表示範囲が変わったときだけ描き直す
+    if (container.dataset.start !== range) {
+        container.dataset.start = range;
+        items.innerHTML = currentEvents.slice(start, end).map(event => createEventCard(event)).join('');
+        
+        // 初回は描画したカードから1件あたりの高さを測り、余白の計算に使う
+        if (!eventRowHeight && items.children.length > 0) {
+            eventRowHeight = items.offsetHeight / items.children.length;
+            if (eventRowHeight > 0) {
+                container.dataset.start = '';
+                renderEventWindow();
+                return;
+            }
+        }
+    }
+    topSpacer.style.height = `${start * rowHeight}px`;
+    bottomSpacer.style.height = `${(total - end) * rowHeight}px`;
+}
+
+// スクロール・リサイズはフレームごとに1回だけ処理する
+function scheduleEventWindow() {
+    if (eventListFrame === null) {
+        eventListFrame = requestAnimationFrame(renderEventWindow);
+    }
 }
 
+window.addEventListener('scroll', scheduleEventWindow, { passive: true });
+window.addEventListener('resize', () => {
+    eventRowHeight = 0;
+    const container = document.getElementById('events-container');
+    if (container) container.dataset.start = '';
+    scheduleEventWindow();
+});
+
 // イベントカード作成
 function createEventCard(event) {
     const date = new Date(event.date);
@@ -685,7 +796,7 @@ function createEventCard(event) {
 
 // イベント詳細表示
 function showEventDetails(eventId) {
-    const event = currentEvents.find(e => e.id === eventId);
+    const event = eventsById.get(eventId);
     if (!event) return;
     
     const modal = new bootstrap.Modal(document.getElementById('eventModal'));
@@ -731,11 +842,13 @@ function showEventDetails(eventId) {
     modal.show();
 }
 
-// データ更新
-function refreshData() {
+// データ更新（イベントは前回以降の差分だけを取得）
+async function refreshData() {
     console.log('🔄 データを更新中...');
     trackEvent('data_refresh', 'engagement', 'click', 'refresh_button');
-    loadData();
+    await refreshEvents();
+    await loadContentData();
+    await loadMultiCityWeatherData();
 }
 
 // エラー表示
@@ -758,24 +871,47 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
+// 地域特集・地域情報の各カード（種類 → カテゴリ・表示先・データが無いときの表示）
+const CONTENT_SECTIONS = {
+    content: {
+        cityFilter: 'content-city-filter',
+        categoryFilter: 'content-category-filter',
+        kinds: {
+            seasonal_events: { category: '季節イベント', container: 'seasonal-events-container', empty: '現在、季節イベントの情報はありません。' },
+            food_info: { category: 'グルメ', container: 'food-info-container', empty: '現在、グルメ情報はありません。' },
+            childcare_info: { category: '子育て', container: 'childcare-info-container', empty: '現在、子育て情報はありません。' }
+        }
+    },
+    region: {
+        cityFilter: 'region-city-filter',
+        categoryFilter: 'region-category-filter',
+        kinds: {
+            tourism_info: { category: '観光', container: 'tourism-info-container', empty: '現在、観光情報はありません。' },
+            culture_info: { category: '文化施設', container: 'culture-info-container', empty: '現在、文化施設情報はありません。' }
+        }
+    }
+};
+
+// 1フレームで描画する件数
+const CONTENT_RENDER_BATCH = 8;
+
+// コンテンツの目次（api/content/index.json）と取得済みの分割ファイル
+let contentIndex = null;
+const contentPartitions = new Map();
+// 描画中の一覧（フィルターを変えたら前の描画を打ち切る）
+const contentRenderTokens = {};
+
 // 新しいコンテンツデータを読み込み
 async function loadContentData() {
     try {
-        console.log('📚 コンテンツデータを読み込み中...');
+        console.log('📚 コンテンツの目次を読み込み中...');
         
-        const response = await fetch(`${API_BASE}/content.json`);
+        // 目次だけを読み、表示する種類・市のファイルは renderContentSection で取得する
+        const response = await fetch(`${API_BASE}/content/index.json`, { cache: 'no-cache' });
         
         if (response.ok) {
-            const data = await response.json();
-            console.log('📊 コンテンツデータ:', data);
-            
-            // 各コンテンツセクションを更新
-            updateSeasonalEvents(data.seasonal_events || []);
-            updateFoodInfo(data.food_info || []);
-            updateChildcareInfo(data.childcare_info || []);
-            updateTourismInfo(data.tourism_info || []);
-            updateCultureInfo(data.culture_info || []);
-            
+            contentIndex = await response.json();
+            await Promise.all(Object.keys(CONTENT_SECTIONS).map(renderContentSection));
             console.log('✅ コンテンツデータ読み込み完了');
         } else {
             console.warn('⚠️ コンテンツデータの取得に失敗');
@@ -785,241 +921,104 @@ async function loadContentData() {
     }
 }
 
-// 地域特集フィルター機能
-function filterContent() {
-    const cityFilter = document.getElementById('content-city-filter').value;
-    const categoryFilter = document.getElementById('content-category-filter').value;
+// 種類 × 市の分割ファイルを取得（同じ版のファイルは再取得しない）
+async function fetchContentPartition(kind, city) {
+    const entry = contentIndex.kinds[kind] || {};
+    const partition = city ? (entry.cities || {})[city] : entry.all;
+    if (!partition) return [];
     
-    console.log('🔍 地域特集フィルター適用:', { city: cityFilter, category: categoryFilter });
-    
-    // 地域特集セクション内のコンテンツカードのみを対象
-    const contentSection = document.querySelector('.content-section:has(.content-card[data-category="季節イベント"])');
-    if (!contentSection) return;
-    
-    const contentCards = contentSection.querySelectorAll('.content-card');
-    
-    contentCards.forEach(card => {
-        const category = card.getAttribute('data-category');
-        const container = card.querySelector('[id$="-container"]');
-        
-        // カテゴリフィルター
-        const categoryMatch = !categoryFilter || category === categoryFilter;
-        
-        // 地域フィルター（コンテンツ内のアイテムをチェック）
-        let cityMatch = !cityFilter;
-        if (cityFilter && container) {
-            const items = container.querySelectorAll('.content-item');
-            items.forEach(item => {
-                const cityBadge = item.querySelector('.content-badge.city');
-                if (cityBadge && cityBadge.textContent === cityFilter) {
-                    cityMatch = true;
-                }
+    const url = `${API_BASE}/${partition.path}?v=${contentIndex.version}`;
+    if (!contentPartitions.has(url)) {
+        const request = fetch(url)
+            .then(response => response.ok ? response.json() : { items: [] })
+            .then(data => data.items || [])
+            .catch(error => {
+                contentPartitions.delete(url);
+                throw error;
             });
-        }
-        
-        // 表示/非表示の切り替え
-        if (categoryMatch && cityMatch) {
-            card.style.display = 'block';
-        } else {
-            card.style.display = 'none';
-        }
-    });
-    
-    // コンテンツ内のアイテムもフィルター
-    if (cityFilter) {
-        const contentItems = contentSection.querySelectorAll('.content-item');
-        contentItems.forEach(item => {
-            const cityBadge = item.querySelector('.content-badge.city');
-            if (cityBadge) {
-                if (cityBadge.textContent === cityFilter) {
-                    item.style.display = 'block';
-                } else {
-                    item.style.display = 'none';
-                }
-            }
-        });
+        contentPartitions.set(url, request);
     }
+    return contentPartitions.get(url);
 }
 
-// 地域情報フィルター機能
-function filterRegion() {
-    const cityFilter = document.getElementById('region-city-filter').value;
-    const categoryFilter = document.getElementById('region-category-filter').value;
-    
-    console.log('🔍 地域情報フィルター適用:', { city: cityFilter, category: categoryFilter });
-    
-    // 地域情報セクション内のコンテンツカードのみを対象
-    const regionSection = document.querySelector('.content-section:has(.content-card[data-category="観光"])');
-    if (!regionSection) return;
+// セクションの表示中のカードだけを、選択中の市のファイルで描画
+async function renderContentSection(sectionName) {
+    if (!contentIndex) return;
+    const section = CONTENT_SECTIONS[sectionName];
+    const cityFilter = document.getElementById(section.cityFilter);
+    const categoryFilter = document.getElementById(section.categoryFilter);
+    const city = cityFilter ? cityFilter.value : '';
+    const category = categoryFilter ? categoryFilter.value : '';
     
-    const contentCards = regionSection.querySelectorAll('.content-card');
+    console.log('🔍 コンテンツフィルター適用:', { section: sectionName, city, category });
     
-    contentCards.forEach(card => {
-        const category = card.getAttribute('data-category');
-        const container = card.querySelector('[id$="-container"]');
+    await Promise.all(Object.entries(section.kinds).map(async ([kind, card]) => {
+        const container = document.getElementById(card.container);
+        if (!container) return;
+        const cardElement = container.closest('.content-card');
+        const visible = !category || category === card.category;
+        if (cardElement) cardElement.style.display = visible ? 'block' : 'none';
+        // 非表示のカードのファイルは取得しない
+        if (!visible) return;
         
-        // カテゴリフィルター
-        const categoryMatch = !categoryFilter || category === categoryFilter;
-        
-        // 地域フィルター（コンテンツ内のアイテムをチェック）
-        let cityMatch = !cityFilter;
-        if (cityFilter && container) {
-            const items = container.querySelectorAll('.content-item');
-            items.forEach(item => {
-                const cityBadge = item.querySelector('.content-badge.city');
-                if (cityBadge && cityBadge.textContent === cityFilter) {
-                    cityMatch = true;
-                }
-            });
+        try {
+            const items = await fetchContentPartition(kind, city);
+            renderContentItems(container, items, card.empty);
+        } catch (error) {
+            console.error(`❌ ${kind} の読み込みエラー:`, error);
         }
-        
-        // 表示/非表示の切り替え
-        if (categoryMatch && cityMatch) {
-            card.style.display = 'block';
-        } else {
-            card.style.display = 'none';
-        }
-    });
-    
-    // コンテンツ内のアイテムもフィルター
-    if (cityFilter) {
-        const contentItems = regionSection.querySelectorAll('.content-item');
-        contentItems.forEach(item => {
-            const cityBadge = item.querySelector('.content-badge.city');
-            if (cityBadge) {
-                if (cityBadge.textContent === cityFilter) {
-                    item.style.display = 'block';
-                } else {
-                    item.style.display = 'none';
-                }
-            }
-        });
-    }
+    }));
 }
 
-// 季節イベントの表示を更新
-function updateSeasonalEvents(events) {
-    const container = document.getElementById('seasonal-events-container');
-    if (!container) return;
+// 一覧を数件ずつフレームに分けて描画（長い一覧でもメインスレッドを止めない）
+function renderContentItems(container, items, emptyMessage) {
+    const token = (contentRenderTokens[container.id] || 0) + 1;
+    contentRenderTokens[container.id] = token;
     
-    if (events.length === 0) {
-        container.innerHTML = '<p class="text-muted">現在、季節イベントの情報はありません。</p>';
+    if (items.length === 0) {
+        container.innerHTML = `<p class="text-muted">${escapeHtml(emptyMessage)}</p>`;
         return;
     }
     
-    container.innerHTML = events.map(event => `
-        <div class="content-item">
-            <h5>${escapeHtml(event.title)}</h5>
-            <p>${escapeHtml(event.description)}</p>
-            <div class="content-meta">
-                ${event.date ? `<span class="content-badge date">${event.date}</span>` : ''}
-                ${event.location ? `<span class="content-badge">${escapeHtml(event.location)}</span>` : ''}
-                ${event.category ? `<span class="content-badge category">${escapeHtml(event.category)}</span>` : ''}
-                ${event.city ? `<span class="content-badge city">${escapeHtml(event.city)}</span>` : ''}
-                ${event.source_url ? `<a href="${event.source_url}" class="content-link" target="_blank">詳細を見る</a>` : ''}
-            </div>
-        </div>
-    `).join('');
+    container.innerHTML = '';
+    let position = 0;
+    const renderBatch = () => {
+        if (contentRenderTokens[container.id] !== token) return;
+        container.insertAdjacentHTML('beforeend',
+            items.slice(position, position + CONTENT_RENDER_BATCH).map(createContentItem).join(''));
+        position += CONTENT_RENDER_BATCH;
+        if (position < items.length) requestAnimationFrame(renderBatch);
+    };
+    renderBatch();
 }
 
-// グルメ情報の表示を更新
-function updateFoodInfo(foodInfo) {
-    const container = document.getElementById('food-info-container');
-    if (!container) return;
-    
-    if (foodInfo.length === 0) {
-        container.innerHTML = '<p class="text-muted">現在、グルメ情報はありません。</p>';
-        return;
-    }
-    
-    container.innerHTML = foodInfo.map(food => `
+// コンテンツ1件のHTML
+function createContentItem(item) {
+    return `
         <div class="content-item">
-            <h5>${escapeHtml(food.title)}</h5>
-            <p>${escapeHtml(food.description)}</p>
+            <h5>${escapeHtml(item.title)}</h5>
+            <p>${escapeHtml(item.description)}</p>
             <div class="content-meta">
-                ${food.location ? `<span class="content-badge">${escapeHtml(food.location)}</span>` : ''}
-                ${food.category ? `<span class="content-badge category">${escapeHtml(food.category)}</span>` : ''}
-                ${food.city ? `<span class="content-badge city">${escapeHtml(food.city)}</span>` : ''}
-                ${food.source_url ? `<a href="${food.source_url}" class="content-link" target="_blank">詳細を見る</a>` : ''}
+                ${item.date ? `<span class="content-badge date">${escapeHtml(item.date)}</span>` : ''}
+                ${item.location ? `<span class="content-badge">${escapeHtml(item.location)}</span>` : ''}
+                ${item.category ? `<span class="content-badge category">${escapeHtml(item.category)}</span>` : ''}
+                ${item.city ? `<span class="content-badge city">${escapeHtml(item.city)}</span>` : ''}
+                ${item.source_url ? `<a href="${item.source_url}" class="content-link" target="_blank">詳細を見る</a>` : ''}
             </div>
         </div>
-    `).join('');
+    `;
 }
 
-// 子育て情報の表示を更新
-function updateChildcareInfo(childcareInfo) {
-    const container = document.getElementById('childcare-info-container');
-    if (!container) return;
-    
-    if (childcareInfo.length === 0) {
-        container.innerHTML = '<p class="text-muted">現在、子育て情報はありません。</p>';
-        return;
-    }
-    
-    container.innerHTML = childcareInfo.map(childcare => `
-        <div class="content-item">
-            <h5>${escapeHtml(childcare.title)}</h5>
-            <p>${escapeHtml(childcare.description)}</p>
-            <div class="content-meta">
-                ${childcare.date ? `<span class="content-badge date">${childcare.date}</span>` : ''}
-                ${childcare.location ? `<span class="content-badge">${escapeHtml(childcare.location)}</span>` : ''}
-                ${childcare.category ? `<span class="content-badge category">${escapeHtml(childcare.category)}</span>` : ''}
-                ${childcare.city ? `<span class="content-badge city">${escapeHtml(childcare.city)}</span>` : ''}
-                ${childcare.source_url ? `<a href="${childcare.source_url}" class="content-link" target="_blank">詳細を見る</a>` : ''}
-            </div>
-        </div>
-    `).join('');
+// 地域特集フィルター機能（選択中の市・カテゴリのファイルだけを取得して描画）
+function filterContent() {
+    return renderContentSection('content');
 }
 
-// 観光情報の表示を更新
-function updateTourismInfo(tourismInfo) {
-    const container = document.getElementById('tourism-info-container');
-    if (!container) return;
-    
-    if (tourismInfo.length === 0) {
-        container.innerHTML = '<p class="text-muted">現在、観光情報はありません。</p>';
-        return;
-    }
-    
-    container.innerHTML = tourismInfo.map(tourism => `
-        <div class="content-item">
-            <h5>${escapeHtml(tourism.title)}</h5>
-            <p>${escapeHtml(tourism.description)}</p>
-            <div class="content-meta">
-                ${tourism.location ? `<span class="content-badge">${escapeHtml(tourism.location)}</span>` : ''}
-                ${tourism.category ? `<span class="content-badge category">${escapeHtml(tourism.category)}</span>` : ''}
-                ${tourism.city ? `<span class="content-badge city">${escapeHtml(tourism.city)}</span>` : ''}
-                ${tourism.source_url ? `<a href="${tourism.source_url}" class="content-link" target="_blank">詳細を見る</a>` : ''}
-            </div>
-        </div>
-    `).join('');
+// 地域情報フィルター機能（選択中の市・カテゴリのファイルだけを取得して描画）
+function filterRegion() {
+    return renderContentSection('region');
 }
 
-// 文化施設情報の表示を更新
-function updateCultureInfo(cultureInfo) {
-    const container = document.getElementById('culture-info-container');
-    if (!container) return;
-    
-    if (cultureInfo.length === 0) {
-        container.innerHTML = '<p class="text-muted">現在、文化施設情報はありません。</p>';
-        return;
-    }
-    
-    container.innerHTML = cultureInfo.map(culture => `
-        <div class="content-item">
-            <h5>${escapeHtml(culture.title)}</h5>
-            <p>${escapeHtml(culture.description)}</p>
-            <div class="content-meta">
-                ${culture.date ? `<span class="content-badge date">${culture.date}</span>` : ''}
-                ${culture.location ? `<span class="content-badge">${escapeHtml(culture.location)}</span>` : ''}
-                ${culture.category ? `<span class="content-badge category">${escapeHtml(culture.category)}</span>` : ''}
-                ${culture.city ? `<span class="content-badge city">${escapeHtml(culture.city)}</span>` : ''}
-                ${culture.source_url ? `<a href="${culture.source_url}" class="content-link" target="_blank">詳細を見る</a>` : ''}
-            </div>
-        </div>
-    `).join('');
-} 
-
 // フィルター機能の初期化
 function initializeFilters() {
     console.log('🔍 フィルター機能初期化');
@@ -0,0 +1,156 @@
+// 今日行けるイベントサイト - Service Worker
+//
+// 2回目以降の表示をキャッシュから即座に行い、圏外でも前回のデータを表示する。
+//
+// - シェル（ページ・style.css・app.js）: 事前にキャッシュし、stale-while-revalidate で返す
+//   （ページはネットワークを優先し、つながらないときだけキャッシュを返す）
+// - 版付きのファイル（?v= 付きのURL・CDNのバージョン付きのライブラリ）: 内容が変わらないのでキャッシュを優先
+// - APIのJSON（イベント・地域特集・天気）: stale-while-revalidate
+//   再検証はブラウザのHTTPキャッシュを通るため、ETag が同じなら 304 で済む。
+//   イベント・地域特集の ETag（無ければ本文）が変わったときは、ページに data-updated を送って描き直させる。
+// - 差分（/api/events?since=）とスクレイピングの実行などはキャッシュしない
+
+const CACHE_VERSION = 'v1';
+const SHELL_CACHE = `shell-${CACHE_VERSION}`;
+const ASSET_CACHE = `assets-${CACHE_VERSION}`;
+const DATA_CACHE = `data-${CACHE_VERSION}`;
+
+const SHELL_URLS = [
+    './',
+    'static/css/style.css',
+    'static/js/app.js'
+];
+
+// stale-while-revalidate で返すAPI（/api/ 以下のパス）
+const DATA_PATTERN = /\/api\/(events(\.json)?|content(\.json|\/.+\.json)?|weather(\/cities)?)$/;
+// 更新をページに知らせるAPI（天気は毎回 timestamp が変わるため知らせない）
+const NOTIFY_PATTERN = /\/api\/(events(\.json)?|content\/index\.json)$/;
+// 版がURLに入っているCDN
+const VERSIONED_HOSTS = ['cdn.jsdelivr.net', 'cdnjs.cloudflare.com'];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(SHELL_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    const current = [SHELL_CACHE, ASSET_CACHE, DATA_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(
+                names.filter(name => !current.includes(name)).map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request, SHELL_CACHE));
+    } else if (url.pathname.includes('/api/')) {
+        if (DATA_PATTERN.test(url.pathname) && !url.searchParams.has('since')) {
+            if (url.searchParams.has('v')) {
+                // 版付きの地域特集（api/content/<種類>/<市>.json?v=）
+                event.respondWith(cacheFirst(request, DATA_CACHE));
+            } else {
+                event.respondWith(staleWhileRevalidate(event, DATA_CACHE, NOTIFY_PATTERN.test(url.pathname)));
+            }
+        }
+    } else if (url.searchParams.has('v') || VERSIONED_HOSTS.includes(url.hostname)) {
+        event.respondWith(cacheFirst(request, ASSET_CACHE));
+    } else if (url.origin === self.location.origin && url.pathname.includes('/static/')) {
+        event.respondWith(staleWhileRevalidate(event, SHELL_CACHE, false));
+    }
+});
+
+// 保存してよいレスポンス（CORS なしで読んだ CDN のファイルは opaque のまま保存する）
+function cacheable(response) {
+    return response && (response.ok || response.type === 'opaque');
+}
+
+async function networkFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        if (cacheable(response)) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return (await cache.match(request, { ignoreSearch: true })) || cache.match('./');
+    }
+}
+
+async function cacheFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+
+    const response = await fetch(request);
+    if (cacheable(response)) {
+        await removeOtherVersions(cache, request);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+// 同じパスの別の版（?v= だけ違うURL）を削除
+async function removeOtherVersions(cache, request) {
+    const url = new URL(request.url);
+    if (!url.searchParams.has('v')) return;
+    const keys = await cache.keys();
+    await Promise.all(keys
+        .filter(key => {
+            const other = new URL(key.url);
+            return other.origin === url.origin && other.pathname === url.pathname && other.search !== url.search;
+        })
+        .map(key => cache.delete(key)));
+}
+
+function staleWhileRevalidate(event, cacheName, notify) {
+    const request = event.request;
+    const revalidated = caches.open(cacheName).then(async cache => {
+        const cached = await cache.match(request);
+        const response = await fetch(request);
+        if (!cacheable(response)) return response;
+
+        await cache.put(request, response.clone());
+        if (notify && cached && !(await sameVersion(cached, response.clone()))) {
+            await notifyClients(request.url);
+        }
+        return response;
+    });
+
+    return caches.open(cacheName)
+        .then(cache => cache.match(request))
+        .then(cached => {
+            if (cached) {
+                // キャッシュを返し、裏で再検証する（失敗しても表示はキャッシュのまま）
+                event.waitUntil(revalidated.catch(() => undefined));
+                return cached;
+            }
+            return revalidated;
+        });
+}
+
+// ETag（CORS で読めないときは本文）が同じか
+async function sameVersion(cached, response) {
+    const cachedTag = cached.headers.get('ETag');
+    const tag = response.headers.get('ETag');
+    if (cachedTag && tag) {
+        return cachedTag === tag;
+    }
+    return (await cached.clone().text()) === (await response.text());
+}
+
+async function notifyClients(url) {
+    const clients = await self.clients.matchAll({ type: 'window' });
+    clients.forEach(client => client.postMessage({ type: 'data-updated', url }));
+}
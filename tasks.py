@@ -0,0 +1,303 @@
+"""
+バックグラウンドタスク（Celery）
+
+スクレイピング・コンテンツ更新・天気の取得・JSONの書き出しをタスクにして、
+celery beat で定期実行する。ワーカーを増やせば都市ごとのスクレイピングが並列に進む。
+
+    celery -A tasks.celery worker -Q celery,scrape --loglevel=info
+    celery -A tasks.celery beat --loglevel=info
+
+- 同じ引数のタスクが重ねて実行されないよう、共有キャッシュ（CACHE_URL）のロックを取る。
+  保存は既存行の更新（upsert）なので、再試行や二重配信で再実行されても結果は変わらない。
+- 通信エラー・DBのロック待ちの失敗は指数バックオフで再試行する。
+- 同じホスト（市のサイト）へのスクレイピングは SCRAPE_HOST_CONCURRENCY 件まで、開始は SCRAPE_HOST_INTERVAL 秒に1回まで。
+  どちらも共有キャッシュで数えるので、ワーカーの数によらずクラスタ全体での上限になる
+  （Celery の rate_limit はワーカーごとの上限なので、ホストの保護には使わない）。
+- CELERY_TASK_ALWAYS_EAGER=true ならブローカーを使わずにその場で実行する（テスト・開発用）。
+"""
+
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from celery import Celery, Task, chord
+from celery.schedules import crontab
+
+from cache_backend import default_cache
+from config import Config
+from content_auto_updater import ContentAutoUpdater
+from content_store import CONTENT_KINDS
+from event_scraper import EventScraper
+from retention import run_retention
+from weather_refresher import CityWeatherRefresher, create_forecast_prefetcher
+
+logger = logging.getLogger(__name__)
+
+celery = Celery('events')
+celery.conf.update(
+    broker_url=Config.CELERY_BROKER_URL,
+    result_backend=Config.CELERY_RESULT_BACKEND,
+    task_always_eager=Config.CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=True,
+    timezone='Asia/Tokyo',
+    # ワーカーが落ちたタスクは別のワーカーがやり直す（どのタスクも再実行して問題ない）
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_routes={'tasks.scrape_city': {'queue': 'scrape'}},
+    result_expires=86400,
+)
+
+# タスクのロック・ホストごとの実行枠（ワーカー間で共有する）
+task_locks = default_cache.namespace('tasks')
+
+
+class TaskAlreadyRunning(Exception):
+    """同じタスクが別のワーカーで実行中"""
+
+
+class HostBusy(Exception):
+    """同じホストへのスクレイピングが上限まで実行中"""
+
+
+class ScrapeFailed(Exception):
+    """スクレイピングに失敗した（再試行する）"""
+
+
+class BaseTask(Task):
+    """再試行の設定を共通化したタスク"""
+
+    autoretry_for = (requests.exceptions.RequestException, sqlite3.OperationalError, ScrapeFailed)
+    retry_backoff = 30
+    retry_backoff_max = 900
+    retry_jitter = True
+    max_retries = 3
+
+
+@contextmanager
+def task_lock(name, ttl=3600):
+    """同じ名前のタスクを1つだけ実行する（ワーカーが落ちてもTTLで解放される）"""
+    token = task_locks.acquire_lock(f'lock:{name}', ttl)
+    if token is None:
+        raise TaskAlreadyRunning(name)
+    try:
+        yield
+    finally:
+        # TTLが切れて別のワーカーが取り直したロックは消さない
+        task_locks.release_lock(f'lock:{name}', token)
+
+
+@contextmanager
+def host_slot(url, limit=None, ttl=900):
+    """ホストごとの同時実行数を limit 件までに制限する"""
+    host = urlparse(url).netloc
+    for slot in range(limit or Config.SCRAPE_HOST_CONCURRENCY):
+        key = f'host:{host}:{slot}'
+        token = task_locks.acquire_lock(key, ttl)
+        if token is not None:
+            try:
+                yield
+            finally:
+                task_locks.release_lock(key, token)
+            return
+    raise HostBusy(host)
+
+
+# ホストの空き（host_slot・host_rate）を待つ再試行の上限
+HOST_BUSY_MAX_RETRIES = 30
+
+
+def host_rate(url, interval=None):
+    """ホストごとの開始を interval 秒に1回までに制限する（間隔が空いていなければ HostBusy）"""
+    interval = Config.SCRAPE_HOST_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return
+    # 次に開始できる時刻までTTL付きで残るロック（解放はしない）
+    host = urlparse(url).netloc
+    if task_locks.acquire_lock(f'rate:{host}', interval) is None:
+        raise HostBusy(host)
+
+
+@celery.task(base=BaseTask, bind=True)
+def scrape_city(self, source_id, limit=None):
+    """1都市のサイトをスクレイピングして保存"""
+    scraper = EventScraper()
+    source_info = scraper.sources[source_id]
+    try:
+        with task_lock(f'scrape_city:{source_id}'):
+            host_rate(source_info['url'])
+            with host_slot(source_info['url']):
+                events = scraper.scrape_city_website(source_id, source_info, limit=limit)
+                # scrape_city_website は失敗しても例外を出さずにエラー件数を増やす
+                if scraper.stats['errors']:
+                    raise ScrapeFailed(source_info['name'])
+                scraper.save_events_to_db(events)
+    except TaskAlreadyRunning:
+        logger.info("実行中のためスキップしました: %s", source_id)
+        return None
+    except HostBusy as e:
+        if self.request.retries < HOST_BUSY_MAX_RETRIES:
+            raise self.retry(exc=e, countdown=60, max_retries=HOST_BUSY_MAX_RETRIES)
+        # 空きを待ち切れなかった都市もエラーとして結果に含める
+        logger.error("ホストが混雑しているため取得できませんでした: %s", source_id)
+        scraper.stats['errors'] = max(scraper.stats['errors'], 1)
+    except self.autoretry_for as e:
+        if self.request.retries < self.max_retries:
+            raise
+        # 再試行しても失敗した都市はエラーとして結果に含める（例外にすると chord の finish_scraping が実行されない）
+        logger.error("再試行しても取得できませんでした: %s: %s", source_id, e)
+        scraper.stats['errors'] = max(scraper.stats['errors'], 1)
+
+    return {name: scraper.stats[name] for name in ('total_events', 'new_events', 'updated_events', 'errors')}
+
+
+@celery.task(base=BaseTask)
+def finish_scraping(results, started_at):
+    """全都市のスクレイピング後の記録とキャッシュの作成"""
+    scraper = EventScraper()
+    for result in results:
+        for name, count in (result or {}).items():
+            scraper.stats[name] += count
+    scraper.log_scraping_run(time.time() - started_at)
+    scraper.warm_filter_cache()
+    logger.info("全都市のスクレイピング完了: %d件のイベントを処理", scraper.stats['total_events'])
+    return scraper.stats['total_events']
+
+
+@celery.task(base=BaseTask)
+def scrape_all_cities(limit=None):
+    """全都市を並列にスクレイピング（完了後に finish_scraping）"""
+    sources = list(EventScraper().sources)
+    chord(scrape_city.s(source_id, limit) for source_id in sources)(finish_scraping.s(time.time()))
+    return len(sources)
+
+
+@celery.task(base=BaseTask)
+def scrape_recent():
+    """新着だけの軽量チェック（最初の3都市の5件まで）"""
+    sources = list(EventScraper().sources)[:3]
+    for source_id in sources:
+        scrape_city.delay(source_id, limit=5)
+    return len(sources)
+
+
+@celery.task(base=BaseTask)
+def weekly_maintenance():
+    """古いイベントの非アクティブ化・保持期間の適用・DBの最適化"""
+    try:
+        with task_lock('weekly_maintenance', ttl=6 * 3600):
+            scraper = EventScraper()
+            scraper.deactivate_old_events()
+            results = run_retention()
+            scraper.optimize_database()
+    except TaskAlreadyRunning:
+        return None
+    return results
+
+
+@celery.task(base=BaseTask, rate_limit=Config.SCRAPE_RATE_LIMIT)
+def update_content(kind):
+    """1種類のコンテンツを取得して保存"""
+    if kind not in CONTENT_KINDS:
+        raise ValueError(f"未対応のコンテンツです: {kind}")
+    try:
+        with task_lock(f'update_content:{kind}'):
+            getattr(ContentAutoUpdater(), f'scrape_{kind}')()
+    except TaskAlreadyRunning:
+        return None
+    return kind
+
+
+@celery.task(base=BaseTask)
+def export_content(results=None):
+    """コンテンツを api/content.json に書き出す"""
+    try:
+        with task_lock('export_content', ttl=600):
+            ContentAutoUpdater().export_to_json()
+    except TaskAlreadyRunning:
+        return None
+    return True
+
+
+@celery.task(base=BaseTask)
+def update_all_content():
+    """全コンテンツを並列に取得してから書き出す"""
+    chord(update_content.s(kind) for kind in CONTENT_KINDS)(export_content.s())
+    return len(CONTENT_KINDS)
+
+
+@celery.task(base=BaseTask)
+def scrape_restaurants():
+    """今日のキーワードで飲食店情報を取得"""
+    # tweepy を使うため、飲食店のタスクを実行するときだけ読み込む
+    from restaurant_scraper_scheduled import ScheduledRestaurantScraper
+
+    try:
+        with task_lock('scrape_restaurants', ttl=3600):
+            ScheduledRestaurantScraper().run_scraper()
+    except TaskAlreadyRunning:
+        return None
+    return True
+
+
+@celery.task(base=BaseTask)
+def refresh_weather_forecasts():
+    """全都市の天気予報を取得して共有キャッシュを更新"""
+    try:
+        with task_lock('refresh_weather_forecasts', ttl=Config.WEATHER_PREFETCH_INTERVAL):
+            return create_forecast_prefetcher().refresh()
+    except TaskAlreadyRunning:
+        return None
+
+
+@celery.task(base=BaseTask)
+def refresh_city_weather():
+    """地域別表示用の現在の天気を更新（共有キャッシュが新しければ取得しない）"""
+    refresher = CityWeatherRefresher(
+        Config.TARGET_CITIES,
+        Config.CITY_WEATHER_QUERIES,
+        interval=Config.WEATHER_REFRESH_INTERVAL,
+        use_bulk=Config.WEATHERAPI_BULK
+    )
+    refresher.refresh()
+    return refresher.stats()['fetch_count']
+
+
+# EventScraper.schedule_scraping・ContentAutoUpdater.schedule_updates と同じ予定
+celery.conf.beat_schedule = {
+    'scrape-all-cities': {
+        'task': 'tasks.scrape_all_cities',
+        'schedule': crontab(hour=6, minute=0),
+    },
+    'scrape-recent': {
+        'task': 'tasks.scrape_recent',
+        'schedule': crontab(minute=0),
+    },
+    'weekly-maintenance': {
+        'task': 'tasks.weekly_maintenance',
+        'schedule': crontab(hour=3, minute=0, day_of_week='sunday'),
+    },
+    'update-all-content': {
+        'task': 'tasks.update_all_content',
+        'schedule': crontab(hour=6, minute=0),
+    },
+    'update-all-content-monday': {
+        'task': 'tasks.update_all_content',
+        'schedule': crontab(hour=9, minute=0, day_of_week='monday'),
+    },
+    'scrape-restaurants': {
+        'task': 'tasks.scrape_restaurants',
+        'schedule': crontab(hour=10, minute=0),
+    },
+    'refresh-weather-forecasts': {
+        'task': 'tasks.refresh_weather_forecasts',
+        'schedule': Config.WEATHER_PREFETCH_INTERVAL,
+    },
+    'refresh-city-weather': {
+        'task': 'tasks.refresh_city_weather',
+        'schedule': Config.WEATHER_REFRESH_INTERVAL,
+    },
+}
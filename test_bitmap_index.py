@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+ビットマップインデックスのテスト
+"""
+
+import itertools
+import sqlite3
+
+from bitmap_index import BitmapIndex
+from event_filter import EventFilter
+from event_model import event_row_factory
+from filter_cache import FLAG_FILTERS, build_filter_query, bump_generation, get_generation
+from migrations import migrate
+
+EVENTS = [
+    ('図書館講座', '2025-08-01', '守谷市立図書館', '講座', 1, 1, 1, 1),
+    ('花火大会', '2025-08-02', '取手緑地運動公園（取手市）', '祭り', 0, 1, 1, 1),
+    ('朝市', '2025-08-03', 'つくば市役所', '祭り', None, 0, 0, 0),
+    ('工作教室', '2025-08-04', 'つくばみらい市 きらくやまふれあいの丘', '講座', 1, 0, 1, 1)
+]
+
+
+def make_db(db_path):
+    """サンプルのイベントDBを作成"""
+    migrate(db_path, 'events')
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO events (title, date, location, category, is_indoor, is_free, has_parking, child_friendly)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', EVENTS)
+    bump_generation(conn)
+    conn.commit()
+    conn.row_factory = event_row_factory
+    return conn
+
+
+def all_filters():
+    """真偽値の全組み合わせ × カテゴリ × 市区町村"""
+    for flags in itertools.product((False, True), repeat=len(FLAG_FILTERS)):
+        for category, city in itertools.product(('', '講座', '祭り', 'なし'), ('', 'つくば市', '取手市')):
+            yield dict(zip(FLAG_FILTERS, flags), category=category, city=city)
+
+
+def test_select_matches_sql(tmp_path):
+    """どの条件の組み合わせでもSQLと同じ結果になること"""
+    conn = make_db(str(tmp_path / 'events.db'))
+    index = BitmapIndex()
+    index.refresh(conn, get_generation(conn))
+
+    for filters in all_filters():
+        query, params = build_filter_query(filters)
+        expected = [event.id for event in conn.execute(query, params)]
+        assert [event.id for event in index.select(filters)] == expected, filters
+
+
+def test_incremental_refresh(tmp_path):
+    """更新・追加は差分で、削除は作り直しで反映されること"""
+    conn = make_db(str(tmp_path / 'events.db'))
+    index = BitmapIndex()
+    index.refresh(conn, get_generation(conn))
+    assert not index.refresh(conn, get_generation(conn))
+
+    conn.execute("UPDATE events SET category = '展示', is_free = 1, updated_at = '2999-01-01 00:00:00' WHERE id = 1")
+    conn.execute("INSERT INTO events (title, location, category, is_free) VALUES ('夏祭り', '守谷市役所', '祭り', 1)")
+    bump_generation(conn)
+    conn.commit()
+
+    assert index.refresh(conn, get_generation(conn))
+    assert [event.id for event in index.select({'category': '展示'})] == [1]
+    assert [event.id for event in index.select({'free_only': True, 'city': '守谷市'})] == [1, 5]
+    assert '講座' in index.categories and len(index) == 5
+
+    conn.execute('DELETE FROM events WHERE id = 2')
+    bump_generation(conn)
+    conn.commit()
+
+    index.refresh(conn, get_generation(conn))
+    assert [event.id for event in index.select({'category': '祭り'})] == [3, 5]
+
+
+def test_deactivated_events_excluded(tmp_path):
+    """非アクティブにしたイベントは差分の読み直しでどの条件からも外れること"""
+    conn = make_db(str(tmp_path / 'events.db'))
+    index = BitmapIndex()
+    index.refresh(conn, get_generation(conn))
+
+    conn.execute("UPDATE events SET is_active = 0, updated_at = '2999-01-01 00:00:00' WHERE id = 2")
+    bump_generation(conn)
+    conn.commit()
+
+    index.refresh(conn, get_generation(conn))
+    assert len(index) == 4 and index.stats()['active'] == 3
+    assert [event.id for event in index.select({'category': '祭り'})] == [3]
+    for filters in all_filters():
+        query, params = build_filter_query(filters)
+        expected = [event.id for event in conn.execute(query, params)]
+        assert [event.id for event in index.select(filters)] == expected, filters
+
+
+def test_event_filter_uses_index(tmp_path):
+    """インデックスを使っても行ごとの判定と同じ結果になること"""
+    conn = make_db(str(tmp_path / 'events.db'))
+    events = conn.execute('SELECT * FROM events').fetchall()
+    index = BitmapIndex()
+    index.refresh(conn, get_generation(conn))
+
+    with_index = EventFilter(bitmap_index=index)
+    without_index = EventFilter()
+    for filters in all_filters():
+        assert ([with_index.matches_filters(event, filters) for event in events] ==
+                [without_index.matches_filters(event, filters) for event in events]), filters
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_select_matches_sql, test_incremental_refresh, test_deactivated_events_excluded,
+                 test_event_filter_uses_index):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ すべてのテストが成功しました")
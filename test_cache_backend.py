@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+キャッシュバックエンドのテスト
+"""
+
+import sqlite3
+import threading
+import time
+
+from cache_backend import LocalLRUCache, LocalRedisStandIn, RedisCache, SQLiteCache, create_cache_backend
+
+
+def test_ttl_and_namespaces():
+    """TTLで期限切れになり、名前空間ごとに削除できること"""
+    for cache in (LocalLRUCache(), RedisCache(LocalRedisStandIn())):
+        weather = cache.namespace('weather')
+        feed = cache.namespace('feed')
+
+        weather.set('current', {'つくば市': 20}, ttl=0.05)
+        feed.set('current', 'feed')
+        assert weather.get('current') == {'つくば市': 20}
+        assert feed.get('current') == 'feed'
+
+        time.sleep(0.06)
+        assert weather.get('current') is None
+
+        weather.set('a', 1)
+        weather.clear()
+        assert weather.get('a') is None
+        assert feed.get('current') == 'feed'
+
+
+def test_sqlite_cache_shared_between_instances(tmp_path):
+    """同じファイルを使う別インスタンス（別ワーカー相当）から値が見えること"""
+    url = f"sqlite://{tmp_path / 'cache.db'}"
+    first = create_cache_backend(url).namespace('score')
+    second = create_cache_backend(url).namespace('score')
+
+    first.set_many([('a', 0.5), ('b', 0.7)], ttl=60)
+
+    assert second.get_many(['a', 'b', 'c']) == {'a': 0.5, 'b': 0.7}
+    assert second.stats()['hits'] == 2
+    assert second.stats()['misses'] == 1
+
+
+def test_get_or_set_runs_loader_once(tmp_path):
+    """同時に期限切れを見つけても loader は1回だけ呼ばれること"""
+    db_path = str(tmp_path / 'cache.db')
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'feed'
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(SQLiteCache(db_path).get_or_set('events', loader, ttl=60)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['feed'] * 5
+    assert len(calls) == 1
+
+
+def test_lock_released_only_by_holder(tmp_path):
+    """TTLが切れた後に取り直されたロックを、前の持ち主が解放しないこと"""
+    for cache in (LocalLRUCache(), SQLiteCache(str(tmp_path / 'cache.db')), RedisCache(LocalRedisStandIn())):
+        locks = cache.namespace('tasks')
+        stale = locks.acquire_lock('lock:scrape', ttl=0.05)
+        assert stale is not None
+        assert locks.acquire_lock('lock:scrape', ttl=60) is None
+
+        time.sleep(0.06)
+        current = locks.acquire_lock('lock:scrape', ttl=60)
+        assert current is not None
+        assert locks.release_lock('lock:scrape', stale) is False
+        assert locks.acquire_lock('lock:scrape', ttl=60) is None
+        assert locks.release_lock('lock:scrape', current) is True
+        assert locks.acquire_lock('lock:scrape', ttl=60) is not None
+
+
+def test_values_stored_as_json(tmp_path):
+    """共有する保存先では bytes はそのまま、それ以外は JSON で保存されること"""
+    db_path = str(tmp_path / 'cache.db')
+    for cache in (SQLiteCache(db_path), RedisCache(LocalRedisStandIn())):
+        cache.set('feed', b'{"events":[]}')
+        cache.set('weather', {'weather': {'つくば市': {'temp': 28.5}}, 'updated_at': '2025-07-01T09:00:00'})
+        assert cache.get('feed') == b'{"events":[]}'
+        assert cache.get('weather') == {'weather': {'つくば市': {'temp': 28.5}}, 'updated_at': '2025-07-01T09:00:00'}
+
+    (stored,) = sqlite3.connect(db_path).execute("SELECT value FROM cache_entries WHERE key = 'weather'").fetchone()
+    assert stored.startswith(b'j{')
+
+
+class BrokenRedis(LocalRedisStandIn):
+    """接続できないRedis"""
+
+    def get(self, name):
+        raise ConnectionError('connection refused')
+
+    def set(self, name, value, px=None, nx=False):
+        raise ConnectionError('connection refused')
+
+
+def test_backend_outage_falls_back_to_loader():
+    """保存先に接続できなくても例外にならず、loader() の結果が返ること"""
+    cache = RedisCache(BrokenRedis()).namespace('feed')
+    cache.set('events', b'feed')
+    assert cache.get('events') is None
+    assert cache.get_or_set('events', lambda: b'feed', ttl=60) == b'feed'
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    test_ttl_and_namespaces()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_sqlite_cache_shared_between_instances(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_get_or_set_runs_loader_once(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_lock_released_only_by_holder(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_values_stored_as_json(Path(tmp))
+    test_backend_outage_falls_back_to_loader()
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+地域特集コンテンツの保存と読み出しのテスト
+"""
+
+import json
+import os
+import sqlite3
+
+from content_export import city_slug, export_content
+from content_store import ContentStore
+from migrations import migrate
+
+
+def item(title, city='つくば市', description='説明', date=None):
+    return {'title': title, 'description': description, 'date': date, 'location': '市内',
+            'category': '季節イベント', 'city': city, 'source_url': f'https://example.jp/{title}'}
+
+
+def test_save_skips_unchanged(tmp_path):
+    """同じ内容の再保存は書き込まず、内容が変わったときだけ更新すること"""
+    db_path = str(tmp_path / 'content.db')
+    migrate(db_path, 'content')
+    store = ContentStore(db_path)
+
+    assert store.save_many('seasonal_events', [item('花火大会', date='2025-08-15'), item('収穫祭')]) == 2
+    assert store.save_many('seasonal_events', [item('花火大会', date='2025-08-15')]) == 0
+    assert store.save('seasonal_events', item('花火大会', description='雨天順延', date='2025-08-15'))
+    # 開催日の無い種類は date を保存しない
+    assert store.save('food_info', item('花火大会', date='2025-08-15'))
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT kind, description, date FROM content_items ORDER BY id').fetchall()
+    conn.close()
+    assert rows == [('seasonal_events', '雨天順延', '2025-08-15'), ('seasonal_events', '説明', None),
+                    ('food_info', '説明', None)]
+
+
+def test_latest_per_kind(tmp_path):
+    """種類ごとの新着を件数・市で絞り込めること"""
+    db_path = str(tmp_path / 'content.db')
+    migrate(db_path, 'content')
+    store = ContentStore(db_path)
+    store.save_many('culture_info', [item(f'企画展{i}', city='守谷市' if i % 2 else 'つくば市') for i in range(5)])
+    store.save_many('tourism_info', [item('筑波山')])
+
+    latest = store.latest(limit=3)
+    assert [entry.title for entry in latest['culture_info']] == ['企画展4', '企画展3', '企画展2']
+    assert [entry.title for entry in latest['tourism_info']] == ['筑波山']
+    assert latest['food_info'] == []
+
+    moriya = store.latest(('culture_info',), city='守谷市')
+    assert list(moriya) == ['culture_info']
+    assert [entry.title for entry in moriya['culture_info']] == ['企画展3', '企画展1']
+    assert 'kind' not in moriya['culture_info'][0].to_dict()
+
+
+def test_export_partitions(tmp_path):
+    """種類 × 市ごとのファイルと目次が書き出され、無くなった市のファイルは消えること"""
+    db_path = str(tmp_path / 'content.db')
+    out_dir = tmp_path / 'api'
+    migrate(db_path, 'content')
+    store = ContentStore(db_path)
+    store.save_many('seasonal_events', [item('花火大会', city='つくばみらい市季節イベント'),
+                                        item('桜祭り', city='守谷市'), item('マルシェ', city='東京都')])
+
+    assert city_slug('つくばみらい市季節イベント') == 'tsukubamirai'
+    assert city_slug('竜ヶ崎市') == 'ryugasaki'
+
+    index = export_content(db_path, str(out_dir), extra={'stats': {}})
+    entry = index['kinds']['seasonal_events']
+    assert entry['all']['count'] == 3
+    assert set(entry['cities']) == {'tsukubamirai', 'moriya', 'other'}
+    assert index['kinds']['food_info']['cities'] == {}
+
+    moriya = json.loads((out_dir / entry['cities']['moriya']['path']).read_text(encoding='utf-8'))
+    assert [row['title'] for row in moriya['items']] == ['桜祭り']
+    assert len(json.loads((out_dir / 'content.json').read_text(encoding='utf-8'))['seasonal_events']) == 3
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("DELETE FROM content_items WHERE city = '守谷市'")
+    conn.close()
+    second = export_content(db_path, str(out_dir))
+    assert second['version'] != index['version']
+    assert not (out_dir / 'content' / 'seasonal_events' / 'moriya.json').exists()
+
+
+def test_committed_exports_agree():
+    """コミットされている api/content.json と分割ファイルが同じ書き出しのものであること"""
+    api_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api')
+    with open(os.path.join(api_dir, 'content.json'), encoding='utf-8') as f:
+        content = json.load(f)
+    with open(os.path.join(api_dir, 'content', 'index.json'), encoding='utf-8') as f:
+        index = json.load(f)
+
+    assert content['timestamp'] == index['generated_at']
+    for kind, entry in index['kinds'].items():
+        items = []
+        if entry['all']:
+            with open(os.path.join(api_dir, entry['all']['path']), encoding='utf-8') as f:
+                items = json.load(f)['items']
+        assert items == content[kind], kind
+        for city, city_entry in entry['cities'].items():
+            with open(os.path.join(api_dir, city_entry['path']), encoding='utf-8') as f:
+                assert len(json.load(f)['items']) == city_entry['count'], (kind, city)
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_save_skips_unchanged(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_latest_per_kind(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_export_partitions(Path(tmp))
+    test_committed_exports_agree()
+    print("✅ すべてのテストが成功しました")
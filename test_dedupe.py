@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+イベントの重複検出のテスト
+"""
+
+import sqlite3
+
+from bitmap_index import BitmapIndex
+from dedupe import EventDeduper, MinHashLSH, assign_cluster, release_clusters
+from filter_cache import bump_generation, get_generation
+from migrations import migrate
+
+
+def test_lsh_groups_near_duplicates():
+    """表記の違う同じ催しはまとめ、別の市・別の日の催しはまとめないこと"""
+    lsh = MinHashLSH()
+
+    assert lsh.add(1, '第12回 つくばみらい市 花火大会 2025', '2025-08-15', 'つくばみらい市') is None
+    assert lsh.add(2, 'つくばみらい市花火大会', '2025-08-15', 'つくばみらい市') == 1
+    assert lsh.add(3, 'つくばみらい市花火大会', '2025-08-16', 'つくばみらい市') is None
+    assert lsh.add(4, 'つくばみらい市 花火大会', '2025-08-15', '守谷市') is None
+    assert lsh.add(5, '守谷市 図書館 おはなし会', '2025-08-15', 'つくばみらい市') is None
+
+
+def test_clusters_in_events_db(tmp_path):
+    """別のサイトに掲載された同じ催しは代表の1件だけが返ること"""
+    db_path = str(tmp_path / 'events.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY, title TEXT, date TEXT, location TEXT, source_city TEXT
+        )
+    ''')
+    conn.executemany('INSERT INTO events (title, date, location, source_city) VALUES (?, ?, ?, ?)', [
+        ('とりで利根川大花火', '2025-08-09', '取手緑地運動公園', '取手市役所'),
+        ('守谷市立図書館 おはなし会', '2025-08-09', '守谷市立図書館', '守谷市役所')
+    ])
+    conn.commit()
+    conn.close()
+
+    # 既存のイベントはマイグレーションで登録される
+    migrate(db_path, 'events')
+    assert EventDeduper(db_path).duplicate_ids() == set()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO events (title, date, location, source_city)
+        VALUES ('第70回 とりで利根川大花火（2025年）', '2025-08-09', '取手緑地運動公園（取手市）', '守谷市役所')
+    """)
+    assert assign_cluster(conn, 3, '第70回 とりで利根川大花火（2025年）', '2025-08-09',
+                          '取手緑地運動公園（取手市）', '守谷市役所') == 1
+    bump_generation(conn)
+    conn.commit()
+
+    assert EventDeduper(db_path).duplicate_ids() == {3}
+
+    index = BitmapIndex()
+    index.refresh(conn, get_generation(conn))
+    assert [event.id for event in index.select({})] == [1, 2]
+    assert [event.id for event in index.select({}, include_duplicates=True)] == [1, 2, 3]
+    conn.close()
+
+
+def test_canonical_moves_when_removed(tmp_path):
+    """代表イベントを非アクティブ化・削除すると、残りのアクティブな最小の id が代表になること"""
+    db_path = str(tmp_path / 'events.db')
+    migrate(db_path, 'events')
+    conn = sqlite3.connect(db_path)
+    titles = ['とりで利根川大花火', '第70回 とりで利根川大花火', 'とりで利根川大花火（2025年）']
+    for event_id, title in enumerate(titles, 1):
+        conn.execute("INSERT INTO events (title, date, location) VALUES (?, '2025-08-09', '取手緑地運動公園')",
+                     (title,))
+        assert assign_cluster(conn, event_id, title, '2025-08-09', '取手緑地運動公園') == 1
+    conn.commit()
+    deduper = EventDeduper(db_path)
+    assert deduper.duplicate_ids() == {2, 3}
+
+    conn.execute('UPDATE events SET is_active = 0 WHERE id = 1')
+    conn.commit()
+    assert deduper.duplicate_ids() == {3}
+
+    with conn:
+        conn.execute('DELETE FROM events WHERE id IN (1, 2)')
+        release_clusters(conn, [1, 2])
+    assert deduper.duplicate_ids() == set()
+    assert conn.execute('SELECT event_id, cluster_id FROM event_clusters').fetchall() == [(3, 3)]
+    assert deduper.find_cluster('とりで利根川大花火', '2025-08-09', '取手緑地運動公園') == 3
+    conn.close()
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    test_lsh_groups_near_duplicates()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_clusters_in_events_db(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_canonical_moves_when_removed(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+イベントの差分（/api/events?since=）のテスト
+"""
+
+import sqlite3
+
+import pytest
+
+from event_changes import EventChanges
+from migrations import migrate
+
+
+def create_events(db_path):
+    migrate(db_path, 'events')
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("INSERT INTO events (title, date, updated_at) VALUES ('古い講座', '2999-01-01', '2000-01-01 00:00:00')")
+        conn.execute("INSERT INTO events (title, date, updated_at) VALUES ('市民まつり', '2999-08-01', '2000-01-01 00:00:00')")
+        conn.execute("INSERT INTO events (title, date, updated_at) VALUES ('中止の催し', '2999-09-01', '2000-01-01 00:00:00')")
+    return conn
+
+
+def test_changes_since_cursor(tmp_path):
+    """cursor 以降の変更・非アクティブ化・削除だけが返ること"""
+    db_path = str(tmp_path / 'events.db')
+    conn = create_events(db_path)
+    changes = EventChanges(db_path)
+    cursor = changes.cursor()
+    assert cursor == '1999-12-31 23:59:00'
+
+    with conn:
+        # updated_at を設定しない更新もトリガーで拾う
+        conn.execute("UPDATE events SET description = '雨天決行' WHERE title = '市民まつり'")
+        conn.execute("UPDATE events SET is_active = 0 WHERE title = '中止の催し'")
+        conn.execute("DELETE FROM events WHERE title = '古い講座'")
+    conn.close()
+
+    delta = changes.since(changes.cursor())
+    assert delta['full'] is False
+    assert [(event.title, event.is_active) for event in delta['changed']] == [('市民まつり', True), ('中止の催し', False)]
+    assert delta['removed'] == [1]
+    assert delta['cursor'] > cursor
+
+
+def test_old_or_invalid_since(tmp_path):
+    """削除の記録の保持期間より古い since は全件、形式が違えば ValueError"""
+    db_path = str(tmp_path / 'events.db')
+    create_events(db_path).close()
+    changes = EventChanges(db_path, max_age_days=7)
+    assert changes.since('2000-01-01 00:00:00')['full'] is True
+    with pytest.raises(ValueError):
+        changes.since('yesterday')
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_changes_since_cursor, test_old_or_invalid_since):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+イベントフィルター（Event型・スコアのメモ化）のテスト
+"""
+
+import sqlite3
+
+from event_filter import EventFilter
+from event_model import Event, event_row_factory
+from hourly_forecast import HourlyForecast
+from cache_backend import SQLiteCache
+from score_memo import ScoreMemo
+
+WEATHER = {
+    'forecast': [
+        {'date': '2025-08-01', 'condition': '晴れ', 'is_rainy': False, 'is_sunny': True},
+        {'date': '2025-08-02', 'condition': '雨', 'is_rainy': True, 'is_sunny': False}
+    ]
+}
+
+
+def make_events():
+    """サンプルイベントを作成"""
+    return [
+        Event(id=1, title='屋外フェス', date='2025-08-01', time='10:00', is_indoor=False,
+              is_free=True, rain_cancellation='雨天中止', updated_at='2025-07-01 00:00:00'),
+        Event(id=2, title='図書館講座', date='2025-08-02', time='14:00', is_indoor=True,
+              child_friendly=True, updated_at='2025-07-01 00:00:00'),
+        Event(id=3, title='日付未定の展示', date='2025-09-01', time='19:00', is_indoor=True)
+    ]
+
+
+def test_row_factory_maps_columns_by_name():
+    """列順が異なるスキーマでも同じ Event になること"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = event_row_factory
+    conn.execute('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY, title TEXT, source_city TEXT, is_active BOOLEAN,
+            date TEXT, is_indoor BOOLEAN, weather_dependent BOOLEAN, rain_cancellation TEXT
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO events (title, source_city, is_active, date, is_indoor, weather_dependent, rain_cancellation)
+        VALUES ('花火大会', '守谷市役所', 1, '2025-08-01', NULL, 1, '小雨決行')
+    ''')
+
+    event = conn.execute('SELECT * FROM events').fetchone()
+
+    assert event.title == '花火大会'
+    assert event.source_city == '守谷市役所'
+    assert event.is_indoor is None
+    assert event.weather_dependent is True
+    assert event.rain_cancellation == '小雨決行'
+    assert event.has_parking is False
+
+
+def test_scores_are_memoized():
+    """2回目の計算はメモから返ること"""
+    memo = ScoreMemo()
+    event_filter = EventFilter(score_memo=memo)
+    events = make_events()
+
+    first = event_filter.filter_events_by_weather(events, WEATHER)
+    second = event_filter.filter_events_by_weather(events, WEATHER)
+
+    assert [e.suitability_score for e in first] == [e.suitability_score for e in second]
+    assert memo.stats()['misses'] == len(events)
+    assert memo.stats()['hits'] == len(events)
+
+
+def test_memo_invalidated_by_forecast_change():
+    """予報が変わった日のイベントだけ再計算されること"""
+    memo = ScoreMemo()
+    event_filter = EventFilter(score_memo=memo)
+    events = make_events()
+    event_filter.filter_events_by_weather(events, WEATHER)
+
+    rainy = {'forecast': [dict(WEATHER['forecast'][0], is_rainy=True, is_sunny=False), WEATHER['forecast'][1]]}
+    result = {e.id: e.suitability_score for e in event_filter.filter_events_by_weather(events, rainy)}
+
+    assert memo.stats()['misses'] == len(events) + 1
+    assert result[1] < 0.5  # 雨天中止の屋外イベントは不利になる
+
+
+def test_memo_invalidated_by_event_update():
+    """イベント行が更新されたら再計算されること"""
+    memo = ScoreMemo()
+    event_filter = EventFilter(score_memo=memo)
+    events = make_events()
+    event_filter.filter_events_by_weather(events, WEATHER)
+
+    events[1].has_parking = True
+    events[1].updated_at = '2025-07-02 00:00:00'
+    event_filter.filter_events_by_weather(events, WEATHER)
+
+    assert memo.stats()['misses'] == len(events) + 1
+
+
+def test_shared_store_between_memos(tmp_path):
+    """共有キャッシュ経由で別プロセス相当のメモと結果を共有できること"""
+    db_path = str(tmp_path / 'cache.db')
+    events = make_events()
+
+    EventFilter(score_memo=ScoreMemo(store=SQLiteCache(db_path).namespace('score'))).filter_events_by_weather(events, WEATHER)
+
+    other = ScoreMemo(store=SQLiteCache(db_path).namespace('score'))
+    EventFilter(score_memo=other).filter_events_by_weather(events, WEATHER)
+
+    assert other.stats()['hits'] == len(events)
+    assert other.stats()['misses'] == 0
+
+
+def test_hourly_window_used_for_event_time():
+    """日単位では雨でも、開催時間帯が晴れならその予報で採点されること"""
+    rainy_day = {'forecast': [{'date': '2025-08-01', 'condition': '雨', 'is_rainy': True, 'is_sunny': False}]}
+    # 8月1日は昼まで晴れ、20時から雨
+    hours = [(f'2025-08-01 {h:02d}:00', h >= 20, h < 20, 3.0 if h >= 20 else 0.0) for h in range(24)]
+    hourly = {'守谷市': HourlyForecast.from_hours(hours)}
+    events = [
+        Event(id=1, title='朝市', date='2025-08-01', time='10:00〜12:00', is_indoor=False,
+              rain_cancellation='雨天中止', location='守谷市中央公園'),
+        Event(id=2, title='夜祭り', date='2025-08-01', time='19:00', is_indoor=False,
+              rain_cancellation='雨天中止', location='守谷市中央公園')
+    ]
+
+    results = EventFilter(score_memo=ScoreMemo()).score_events(events, rainy_day, hourly)
+    (_, morning, morning_score), (_, night, night_score) = results
+
+    assert morning['is_rainy'] is False and morning['is_sunny'] is True
+    assert morning['forecast_window'] == '10:00-12:00'
+    assert night['is_rainy'] is True
+    assert morning_score > night_score
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    test_row_factory_maps_columns_by_name()
+    test_scores_are_memoized()
+    test_memo_invalidated_by_forecast_change()
+    test_memo_invalidated_by_event_update()
+    test_hourly_window_used_for_event_time()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_shared_store_between_memos(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+イベントの保存（EventScraper.save_events_to_db）のテスト
+"""
+
+import sqlite3
+
+from event_changes import EventChanges
+from event_filter import EventFilter
+from event_model import connect_events_db
+from event_scraper import EventScraper
+from migrations import migrate
+from score_memo import ScoreMemo
+
+WEATHER = {'forecast': [{'date': '2999-08-01', 'condition': '晴れ', 'is_rainy': False, 'is_sunny': True}]}
+
+
+def scraped_event(**values):
+    event = {
+        'title': '市民まつり', 'description': '駅前で開催', 'date': '2999-08-01', 'time': '10:00',
+        'location': '守谷市役所', 'category': '祭り', 'is_indoor': False, 'is_free': True,
+        'has_parking': True, 'child_friendly': True, 'weather_dependent': True,
+        'rain_cancellation': None, 'source_url': 'https://example.jp/1', 'source_city': '守谷市役所'
+    }
+    event.update(values)
+    return event
+
+
+def create_scraper(db_path):
+    migrate(db_path, 'events')
+    scraper = EventScraper()
+    scraper.db_path = db_path
+    return scraper
+
+
+def test_rescrape_without_changes(tmp_path):
+    """内容が同じなら再取得しても行を更新せず、差分にも出ないこと"""
+    db_path = str(tmp_path / 'events.db')
+    scraper = create_scraper(db_path)
+    scraper.save_events_to_db([scraped_event()])
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE events SET updated_at = datetime('now', '-1 hour')")
+    (updated_at,) = conn.execute('SELECT updated_at FROM events').fetchone()
+    # 最後の更新より後の時点（cursor は境目の行を再送するため使わない）
+    (since,) = conn.execute("SELECT datetime('now', '-30 minutes')").fetchone()
+
+    scraper.save_events_to_db([scraped_event()])
+    assert scraper.stats['updated_events'] == 0
+    assert conn.execute('SELECT updated_at FROM events').fetchone() == (updated_at,)
+    assert EventChanges(db_path).since(since)['changed'] == []
+
+    scraper.save_events_to_db([scraped_event(description='雨天中止')])
+    assert scraper.stats['updated_events'] == 1
+    assert [event.description for event in EventChanges(db_path).since(since)['changed']] == ['雨天中止']
+    conn.close()
+
+
+def test_rescrape_keeps_score_memo(tmp_path):
+    """内容が同じ再取得では updated_at が変わらず、スコアのメモが使われ続けること"""
+    db_path = str(tmp_path / 'events.db')
+    scraper = create_scraper(db_path)
+    scraper.save_events_to_db([scraped_event()])
+    # 保存から時間が経ったことにする（updated_at は秒単位）
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE events SET updated_at = datetime('now', '-1 hour')")
+    conn.close()
+    memo = ScoreMemo()
+    event_filter = EventFilter(score_memo=memo)
+
+    def score():
+        conn = connect_events_db(db_path)
+        try:
+            event_filter.filter_events_by_weather(conn.execute('SELECT * FROM events').fetchall(), WEATHER)
+        finally:
+            conn.close()
+
+    score()
+    scraper.save_events_to_db([scraped_event()])
+    score()
+    assert (memo.stats()['hits'], memo.stats()['misses']) == (1, 1)
+
+    scraper.save_events_to_db([scraped_event(is_indoor=True)])
+    score()
+    assert memo.stats()['misses'] == 2
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_rescrape_without_changes(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_rescrape_keeps_score_memo(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+トリガーで更新するイベント集計のテスト
+"""
+
+import sqlite3
+
+from event_stats import EventStats, compute_stats, read_stats, verify_stats
+from migrations import migrate
+
+
+def create_events(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, source_city TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, is_active BOOLEAN DEFAULT 1
+        );
+        INSERT INTO events (title, source_city) VALUES ('導入前のイベント', '守谷市役所');
+        INSERT INTO events (title, source_city, created_at) VALUES ('古いイベント', '取手市役所', '2020-01-01 09:00:00');
+    ''')
+    conn.close()
+    # 既存のイベントはマイグレーションで集計される
+    migrate(db_path, 'events')
+    return sqlite3.connect(db_path)
+
+
+def test_counters_follow_changes(tmp_path):
+    """追加・更新・削除のたびに集計が全件集計と一致すること"""
+    conn = create_events(str(tmp_path / 'events.db'))
+    assert read_stats(conn) == compute_stats(conn)
+    assert read_stats(conn)['recent_events'] == 1
+
+    with conn:
+        conn.execute("INSERT INTO events (title, source_city) VALUES ('市民まつり', 'つくば市役所')")
+        conn.execute("INSERT INTO events (title, source_city, is_active) VALUES ('中止', NULL, 0)")
+        conn.execute("UPDATE events SET source_city = 'つくば市役所' WHERE title = '導入前のイベント'")
+        conn.execute("UPDATE events SET is_active = 0 WHERE title = '古いイベント'")
+    assert read_stats(conn) == compute_stats(conn)
+    assert read_stats(conn)['city_stats'] == {'つくば市役所': 2}
+
+    with conn:
+        conn.execute("DELETE FROM events WHERE is_active = 0")
+    stats = read_stats(conn)
+    assert stats == compute_stats(conn)
+    assert (stats['total_events'], stats['active_events'], stats['recent_events']) == (2, 2, 2)
+    assert verify_stats(conn) == {}
+
+
+def test_verify_repairs(tmp_path):
+    """食い違った集計を検出して作り直せること"""
+    db_path = str(tmp_path / 'events.db')
+    create_events(db_path).close()
+    event_stats = EventStats(db_path)
+    assert event_stats.summary()['active_events'] == 2
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE event_stats SET value = 99 WHERE key = 'active'")
+    conn.close()
+
+    assert event_stats.verify(repair=True) == {'active_events': (99, 2)}
+    assert event_stats.verify() == {}
+    assert event_stats.summary()['active_events'] == 2
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_counters_follow_changes(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_verify_repairs(Path(tmp))
+    print("✅ すべてのテストが成功しました")
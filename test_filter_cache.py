@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+フィルター結果キャッシュのテスト
+"""
+
+import json
+import sqlite3
+
+from cache_backend import LocalLRUCache
+from filter_cache import FilterResultCache, bump_generation, normalize_filters
+from migrations import migrate
+
+
+def make_db(db_path):
+    """サンプルのイベントDBを作成"""
+    migrate(db_path, 'events')
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO events (title, date, location, category, is_indoor, is_free) VALUES (?, ?, ?, ?, ?, ?)',
+        [('図書館講座', '2025-08-01', '守谷市立図書館', '講座', 1, 1),
+         ('花火大会', '2025-08-02', '取手緑地運動公園（取手市）', '祭り', 0, 1)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_normalized_filters_share_cache(tmp_path):
+    """表記の違う同じ条件はキャッシュを共有し、イベント更新で無効になること"""
+    db_path = str(tmp_path / 'events.db')
+    make_db(db_path)
+    cache = FilterResultCache(db_path, cache=LocalLRUCache().namespace('filter'))
+
+    first = cache.get_response(normalize_filters({'indoor_only': 'true', 'city': ' 守谷市 '}))
+    second = cache.get_response(normalize_filters({'indoor_only': '1', 'city': '守谷市', 'free_only': 'false'}))
+
+    assert first == second
+    assert [event['title'] for event in json.loads(first)['events']] == ['図書館講座']
+    assert cache.stats()['hits'] == 1
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE events SET is_indoor = 0 WHERE title = '図書館講座'")
+    bump_generation(conn)
+    conn.commit()
+    conn.close()
+
+    third = cache.get_response(normalize_filters({'indoor_only': 'true', 'city': '守谷市'}))
+    assert json.loads(third)['events'] == []
+
+
+def test_warm_popular_filters(tmp_path):
+    """よく使われる条件を温めた後はDBを読まずに返せること"""
+    db_path = str(tmp_path / 'events.db')
+    make_db(db_path)
+    cache = FilterResultCache(db_path, cache=LocalLRUCache().namespace('filter'))
+
+    # 条件なし + 単一条件5つ + カテゴリ2つ + 市区町村2つ
+    assert cache.warm(['守谷市', '取手市']) == 10
+
+    body = cache.get_response(normalize_filters({'category': '祭り'}))
+    assert [event['title'] for event in json.loads(body)['events']] == ['花火大会']
+    assert cache.stats()['misses'] == 0
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_normalized_filters_share_cache(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_warm_popular_filters(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+開催地の正規化と距離検索のテスト
+"""
+
+import sqlite3
+
+from gazetteer import normalize_location
+from geo_index import EventGeoIndex, distance_km
+from migrations import migrate
+
+
+def test_normalize_location():
+    """会場名・表記ゆれ・情報元の市から場所を特定できること"""
+    assert normalize_location('取手緑地運動公園（取手市）').place_id == 'toride/ryokuchi-park'
+    assert normalize_location('竜ヶ崎市 文化会館').place_id == 'ryugasaki/city-hall'
+    assert normalize_location('ｴｷｽﾎﾟｾﾝﾀｰ').place_id == 'tsukuba/expo-center'
+    # 'つくば市' と部分一致しないこと
+    assert normalize_location('', 'つくばみらい市役所').place_id == 'tsukubamirai/city-hall'
+    assert normalize_location('東京ビッグサイト') is None
+
+
+def test_nearby_events(tmp_path):
+    """半径内のアクティブなイベントだけが近い順に返ること"""
+    db_path = str(tmp_path / 'events.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY, title TEXT, date TEXT, time TEXT, location TEXT, source_city TEXT
+        )
+    ''')
+    conn.executemany('INSERT INTO events (title, date, location, source_city) VALUES (?, ?, ?, ?)', [
+        ('図書館講座', '2999-08-01', '守谷市立図書館', '守谷市役所'),
+        ('市民まつり', '2999-08-02', '', '取手市役所'),
+        ('古河花火大会', '2999-08-03', '古河市 渡良瀬川河川敷', '古河市役所'),
+        ('終わった催し', '2000-01-01', '守谷市立図書館', '守谷市役所'),
+        ('中止の催し', '2999-08-01', '守谷市立図書館', '守谷市役所')
+    ])
+    conn.commit()
+    conn.close()
+    # 既存のイベントの場所はマイグレーションで登録される
+    migrate(db_path, 'events')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE events SET is_active = 0 WHERE title = '中止の催し'")
+    conn.close()
+
+    # 守谷市役所の近く
+    results = EventGeoIndex(db_path).nearby(35.9514, 139.9755, 10)
+
+    assert [event.title for event, _, _ in results] == ['図書館講座', '市民まつり']
+    assert results[0][1].place_id == 'moriya/library'
+    assert results[0][2] < results[1][2] <= 10
+    assert round(distance_km(35.9514, 139.9755, 35.9112, 140.0504)) == 8
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    test_normalize_location()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_nearby_events(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+ログ設定（キュー経由の非同期出力）のテスト
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# preload_app の gunicorn と同じく、ログ設定の後に fork した子プロセスからログを出す
+FORK_SCRIPT = '''
+import logging
+import os
+import types
+
+import logger
+
+app = types.SimpleNamespace(config={'LOG_LEVEL': 'INFO'}, logger=logging.getLogger('app'))
+logger.setup_logger(app)
+logging.getLogger('master').info('親プロセス')
+
+pid = os.fork()
+if pid == 0:
+    logging.getLogger('worker').info('子プロセス')
+    logger.stop_listener()
+    os._exit(0)
+os.waitpid(pid, 0)
+logger.stop_listener()
+'''
+
+
+def test_forked_child_logs_reach_file(tmp_path):
+    """fork した子プロセスのログもファイルに書き出されること"""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', FORK_SCRIPT], cwd=tmp_path, env=env, check=True,
+                   capture_output=True, timeout=30)
+
+    with open(tmp_path / 'logs' / 'app.log', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record['message'] for record in records) == ['子プロセス', '親プロセス']
+    child = next(record for record in records if record['logger'] == 'worker')
+    assert child['process'] != next(record for record in records if record['logger'] == 'master')['process']
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_forked_child_logs_reach_file(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+スキーマのマイグレーションのテスト
+"""
+
+import sqlite3
+
+from migrations import MIGRATIONS, migrate, schema_version
+
+
+def test_legacy_events_db(tmp_path):
+    """app.init_db で作られた古い events テーブルを作り直し、行を残すこと"""
+    db_path = str(tmp_path / 'events.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
+            date TEXT, location TEXT, category TEXT, is_active BOOLEAN DEFAULT 1
+        );
+        INSERT INTO events (title, date, location) VALUES ('図書館講座', '2999-08-01', '守谷市立図書館');
+        CREATE TABLE weather_cache (city TEXT PRIMARY KEY, data TEXT);
+    ''')
+    conn.close()
+
+    assert migrate(db_path, 'events') == len(MIGRATIONS['events'])
+    # 2回目は何もしない
+    assert migrate(db_path, 'events') == len(MIGRATIONS['events'])
+
+    conn = sqlite3.connect(db_path)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(events)')]
+    assert 'source_city' in columns and 'updated_at' in columns
+    assert conn.execute('SELECT id, title FROM events').fetchall() == [(1, '図書館講座')]
+    assert conn.execute('SELECT place_id FROM event_places').fetchall() == [('moriya/library',)]
+    assert conn.execute("SELECT value FROM event_stats WHERE key = 'total'").fetchone() == (1,)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'weather_forecast' in tables and 'weather_cache' not in tables
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    conn.close()
+
+
+def test_content_tables_consolidated(tmp_path):
+    """種類ごとのテーブルの行は重複を除いて content_items に移ること"""
+    db_path = str(tmp_path / 'content.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE food_info (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT, location TEXT,
+            category TEXT, city TEXT, source_url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO food_info (title, description, source_url) VALUES ('新店舗', '古い説明', 'https://example.jp/1');
+        INSERT INTO food_info (title, description, source_url) VALUES ('新店舗', '新しい説明', 'https://example.jp/1');
+    ''')
+    conn.close()
+
+    assert schema_version(db_path) == 0
+    migrate(db_path, 'content')
+    assert schema_version(db_path) == len(MIGRATIONS['content'])
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT kind, title, description FROM content_items').fetchall() == [
+        ('food_info', '新店舗', '新しい説明')
+    ]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'food_info' not in tables and 'seasonal_events' not in tables
+    conn.close()
+
+
+def test_restaurant_columns_unified(tmp_path):
+    """飲食店テーブルは各版のスクレイパーの列をすべて持つこと"""
+    db_path = str(tmp_path / 'restaurants.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE restaurants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, description TEXT,
+            city TEXT NOT NULL, address TEXT, phone TEXT, category TEXT, opening_date TEXT,
+            source_url TEXT, source_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO restaurants (name, city) VALUES ('守谷のパン屋', '守谷市');
+    ''')
+    conn.close()
+
+    migrate(db_path, 'restaurants')
+
+    conn = sqlite3.connect(db_path)
+    # city が無い版（location に保存する）の INSERT も通る
+    conn.execute("INSERT INTO restaurants (name, location) VALUES ('取手のカフェ', '取手市')")
+    rows = conn.execute('SELECT name, city, location, is_active FROM restaurants ORDER BY id').fetchall()
+    assert rows == [('守谷のパン屋', '守谷市', None, 1), ('取手のカフェ', None, '取手市', 1)]
+    conn.close()
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_legacy_events_db, test_content_tables_consolidated, test_restaurant_columns_unified):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ すべてのテストが成功しました")
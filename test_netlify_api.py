@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Netlify Function（netlify/functions/api.py）のテスト
+"""
+
+import importlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'netlify', 'functions'))
+
+import api  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+def load_api(db_path):
+    """指定したDBを読む新しい api モジュール（コールドスタート相当）"""
+    module = importlib.reload(api)
+    module.DB_PATH = str(db_path)
+    return module
+
+
+def call(module, path, query=None):
+    response = module.handler({'httpMethod': 'GET', 'path': '/api/' + path, 'queryStringParameters': query}, None)
+    assert response['statusCode'] == 200, response['body']
+    return json.loads(response['body'])
+
+
+def test_warm_responses(tmp_path):
+    """2回目以降は同じ接続と組み立て済みのレスポンスを使うこと"""
+    db_path = tmp_path / 'events.db'
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY, title TEXT, description TEXT, date TEXT, time TEXT,
+            location TEXT, category TEXT, is_indoor BOOLEAN, is_free BOOLEAN, has_parking BOOLEAN,
+            child_friendly BOOLEAN, weather_dependent BOOLEAN, rain_cancellation TEXT,
+            source_url TEXT, source_city TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        );
+        INSERT INTO events (title, date, is_indoor, source_city) VALUES ('市民まつり', '2099-08-01', 0, '守谷市役所');
+        INSERT INTO events (title, date, is_active, source_city) VALUES ('終了した講座', '2000-01-01', 0, '守谷市役所');
+    ''')
+    conn.commit()
+    conn.close()
+
+    module = load_api(db_path)
+    first = call(module, 'events')
+    assert first['count'] == 1
+    assert first['events'][0]['title'] == '市民まつり'
+    assert first['events'][0]['is_indoor'] is False
+    assert call(module, 'stats')['city_stats'] == {'守谷市役所': 1}
+
+    connection = module.get_connection()
+    second = call(module, 'events')
+    assert module.get_connection() is connection
+    assert second['events'] == first['events']
+    assert call(module, 'debug')['debug_info']['cached_responses'] == ['events', 'stats']
+
+
+    # timestamp が違っても ETag は同じで、If-None-Match が一致すれば本文を送らない
+    response = module.handler({'httpMethod': 'GET', 'path': '/api/events'}, None)
+    etag = response['headers']['ETag']
+    assert module.handler({'httpMethod': 'GET', 'path': '/api/events'}, None)['headers']['ETag'] == etag
+    conditional = module.handler({'httpMethod': 'GET', 'path': '/api/events',
+                                  'headers': {'If-None-Match': etag}}, None)
+    assert (conditional['statusCode'], conditional['body']) == (304, '')
+
+
+def test_events_since(tmp_path):
+    """since= には変更・非アクティブ化・削除したイベントだけを返すこと"""
+    db_path = str(tmp_path / 'events.db')
+    migrate(db_path, 'events')
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("INSERT INTO events (title, date, updated_at) VALUES ('古い講座', '2099-01-01', '2000-01-01 00:00:00')")
+        conn.execute("INSERT INTO events (title, date) VALUES ('市民まつり', '2099-08-01')")
+        conn.execute("INSERT INTO events (title, date, is_active) VALUES ('中止の催し', '2099-09-01', 0)")
+        conn.execute("INSERT INTO events (title, date) VALUES ('削除した催し', '2099-10-01')")
+        conn.execute("DELETE FROM events WHERE title = '削除した催し'")
+    conn.close()
+
+    module = load_api(db_path)
+    full = call(module, 'events')
+    assert full['full'] is True and full['count'] == 2
+
+    delta = call(module, 'events', {'since': full['cursor']})
+    assert delta['full'] is False
+    assert [event['title'] for event in delta['events']] == ['市民まつり']
+    assert sorted(delta['removed']) == [3, 4]
+
+    # 記録の保持期間より古い since は全件
+    assert call(module, 'events', {'since': '2000-01-01 00:00:00'})['full'] is True
+    response = module.handler({'httpMethod': 'GET', 'path': '/api/events',
+                               'queryStringParameters': {'since': 'yesterday'}}, None)
+    assert response['statusCode'] == 400
+
+
+def test_weather_cache(tmp_path):
+    """取得できた都市だけがキャッシュされ、期限内は再取得しないこと"""
+    module = load_api(tmp_path / 'events.db')
+    fetched = []
+
+    def fetch(city):
+        fetched.append(city['name'])
+        if city['name'] == '取手市':
+            return None
+        return {'temperature': 20, 'condition': '晴れ', 'humidity': 50, 'rain_probability': 0, 'icon': '113'}
+
+    module.fetch_city_weather = fetch
+    weather = call(module, 'weather')['weather']
+    assert list(weather) == [city['name'] for city in module.WEATHER_CITIES]
+    assert weather['取手市']['temperature'] == '--'
+    assert len(fetched) == 4
+
+    call(module, 'weather')
+    assert fetched[4:] == ['取手市']
+
+
+def test_weather_deadline(tmp_path):
+    """遅い都市を待たずに期限で返し、前回の値で補うこと"""
+    module = load_api(tmp_path / 'events.db')
+    module.WEATHER_DEADLINE = 0.2
+    release = threading.Event()
+    sunny = {'temperature': 20, 'condition': '晴れ', 'humidity': 50, 'rain_probability': 0, 'icon': '113'}
+
+    def fetch(city):
+        if city['name'] == 'つくば市':
+            release.wait(5)
+            return dict(sunny, temperature=25)
+        return sunny
+
+    module.fetch_city_weather = fetch
+    # 期限切れの前回の値
+    module._weather_cache['つくば市'] = (0, dict(sunny, temperature=18))
+
+    start = time.monotonic()
+    weather = call(module, 'weather')['weather']
+    assert time.monotonic() - start < 1
+    assert weather['つくば市'] == dict(sunny, temperature=18, stale=True)
+    assert weather['守谷市'] == sunny
+
+    # 期限後に完了した取得は次の呼び出しで使われる
+    release.set()
+    module._weather_pending['つくば市'].result(timeout=5)
+    assert call(module, 'weather')['weather']['つくば市']['temperature'] == 25
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_warm_responses(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_events_since(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_weather_cache(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_weather_deadline(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+/readyz の判定のテスト
+"""
+
+import sqlite3
+
+from readiness import ReadinessMonitor
+
+
+def test_readiness_signals(tmp_path):
+    """DBが読めれば準備完了、鮮度の上限を超えた項目は degraded になること"""
+    db_path = str(tmp_path / 'events.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE events (id INTEGER PRIMARY KEY, title TEXT);
+        CREATE TABLE scraping_log (
+            id INTEGER PRIMARY KEY, run_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            events_found INTEGER, errors INTEGER
+        );
+        INSERT INTO scraping_log (run_date, events_found, errors) VALUES (datetime('now', '-1 hour'), 10, 0);
+        INSERT INTO scraping_log (events_found, errors) VALUES (0, 3);
+    ''')
+    conn.commit()
+    conn.close()
+
+    monitor = ReadinessMonitor(db_path, interval=60)
+    try:
+        monitor.refresh()
+        body, ready = monitor.status()
+        assert ready
+        assert body['status'] == 'degraded'
+        assert body['checks']['database']['ok']
+        # 失敗した実行は数えない
+        assert 3500 < body['checks']['scrape']['age_seconds'] < 3700
+        assert body['checks']['weather']['age_seconds'] is None
+    finally:
+        monitor.stop()
+
+    # events が読めないDB
+    broken = ReadinessMonitor(str(tmp_path / 'empty.db'), interval=60)
+    try:
+        broken.refresh()
+        body, ready = broken.status()
+        assert not ready
+        assert body['status'] == 'not_ready'
+        assert 'no such table' in body['checks']['database']['error']
+    finally:
+        broken.stop()
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_readiness_signals(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+データ保持（アーカイブと削除）のテスト
+"""
+
+import sqlite3
+
+from config import Config
+from filter_cache import get_generation
+from migrations import migrate
+from retention import Archive, default_policies, run_retention
+
+
+class Settings(Config):
+    """一時ディレクトリのDBを使う設定"""
+
+
+def test_expired_rows_are_archived_and_deleted(tmp_path):
+    """期限切れの行だけがアーカイブに移り、関連する行も削除されること"""
+    Settings.DATABASE_URL = str(tmp_path / 'events.db')
+    Settings.CONTENT_DATABASE_URL = str(tmp_path / 'content.db')
+    archive_path = str(tmp_path / 'archive.db')
+    migrate(Settings.DATABASE_URL, 'events')
+    migrate(Settings.CONTENT_DATABASE_URL, 'content')
+    migrate(archive_path, 'archive')
+
+    conn = sqlite3.connect(Settings.DATABASE_URL)
+    conn.executescript('''
+        INSERT INTO events (title, date, is_active) VALUES ('昔の花火大会', '2000-08-01', 0);
+        INSERT INTO events (title, date, is_active) VALUES ('昔の講座（有効のまま）', '2000-08-01', 1);
+        INSERT INTO events (title, date, is_active) VALUES ('来月の講座', date('now', '+30 days'), 1);
+        INSERT INTO event_places (event_id, place_id) VALUES (1, 'toride/ryokuchi-park'), (3, 'moriya/library');
+    ''')
+    conn.close()
+
+    conn = sqlite3.connect(Settings.CONTENT_DATABASE_URL)
+    conn.executescript('''
+        INSERT INTO content_items (kind, title, content_hash, updated_at)
+        VALUES ('food_info', '閉店した店', '', '2000-01-01 00:00:00');
+        INSERT INTO content_items (kind, title, content_hash, updated_at)
+        VALUES ('food_info', '新しい店', '', CURRENT_TIMESTAMP);
+    ''')
+    conn.close()
+
+    policies = default_policies(Settings)
+    assert run_retention(policies, archive_path, dry_run=True)['events.db.events'] == 1
+
+    results = run_retention(policies, archive_path, batch_size=1)
+    assert results['events.db.events'] == 1
+    assert results['content.db.content_items'] == 1
+
+    conn = sqlite3.connect(Settings.DATABASE_URL)
+    assert [row[0] for row in conn.execute('SELECT id FROM events')] == [2, 3]
+    assert [row[0] for row in conn.execute('SELECT event_id FROM event_places')] == [3]
+    assert get_generation(conn) == 1
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    conn.close()
+
+    archive = Archive(archive_path)
+    assert archive.get(Settings.DATABASE_URL, 'events', 1)['title'] == '昔の花火大会'
+    assert archive.get(Settings.CONTENT_DATABASE_URL, 'content_items', 1)['title'] == '閉店した店'
+
+    # 2回目は何も削除しない
+    assert set(run_retention(policies, archive_path).values()) == {0}
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_expired_rows_are_archived_and_deleted(Path(tmp))
+    print("✅ すべてのテストが成功しました")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+バックグラウンドタスクのテスト（ブローカーを使わずにその場で実行する）
+"""
+
+import pytest
+
+celery = pytest.importorskip('celery')
+
+import tasks  # noqa: E402
+
+
+class FakeScraper:
+    """ネットワークに接続しないスクレイパー"""
+
+    saved = []
+    logged = []
+
+    def __init__(self):
+        self.sources = {
+            'moriya_city': {'url': 'https://www.city.moriya.ibaraki.jp/', 'name': '守谷市役所'},
+            'toride_city': {'url': 'https://www.city.toride.ibaraki.jp/', 'name': '取手市役所'}
+        }
+        self.stats = {'total_events': 0, 'new_events': 0, 'updated_events': 0, 'errors': 0}
+
+    def scrape_city_website(self, source_id, source_info, limit=None):
+        return [{'title': f"{source_info['name']}のイベント"}]
+
+    def save_events_to_db(self, events):
+        FakeScraper.saved.extend(events)
+        self.stats['total_events'] += len(events)
+        self.stats['new_events'] += len(events)
+
+    def log_scraping_run(self, duration):
+        FakeScraper.logged.append(self.stats['total_events'])
+
+    def warm_filter_cache(self):
+        pass
+
+
+class FailingScraper(FakeScraper):
+    """取手市のサイトだけ取得に失敗するスクレイパー"""
+
+    attempts = 0
+
+    def scrape_city_website(self, source_id, source_info, limit=None):
+        if source_id == 'toride_city':
+            FailingScraper.attempts += 1
+            self.stats['errors'] += 1
+            return []
+        return super().scrape_city_website(source_id, source_info, limit)
+
+    def log_scraping_run(self, duration):
+        FakeScraper.logged.append((self.stats['total_events'], self.stats['errors']))
+
+
+@pytest.fixture
+def eager(monkeypatch):
+    tasks.celery.conf.update(task_always_eager=True, broker_url='memory://', result_backend='cache+memory://')
+    monkeypatch.setattr(tasks, 'EventScraper', FakeScraper)
+    # その場での実行では再試行がすぐに行われるため、開始の間隔の制限は個別に確認する
+    monkeypatch.setattr(tasks.Config, 'SCRAPE_HOST_INTERVAL', 0)
+    FakeScraper.saved = []
+    FakeScraper.logged = []
+    tasks.task_locks.clear()
+
+
+def test_scrape_all_cities(eager):
+    """都市ごとのタスクの結果がまとめて記録されること"""
+    assert tasks.scrape_all_cities.delay().get() == 2
+
+    assert len(FakeScraper.saved) == 2
+    assert FakeScraper.logged == [2]
+
+
+def test_failed_city_still_finishes(eager, monkeypatch):
+    """1都市が再試行しても失敗したときも、エラーとして数えて finish_scraping が実行されること"""
+    monkeypatch.setattr(tasks, 'EventScraper', FailingScraper)
+    # 例外をそのまま出す設定では、その場での実行（eager）の再試行が Retry 例外になってしまう
+    monkeypatch.setitem(tasks.celery.conf, 'task_eager_propagates', False)
+    FailingScraper.attempts = 0
+
+    assert tasks.scrape_all_cities.delay().get() == 2
+
+    assert FailingScraper.attempts == tasks.scrape_city.max_retries + 1
+    assert FakeScraper.logged == [(1, 1)]
+
+
+def test_locks_prevent_overlap(eager):
+    """実行中のタスク・上限に達したホストは重ねて実行されないこと"""
+    with tasks.task_lock('scrape_city:moriya_city'):
+        assert tasks.scrape_city.delay('moriya_city').get() is None
+        with pytest.raises(tasks.TaskAlreadyRunning):
+            with tasks.task_lock('scrape_city:moriya_city'):
+                pass
+
+    with tasks.host_slot('https://www.city.toride.ibaraki.jp/', limit=1):
+        with pytest.raises(tasks.HostBusy):
+            with tasks.host_slot('https://www.city.toride.ibaraki.jp/event.html', limit=1):
+                pass
+
+    assert tasks.scrape_city.delay('moriya_city').get()['new_events'] == 1
+
+    # 開始の間隔は共有キャッシュで数えるので、別のワーカーからの開始も待たされる
+    tasks.host_rate('https://www.city.toride.ibaraki.jp/', interval=60)
+    with pytest.raises(tasks.HostBusy):
+        tasks.host_rate('https://www.city.toride.ibaraki.jp/event.html', interval=60)
+    tasks.host_rate('https://www.city.moriya.ibaraki.jp/', interval=60)
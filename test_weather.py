@@ -1,4 +1,8 @@
 #!/usr/bin/env python3
+from migrations import migrate
+from weather_cache import ForecastCache
+from weather_providers import WeatherProvider
+from weather_refresher import ForecastPrefetcher
 from weather_simple import WeatherSimple
 
 def test_weather():
@@ -35,5 +39,51 @@ def test_weather():
     except Exception as e:
         print(f"❌ エラー: {e}")
 
+class FakeProvider(WeatherProvider):
+    """外部APIの代わりに固定の予報を返す"""
+
+    name = 'fake'
+
+    def __init__(self):
+        super().__init__('dummy')
+
+    def fetch_forecast(self, query, days=3):
+        if query.startswith('Toride'):
+            return None
+        return {
+            'forecast': [{'date': '2025-08-01', 'condition': '晴れ', 'temp_max': 30.5, 'temp_min': 22,
+                          'humidity': 60, 'precipitation': 0, 'is_rainy': False, 'is_sunny': True}],
+            'current': {'temp': 28, 'condition': '晴れ', 'humidity': 55}
+        }
+
+    def fetch_current(self, query):
+        return None
+
+
+def test_forecast_prefetch_and_read(tmp_path):
+    """バックグラウンドで取得した予報をリクエスト側が共有キャッシュから読めること"""
+    migrate(str(tmp_path / 'weather.db'), 'weather')
+    cache = ForecastCache(str(tmp_path / 'weather.db'), ttl=3600)
+    queries = {'つくば市': 'Tsukuba,Japan', '取手市': 'Toride,Japan'}
+    prefetcher = ForecastPrefetcher(list(queries), queries,
+                                    weather_client=WeatherSimple(cache=cache, provider=FakeProvider()))
+
+    assert prefetcher.refresh() == ['つくば市']
+    prefetcher.refresh()  # 再取得しても古い予報は残らない
+
+    reader = WeatherSimple(cache=cache, provider=FakeProvider())
+    forecast = reader.get_weather_forecast('つくば市')
+    assert forecast['location'] == 'つくば市'
+    assert forecast['forecast'] == FakeProvider().fetch_forecast('Tsukuba')['forecast']
+    assert forecast['current']['temp'] == 28
+    # 取得できていない都市はフォールバック
+    assert reader.get_weather_forecast('取手市')['location'] == 'つくばみらい市'
+
+    freshness = prefetcher.freshness()
+    assert freshness['cities']['つくば市']['fresh'] is True
+    assert freshness['cities']['取手市']['fresh'] is False
+    assert freshness['fresh'] is False
+
+
 if __name__ == '__main__':
     test_weather() 
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+天気予報の共有キャッシュ
+
+バックグラウンドの取得処理（weather_refresher.ForecastPrefetcher）だけが書き込み、
+リクエスト処理は読むだけにする。SQLiteに置くため全ワーカーから同じ値が見える。
+
+予報は JSON ではなく型付きの列で (provider, city, fetched_at, forecast_date) ごとに1行保存する。
+主キーの先頭が (provider, city, fetched_at) なので、最新の予報の読み出しは主キーの範囲検索だけで済む。
+新しい予報を書き込むと、同じ都市の古い予報と保持期間を過ぎた行は削除される。
+1時間ごとの予報は都市ごとに1行、時間オフセットを添字にした配列をBLOBで保存する。
+テーブルは migrations.py で作成する（WEATHER_CACHE_DB が events.db なら events のマイグレーション、
+別のファイルなら weather のマイグレーション）。
+"""
+
+import os
+import sqlite3
+import time
+
+from hourly_forecast import HourlyForecast
+
+# 予報1日分の列（辞書のキーと同じ）
+FORECAST_COLUMNS = ('condition', 'temp_max', 'temp_min', 'humidity', 'precipitation', 'is_rainy', 'is_sunny')
+CURRENT_COLUMNS = ('temp', 'condition', 'humidity')
+
+# 予報キャッシュを置くDB（既定はイベントと同じファイル）
+WEATHER_CACHE_DB = os.getenv('WEATHER_CACHE_DB', 'events.db')
+
+WEATHER_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS weather_forecast (
+        provider TEXT NOT NULL,
+        city TEXT NOT NULL,
+        fetched_at INTEGER NOT NULL,
+        forecast_date TEXT NOT NULL,
+        condition TEXT,
+        temp_max REAL,
+        temp_min REAL,
+        humidity INTEGER,
+        precipitation REAL,
+        is_rainy INTEGER NOT NULL DEFAULT 0,
+        is_sunny INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (provider, city, fetched_at, forecast_date)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_weather_forecast_fetched_at ON weather_forecast (fetched_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS weather_current (
+        provider TEXT NOT NULL,
+        city TEXT NOT NULL,
+        fetched_at INTEGER NOT NULL,
+        temp REAL,
+        condition TEXT,
+        humidity INTEGER,
+        PRIMARY KEY (provider, city)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS weather_hourly (
+        provider TEXT NOT NULL,
+        city TEXT NOT NULL,
+        fetched_at INTEGER NOT NULL,
+        start_date TEXT NOT NULL,
+        flags BLOB NOT NULL,
+        precipitation BLOB NOT NULL,
+        PRIMARY KEY (provider, city)
+    ) WITHOUT ROWID
+    ''',
+)
+
+# 以前の形式のキャッシュ（中身は再取得できるため、マイグレーションで移行せずに削除する）
+LEGACY_TABLES = ('weather_forecast_cache', 'weather_cache')
+
+
+def create_weather_tables(conn):
+    """予報キャッシュのテーブルを作成（migrations.py から呼ばれる）"""
+    for statement in WEATHER_SCHEMA:
+        conn.execute(statement)
+
+
+class ForecastCache:
+    """都市ごとの天気予報キャッシュ"""
+
+    def __init__(self, db_path='events.db', ttl=3600, max_age=None):
+        self.db_path = db_path
+        self.ttl = ttl
+        # 取得が止まった都市の行もこの期間を過ぎたら削除する
+        self.max_age = max_age or ttl * 24
+
+    def _connect(self):
+        # テーブルは migrations.py で作成している
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def get(self, city, provider):
+        """都市の最新の予報と取得時刻(UNIX時間)を取得（無ければ None）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'''
+                SELECT fetched_at, forecast_date, {', '.join(FORECAST_COLUMNS)}
+                FROM weather_forecast
+                WHERE provider = ? AND city = ? AND fetched_at = (
+                    SELECT MAX(fetched_at) FROM weather_forecast WHERE provider = ? AND city = ?
+                )
+                ORDER BY forecast_date
+            ''', (provider, city, provider, city)).fetchall()
+            current = conn.execute(f'''
+                SELECT {', '.join(CURRENT_COLUMNS)} FROM weather_current
+                WHERE provider = ? AND city = ?
+            ''', (provider, city)).fetchone()
+        finally:
+            conn.close()
+
+        if not rows:
+            return None
+
+        forecast = []
+        for row in rows:
+            day = dict(zip(FORECAST_COLUMNS, row[2:]))
+            day['date'] = row[1]
+            day['is_rainy'] = bool(day['is_rainy'])
+            day['is_sunny'] = bool(day['is_sunny'])
+            forecast.append(day)
+
+        weather_data = {
+            'location': city,
+            'provider': provider,
+            'forecast': forecast,
+            'current': dict(zip(CURRENT_COLUMNS, current)) if current else {}
+        }
+        return weather_data, rows[0][0]
+
+    def put(self, city, provider, weather_data):
+        """都市の予報を保存し、古い行を削除"""
+        fetched_at = int(time.time())
+        forecast_rows = [
+            (provider, city, fetched_at, day['date'], *[day.get(column) for column in FORECAST_COLUMNS])
+            for day in weather_data.get('forecast', [])
+        ]
+        current = weather_data.get('current')
+        hourly = weather_data.get('hourly')
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(f'''
+                    INSERT OR REPLACE INTO weather_forecast
+                        (provider, city, fetched_at, forecast_date, {', '.join(FORECAST_COLUMNS)})
+                    VALUES (?, ?, ?, ?, {', '.join('?' * len(FORECAST_COLUMNS))})
+                ''', forecast_rows)
+                if current:
+                    conn.execute(f'''
+                        INSERT OR REPLACE INTO weather_current
+                            (provider, city, fetched_at, {', '.join(CURRENT_COLUMNS)})
+                        VALUES (?, ?, ?, {', '.join('?' * len(CURRENT_COLUMNS))})
+                    ''', (provider, city, fetched_at, *[current.get(column) for column in CURRENT_COLUMNS]))
+                if hourly is not None:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO weather_hourly
+                            (provider, city, fetched_at, start_date, flags, precipitation)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (provider, city, fetched_at, hourly.start_date, *hourly.to_blobs()))
+
+                # 同じ都市の古い予報と、保持期間を過ぎた行を削除
+                conn.execute(
+                    'DELETE FROM weather_forecast WHERE provider = ? AND city = ? AND fetched_at < ?',
+                    (provider, city, fetched_at)
+                )
+                self._evict_stale(conn, fetched_at - self.max_age)
+        finally:
+            conn.close()
+
+    def _evict_stale(self, conn, cutoff):
+        conn.execute('DELETE FROM weather_forecast WHERE fetched_at < ?', (cutoff,))
+        conn.execute('DELETE FROM weather_current WHERE fetched_at < ?', (cutoff,))
+        conn.execute('DELETE FROM weather_hourly WHERE fetched_at < ?', (cutoff,))
+
+    def get_hourly(self, cities, provider):
+        """都市ごとの1時間ごとの予報を取得（{都市名: HourlyForecast}）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT city, start_date, flags, precipitation FROM weather_hourly
+                WHERE provider = ?
+            ''', (provider,)).fetchall()
+        finally:
+            conn.close()
+
+        cities = set(cities)
+        return {
+            city: HourlyForecast.from_blobs(start_date, flags, precipitation)
+            for city, start_date, flags, precipitation in rows
+            if city in cities
+        }
+
+    def is_fresh(self, fetched_at):
+        """有効期限内かどうか"""
+        return time.time() - fetched_at < self.ttl
+
+    def freshness(self, cities, provider):
+        """都市ごとのキャッシュの鮮度（/health 用）"""
+        conn = self._connect()
+        try:
+            fetched = dict(conn.execute('''
+                SELECT city, MAX(fetched_at) FROM weather_forecast
+                WHERE provider = ? GROUP BY city
+            ''', (provider,)).fetchall())
+        finally:
+            conn.close()
+
+        now = time.time()
+        result = {}
+        for city in cities:
+            fetched_at = fetched.get(city)
+            if fetched_at is None:
+                result[city] = {'age_seconds': None, 'fresh': False}
+            else:
+                age = now - fetched_at
+                result[city] = {'age_seconds': round(age), 'fresh': age < self.ttl}
+
+        return {
+            'provider': provider,
+            'ttl': self.ttl,
+            'fresh': all(entry['fresh'] for entry in result.values()),
+            'cities': result
+        }
+
+
+default_forecast_cache = ForecastCache(
+    WEATHER_CACHE_DB,
+    ttl=int(os.getenv('WEATHER_CACHE_DURATION', '3600'))
+)
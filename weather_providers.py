@@ -0,0 +1,319 @@
+"""
+天気データの取得元（プロバイダー）
+
+どのプロバイダーも同じ形式を返すため、キャッシュや画面側は取得元を意識しない。
+
+- fetch_forecast(query): 日ごとの予報、1時間ごとの予報、現在の天気
+    {'forecast': [{'date', 'condition', 'temp_max', 'temp_min', 'humidity',
+                   'precipitation', 'is_rainy', 'is_sunny'}, ...],
+     'hourly': HourlyForecast,
+     'current': {'temp', 'condition', 'humidity'}}
+- fetch_current(query): 地域別表示用の現在の天気
+    {'temperature', 'condition', 'humidity', 'rain_probability', 'icon'}
+
+取得できなかった場合はどちらも None を返す。
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import requests
+
+import metrics
+from hourly_forecast import HourlyForecast
+
+logger = logging.getLogger(__name__)
+
+RAINY_WORDS = ('雨', 'rain', 'shower', 'storm')
+SUNNY_WORDS = ('晴', 'sunny', 'clear')
+
+
+def is_rainy_condition(condition):
+    """天気の説明文が雨を表すか"""
+    condition = condition.lower()
+    return any(word in condition for word in RAINY_WORDS)
+
+
+def is_sunny_condition(condition):
+    """天気の説明文が晴れを表すか"""
+    condition = condition.lower()
+    return any(word in condition for word in SUNNY_WORDS)
+
+
+class WeatherProvider(ABC):
+    """天気プロバイダーの基底クラス"""
+
+    name = None
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+    @abstractmethod
+    def fetch_forecast(self, query, days=3):
+        """日ごとの予報を取得"""
+
+    @abstractmethod
+    def fetch_current(self, query):
+        """現在の天気を取得"""
+
+    def fetch_current_many(self, queries, use_bulk=False, max_workers=8):
+        """複数都市の現在の天気を並行して取得
+
+        queries は {都市名: 検索クエリ}。取得できなかった都市は結果に含めない。
+        """
+        results = {}
+        if not queries:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as executor:
+            futures = {executor.submit(self.fetch_current, query): name for name, query in queries.items()}
+            for future in as_completed(futures):
+                current = future.result()
+                if current is not None:
+                    results[futures[future]] = current
+        return results
+
+    def _get_json(self, url, params, timeout=5):
+        """GETしてJSONを返す（失敗時は None）"""
+        try:
+            with metrics.time_upstream(self.name):
+                response = requests.get(url, params=params, timeout=timeout)
+            if response.status_code != 200:
+                logger.warning("天気APIエラー: %s %s %s", self.name, response.status_code, response.text[:200])
+                return None
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            # 例外メッセージのURLにはAPIキーが含まれるため伏せる
+            logger.warning("天気APIリクエストエラー: %s", str(e).replace(self.api_key, '***'))
+        except ValueError as e:
+            logger.warning("天気APIのレスポンスが不正です: %s %s", self.name, e)
+        return None
+
+
+class WeatherApiComProvider(WeatherProvider):
+    """WeatherAPI.com"""
+
+    name = 'weatherapi'
+    base_url = 'http://api.weatherapi.com/v1'
+
+    def __init__(self, api_key=None):
+        super().__init__(api_key or os.getenv('WEATHERAPI_KEY', '88ed0e701cfc4c7fb0d13301253107'))
+
+    def fetch_forecast(self, query, days=3):
+        data = self._get_json(
+            f"{self.base_url}/forecast.json",
+            {'key': self.api_key, 'q': query, 'days': days, 'lang': 'ja'}
+        )
+        if data is None:
+            return None
+
+        try:
+            forecast = []
+            hours = []
+            for day in data['forecast']['forecastday']:
+                for hour in day.get('hour', []):
+                    text = hour['condition']['text']
+                    precip = hour.get('precip_mm', 0)
+                    hours.append((
+                        hour['time'],
+                        bool(hour.get('will_it_rain')) or precip >= 0.5 or is_rainy_condition(text),
+                        is_sunny_condition(text),
+                        precip
+                    ))
+                day_data = day['day']
+                condition = day_data['condition']['text']
+                forecast.append({
+                    'date': day['date'],
+                    'condition': condition,
+                    'temp_max': day_data['maxtemp_c'],
+                    'temp_min': day_data['mintemp_c'],
+                    'humidity': day_data['avghumidity'],
+                    'precipitation': day_data['totalprecip_mm'],
+                    'is_rainy': is_rainy_condition(condition),
+                    'is_sunny': is_sunny_condition(condition)
+                })
+            current = data['current']
+            return {
+                'forecast': forecast,
+                'hourly': HourlyForecast.from_hours(hours),
+                'current': {
+                    'temp': current['temp_c'],
+                    'condition': current['condition']['text'],
+                    'humidity': current['humidity']
+                }
+            }
+        except (KeyError, TypeError) as e:
+            logger.warning("APIレスポンス構造が期待と異なります: %s %s", query, e)
+            return None
+
+    def fetch_current(self, query):
+        data = self._get_json(
+            f"{self.base_url}/current.json",
+            {'key': self.api_key, 'q': query, 'aqi': 'no'}
+        )
+        if data is None:
+            return None
+        try:
+            return self._process_current(data['current'])
+        except (KeyError, TypeError) as e:
+            logger.warning("現在の天気のレスポンスが不正です: %s %s", query, e)
+            return None
+
+    def fetch_current_many(self, queries, use_bulk=False, max_workers=8):
+        """Bulkリクエストが有効なら1回で取得し、失敗した都市だけ個別に取得"""
+        results = self._fetch_current_bulk(queries) if use_bulk else {}
+        remaining = {name: query for name, query in queries.items() if name not in results}
+        results.update(super().fetch_current_many(remaining, max_workers=max_workers))
+        return results
+
+    def _fetch_current_bulk(self, queries):
+        """Bulkリクエスト（有料プラン）で複数都市の現在の天気を取得"""
+        payload = {
+            'locations': [{'q': query, 'custom_id': name} for name, query in queries.items()]
+        }
+        try:
+            with metrics.time_upstream('weatherapi_bulk'):
+                response = requests.post(
+                    f"{self.base_url}/current.json",
+                    params={'key': self.api_key, 'q': 'bulk', 'aqi': 'no'},
+                    json=payload,
+                    timeout=10
+                )
+            if response.status_code != 200:
+                logger.warning("Bulkリクエストエラー: %s %s", response.status_code, response.text[:200])
+                return {}
+
+            results = {}
+            for item in response.json().get('bulk', []):
+                query = item.get('query', {})
+                if query.get('custom_id') in queries and 'current' in query:
+                    results[query['custom_id']] = self._process_current(query['current'])
+            return results
+        except requests.exceptions.RequestException as e:
+            logger.warning("Bulkリクエストエラー: %s", str(e).replace(self.api_key, '***'))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Bulkレスポンスが不正です: %s", e)
+        return {}
+
+    def _process_current(self, current):
+        precip = current.get('precip_mm', 0)
+        return {
+            'temperature': round(current['temp_c']),
+            'condition': current['condition']['text'],
+            'humidity': current['humidity'],
+            'rain_probability': round(precip * 10) if precip > 0 else 0,
+            'icon': current['condition']['icon']
+        }
+
+
+class OpenWeatherProvider(WeatherProvider):
+    """OpenWeatherMap（3時間ごとの予報を日ごとに集計する）"""
+
+    name = 'openweather'
+    base_url = 'http://api.openweathermap.org/data/2.5'
+
+    RAINY_MAINS = ('Rain', 'Drizzle', 'Thunderstorm')
+
+    def __init__(self, api_key=None, country_code=None):
+        super().__init__(api_key or os.getenv('OPENWEATHER_API_KEY', 'your_api_key_here'))
+        self.country_code = country_code or os.getenv('OPENWEATHER_COUNTRY', 'JP')
+
+    def _query(self, query):
+        # 'Tsukuba,Japan' 形式のクエリを 'Tsukuba,JP' に変換
+        return f"{query.split(',')[0]},{self.country_code}"
+
+    def fetch_forecast(self, query, days=3):
+        data = self._get_json(
+            f"{self.base_url}/forecast",
+            {'q': self._query(query), 'appid': self.api_key, 'units': 'metric', 'lang': 'ja'},
+            timeout=10
+        )
+        if data is None:
+            return None
+
+        try:
+            items_by_date = defaultdict(list)
+            hours = []
+            for item in data['list']:
+                date = datetime.fromtimestamp(item['dt']).strftime('%Y-%m-%d')
+                items_by_date[date].append(item)
+
+                # 3時間ごとの予報を1時間ごとに展開
+                main = item['weather'][0]['main']
+                precip = item.get('rain', {}).get('3h', 0) / 3
+                for k in range(3):
+                    time_text = datetime.fromtimestamp(item['dt'] + k * 3600).strftime('%Y-%m-%d %H:%M')
+                    hours.append((time_text, main in self.RAINY_MAINS, main == 'Clear', precip))
+
+            forecast = []
+            for date in sorted(items_by_date)[:days]:
+                items = items_by_date[date]
+                mains = [item['weather'][0]['main'] for item in items]
+                # 説明文はその日で最も多い天気のもの
+                main = Counter(mains).most_common(1)[0][0]
+                description = next(item['weather'][0]['description'] for item in items
+                                   if item['weather'][0]['main'] == main)
+                forecast.append({
+                    'date': date,
+                    'condition': description,
+                    'temp_max': max(item['main']['temp_max'] for item in items),
+                    'temp_min': min(item['main']['temp_min'] for item in items),
+                    'humidity': round(sum(item['main']['humidity'] for item in items) / len(items)),
+                    'precipitation': round(sum(item.get('rain', {}).get('3h', 0) for item in items), 1),
+                    'is_rainy': any(m in self.RAINY_MAINS for m in mains),
+                    'is_sunny': main == 'Clear'
+                })
+
+            first = data['list'][0]
+            return {
+                'forecast': forecast,
+                'hourly': HourlyForecast.from_hours(hours),
+                'current': {
+                    'temp': first['main']['temp'],
+                    'condition': first['weather'][0]['description'],
+                    'humidity': first['main']['humidity']
+                }
+            }
+        except (KeyError, TypeError, IndexError) as e:
+            logger.warning("APIレスポンス構造が期待と異なります: %s %s", query, e)
+            return None
+
+    def fetch_current(self, query):
+        data = self._get_json(
+            f"{self.base_url}/weather",
+            {'q': self._query(query), 'appid': self.api_key, 'units': 'metric', 'lang': 'ja'},
+            timeout=10
+        )
+        if data is None:
+            return None
+        try:
+            rain = data.get('rain', {}).get('1h', 0)
+            return {
+                'temperature': round(data['main']['temp']),
+                'condition': data['weather'][0]['description'],
+                'humidity': data['main']['humidity'],
+                'rain_probability': round(rain * 10) if rain > 0 else 0,
+                'icon': f"//openweathermap.org/img/wn/{data['weather'][0]['icon']}@2x.png"
+            }
+        except (KeyError, TypeError, IndexError) as e:
+            logger.warning("現在の天気のレスポンスが不正です: %s %s", query, e)
+            return None
+
+
+PROVIDERS = {
+    WeatherApiComProvider.name: WeatherApiComProvider,
+    OpenWeatherProvider.name: OpenWeatherProvider
+}
+
+
+def get_provider(name=None):
+    """名前（省略時は環境変数 WEATHER_PROVIDER）からプロバイダーを作成"""
+    name = name or os.getenv('WEATHER_PROVIDER', WeatherApiComProvider.name)
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"未対応の天気プロバイダーです: {name}") from None
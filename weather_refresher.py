@@ -0,0 +1,221 @@
+"""
+天気データのバックグラウンド取得
+
+リクエスト処理の中で外部APIを呼ぶ代わりに、バックグラウンドのスレッドが一定間隔で
+全都市をまとめて取得する。外部APIの呼び出し回数はアクセス数ではなく取得間隔だけで決まる。
+
+- CityWeatherRefresher: 現在の天気をキャッシュに保持（/api/weather/cities）
+- ForecastPrefetcher: 天気予報を期限切れ前に取得して共有キャッシュに書き込む
+
+ForecastPrefetcher は gunicorn のマスタープロセス（gunicorn.conf.py の when_ready）で起動するか、
+単独のプロセスとして実行する:
+
+    python weather_refresher.py          # 定期実行
+    python weather_refresher.py --once   # 1回だけ更新（cron用）
+"""
+
+import logging
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from cache_backend import default_cache
+from weather_simple import WeatherSimple
+
+logger = logging.getLogger(__name__)
+
+# 取得前・取得失敗時に返す値（フロントエンドの表示と同じ形式）
+PLACEHOLDER_WEATHER = {
+    'temperature': '--',
+    'condition': 'データ取得中',
+    'humidity': '--',
+    'rain_probability': 0,
+    'icon': '113'
+}
+
+
+class PeriodicRefresher(ABC):
+    """一定間隔で refresh() を呼ぶバックグラウンドスレッドの基底クラス"""
+
+    thread_name = 'weather-refresher'
+
+    def __init__(self, cities, queries, interval, weather_client=None):
+        self.cities = list(cities)
+        self.queries = {name: queries.get(name, f'{name},Japan') for name in self.cities}
+        self.interval = interval
+        self.weather_client = weather_client or WeatherSimple()
+        self.refresh_count = 0
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """取得スレッドを起動（プロセスごとに1回。preload_app でfork後も動くよう pid で判定する）"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """取得スレッドを停止"""
+        self._stop.set()
+
+    def run_forever(self):
+        """stop() されるまで一定間隔で更新する（呼び出し元のスレッドで実行）"""
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("天気データの更新に失敗しました: %s", self.thread_name)
+            self._stop.wait(self.interval)
+
+    @abstractmethod
+    def refresh(self):
+        """1回分の更新（サブクラスで実装する）"""
+
+
+class CityWeatherRefresher(PeriodicRefresher):
+    """対象都市の現在の天気を定期的に取得してキャッシュに保持する
+
+    キャッシュがワーカー間で共有されている場合、各ワーカーのスレッドのうち
+    期限切れを最初に見つけた1つだけが外部APIを呼び、他はその結果を読む。
+    """
+
+    thread_name = 'city-weather-refresher'
+
+    def __init__(self, cities, queries, interval=600, use_bulk=False, weather_client=None, cache=None):
+        super().__init__(cities, queries, interval, weather_client)
+        self.use_bulk = use_bulk
+        self.cache = cache or default_cache.namespace('weather')
+        self.fetch_count = 0
+        self._weather = {}
+        self._updated_at = None
+
+    def refresh(self):
+        """キャッシュが期限切れなら全都市の現在の天気を取得し、スナップショットを更新"""
+        current = self.cache.get_or_set('current', self._fetch, ttl=self.interval)
+
+        with self._lock:
+            self._weather = current['weather']
+            self._updated_at = current['updated_at']
+            self.refresh_count += 1
+        self._ready.set()
+        return current
+
+    def _fetch(self):
+        fetched = self.weather_client.get_current_weather(self.queries, use_bulk=self.use_bulk)
+
+        # 取得できなかった都市は前回の値を残す
+        weather = dict(self._weather)
+        weather.update(fetched)
+        self.fetch_count += 1
+
+        logger.info("複数都市の天気を更新しました: %d/%d件", len(fetched), len(self.queries),
+                    extra={'fetched': len(fetched), 'cities': len(self.queries)})
+        # 共有キャッシュには JSON で保存するため時刻は文字列にする
+        return {'weather': weather, 'updated_at': datetime.now().isoformat()}
+
+    def snapshot(self, wait=0):
+        """最新の天気を取得（wait 秒までは初回の取得完了を待つ）"""
+        self.start()
+        if wait and not self._ready.is_set():
+            self._ready.wait(wait)
+
+        # 他のワーカーが更新した値があればそちらを使う
+        current = self.cache.get('current')
+        if current is None:
+            with self._lock:
+                current = {'weather': self._weather, 'updated_at': self._updated_at}
+
+        weather = current['weather']
+        return {
+            'weather': {name: weather.get(name, PLACEHOLDER_WEATHER) for name in self.cities},
+            'timestamp': current['updated_at'] or datetime.now().isoformat()
+        }
+
+    def stats(self):
+        """取得状況を取得"""
+        return {
+            'cities': len(self.cities),
+            'available': len(self._weather),
+            'refresh_count': self.refresh_count,
+            'fetch_count': self.fetch_count,
+            'updated_at': self._updated_at,
+            'interval': self.interval,
+            'cache': self.cache.stats()
+        }
+
+
+class ForecastPrefetcher(PeriodicRefresher):
+    """全都市の天気予報を共有キャッシュの期限切れ前に取得する"""
+
+    thread_name = 'forecast-prefetcher'
+
+    def __init__(self, cities, queries, interval=1800, weather_client=None, max_workers=4):
+        super().__init__(cities, queries, interval, weather_client)
+        self.max_workers = max_workers
+        self.last_results = {}
+
+    def refresh(self):
+        """全都市の予報を並行して取得してキャッシュを更新"""
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.queries))) as executor:
+            results = dict(zip(
+                self.queries,
+                executor.map(lambda item: self.weather_client.refresh_forecast(*item), self.queries.items())
+            ))
+
+        succeeded = [name for name, data in results.items() if data is not None]
+        with self._lock:
+            self.last_results = {name: name in succeeded for name in results}
+            self.refresh_count += 1
+        self._ready.set()
+
+        logger.info("天気予報を更新しました: %d/%d件", len(succeeded), len(results),
+                    extra={'fetched': len(succeeded), 'cities': len(results)})
+        return succeeded
+
+    def freshness(self):
+        """共有キャッシュの鮮度（/health 用）"""
+        return self.weather_client.freshness(self.cities)
+
+
+def create_forecast_prefetcher(settings=None):
+    """設定（app.config などのマッピング）に基づいて ForecastPrefetcher を作成"""
+    if settings is None:
+        from config import Config
+        settings = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+
+    return ForecastPrefetcher(
+        settings['TARGET_CITIES'],
+        settings['CITY_WEATHER_QUERIES'],
+        interval=settings['WEATHER_PREFETCH_INTERVAL']
+    )
+
+
+def main():
+    """単独プロセスとして実行"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    prefetcher = create_forecast_prefetcher()
+
+    if '--once' in sys.argv[1:]:
+        succeeded = prefetcher.refresh()
+        return 0 if succeeded else 1
+
+    logger.info("天気予報の定期取得を開始します（%d秒間隔）", prefetcher.interval)
+    try:
+        prefetcher.run_forever()
+    except KeyboardInterrupt:
+        logger.info("天気予報の定期取得を停止しました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
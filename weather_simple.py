@@ -1,184 +1,76 @@
-import requests
 import sqlite3
+import logging
 from datetime import datetime, timedelta
-import os
 from dotenv import load_dotenv
+import metrics
+from weather_cache import default_forecast_cache
+from weather_providers import get_provider
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 都市を指定しない場合の予報（サイトのメイン地域）
+DEFAULT_CITY = 'つくばみらい市'
+
 class WeatherSimple:
-    """シンプルな天気API（WeatherAPI.com使用）"""
+    """天気予報サービス（取得元は weather_providers のプロバイダー。既定はWeatherAPI.com）"""
     
-    def __init__(self):
-        self.api_key = os.getenv('WEATHERAPI_KEY', '88ed0e701cfc4c7fb0d13301253107')
-        self.base_url = 'http://api.weatherapi.com/v1'
-        self.db_path = 'events.db'
+    def __init__(self, cache=None, provider=None):
+        self.provider = provider or get_provider()
+        self.cache = cache or default_forecast_cache
     
-    def get_weather_forecast(self, city='Tsukubamirai'):
-        """3日間の天気予報を取得"""
-        
-        # キャッシュをチェック
-        cached_data = self._get_cached_weather()
-        if cached_data:
-            return cached_data
-        
+    def get_weather_forecast(self, city=DEFAULT_CITY):
+        """3日間の天気予報を取得
+
+        リクエスト処理から呼ばれるため外部APIは呼ばず、共有キャッシュだけを読む。
+        キャッシュはバックグラウンドの ForecastPrefetcher が期限前に更新する。
+        """
         try:
-            # WeatherAPI.comから天気予報を取得
-            url = f"{self.base_url}/forecast.json"
-            params = {
-                'key': self.api_key,
-                'q': f"{city},Japan",
-                'days': 3,
-                'lang': 'ja'
-            }
-            
-            print(f"🌤️ 天気予報を取得中... (APIキー: {self.api_key[:10]}...)")
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                print("✅ 天気予報の取得に成功しました！")
-                
-                # 天気データを処理
-                weather_data = self._process_weather_data(data)
-                
-                # キャッシュに保存
-                self._cache_weather(weather_data)
-                
-                return weather_data
-            else:
-                print(f"❌ APIエラー: {response.status_code}")
-                print(f"レスポンス: {response.text}")
-                return self._get_fallback_weather()
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ リクエストエラー: {e}")
-            return self._get_fallback_weather()
-        except Exception as e:
-            print(f"❌ 予期しないエラー: {e}")
+            cached = self.cache.get(city, self.provider.name)
+        except sqlite3.Error as e:
+            logger.warning("キャッシュ取得エラー: %s", e)
+            cached = None
+
+        metrics.record_cache('weather', cached is not None)
+        if cached is None:
+            logger.debug("天気予報のキャッシュがありません: %s", city)
             return self._get_fallback_weather()
-    
-    def _get_sample_forecast(self):
-        """サンプル予報データを生成"""
-        from datetime import datetime, timedelta
-        
-        forecast = []
-        today = datetime.now()
-        
-        for i in range(3):
-            date = (today + timedelta(days=i)).strftime('%Y-%m-%d')
-            
-            # ランダムな天気パターン
-            if i == 0:
-                condition = "晴れ"
-                is_sunny = True
-                is_rainy = False
-            elif i == 1:
-                condition = "曇り"
-                is_sunny = False
-                is_rainy = False
-            else:
-                condition = "小雨"
-                is_sunny = False
-                is_rainy = True
-            
-            forecast.append({
-                'date': date,
-                'condition': condition,
-                'temp_max': 25 + i,
-                'temp_min': 18 + i,
-                'humidity': 60 + (i * 5),
-                'precipitation': 0 if i < 2 else 5,
-                'is_rainy': is_rainy,
-                'is_sunny': is_sunny
-            })
-        
-        return forecast
-    
-    def _process_weather_data(self, data):
-        """天気データを処理"""
-        forecast = []
-        
-        # APIレスポンスの構造を確認して処理
-        if 'forecast' in data and 'forecastday' in data['forecast']:
-            for day in data['forecast']['forecastday']:
-                date = day['date']
-                day_data = day['day']
-                
-                # 天気の判定
-                condition = day_data['condition']['text'].lower()
-                is_rainy = any(word in condition for word in ['雨', 'rain', 'shower', 'storm'])
-                is_sunny = any(word in condition for word in ['晴', 'sunny', 'clear'])
-                
-                forecast.append({
-                    'date': date,
-                    'condition': day_data['condition']['text'],
-                    'temp_max': day_data['maxtemp_c'],
-                    'temp_min': day_data['mintemp_c'],
-                    'humidity': day_data['avghumidity'],
-                    'precipitation': day_data['totalprecip_mm'],
-                    'is_rainy': is_rainy,
-                    'is_sunny': is_sunny
-                })
-        else:
-            # APIレスポンスが期待と異なる場合、サンプルデータを使用
-            print("⚠️ APIレスポンス構造が期待と異なります。サンプルデータを使用します。")
-            forecast = self._get_sample_forecast()
-        
-        return {
-            'location': data.get('location', {}).get('name', 'つくばみらい市'),
-            'forecast': forecast,
-            'current': {
-                'temp': data.get('current', {}).get('temp_c', 20),
-                'condition': data.get('current', {}).get('condition', {}).get('text', '晴れ'),
-                'humidity': data.get('current', {}).get('humidity', 60)
-            }
-        }
-    
-    def _get_cached_weather(self):
-        """キャッシュされた天気データを取得"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT data, timestamp FROM weather_cache 
-                WHERE timestamp > datetime('now', '-30 minutes')
-                ORDER BY timestamp DESC LIMIT 1
-            ''')
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                import json
-                return json.loads(result[0])
-            
-        except Exception as e:
-            print(f"キャッシュ取得エラー: {e}")
-        
-        return None
-    
-    def _cache_weather(self, weather_data):
-        """天気データをキャッシュに保存"""
+
+        weather_data, fetched_at = cached
+        if not self.cache.is_fresh(fetched_at):
+            # 更新が遅れていても、固定のフォールバックよりは古い予報の方が正確
+            logger.warning("天気予報のキャッシュが期限切れです: %s", city)
+        return weather_data
+
+    def refresh_forecast(self, city=DEFAULT_CITY, query=None):
+        """プロバイダーから天気予報を取得してキャッシュを更新（バックグラウンド用）
+
+        取得できなかった場合は None を返し、キャッシュは更新しない。
+        """
+        weather_data = self.provider.fetch_forecast(query or f"{city},Japan")
+        if weather_data is None:
+            return None
+        logger.info("天気予報の取得に成功しました: %s (%s)", city, self.provider.name)
+        self.cache.put(city, self.provider.name, weather_data)
+        return weather_data
+
+    def get_hourly_forecasts(self, cities):
+        """都市ごとの1時間ごとの予報を共有キャッシュから取得（{都市名: HourlyForecast}）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            import json
-            data_json = json.dumps(weather_data)
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO weather_cache (data, timestamp)
-                VALUES (?, datetime('now'))
-            ''', (data_json,))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            print(f"キャッシュ保存エラー: {e}")
-    
+            return self.cache.get_hourly(cities, self.provider.name)
+        except sqlite3.Error as e:
+            logger.warning("キャッシュ取得エラー: %s", e)
+            return {}
+
+    def get_current_weather(self, queries, use_bulk=False):
+        """複数都市の現在の天気をまとめて取得（queries は {都市名: 検索クエリ}）"""
+        return self.provider.fetch_current_many(queries, use_bulk=use_bulk)
+
+    def freshness(self, cities):
+        """共有キャッシュの鮮度"""
+        return self.cache.freshness(cities, self.provider.name)
+
     def _get_fallback_weather(self):
         """フォールバック用の天気データ"""
         today = datetime.now()